@@ -1,18 +1,310 @@
 import streamlit as st
 import json
+from concurrent.futures import TimeoutError as RenderTimeout
 from workflows import (
     auth,
     get_workflows_from_url,
     get_workflow_graph,
-    filter_graph_data,
-    get_group_subgraphs,  # <— our new helper
+    workflow_index,
 )
-from make_node_graph import create_node_graph
+from client_graph import CLIENT_OUTPUT, client_graph_json, graph_view
+from graph_ir import GRAPH_TRANSITIONS, REACT_FLOW, load_graph
+from graph_lint import lint_graph
+from graph_query import (
+    DIRECTIONS, DOWNSTREAM, UPSTREAM, cone, neighborhood, path_nodes, slice_graph,
+)
+from graph_stream import load_graph_text
+from level_of_detail import AUTO, DETAIL_LEVELS, OVERVIEW, fold_regions, region_label
+from make_node_graph import create_node_graph, node_graph_detail
+from metrics import span, trace
+from prefetch import PREFETCH_DEFAULT, get_prefetcher, render_job, renders_in_process
+from render_options import DEFAULT_ENGINE, DEFAULT_OUTPUT, ENGINES, MIME_TYPES, OUTPUT_FORMATS
+from render_scheduler import RenderQueueFull, get_scheduler
+from search_index import search_index
+from tiles import VIEWPORT_HEIGHT, VIEWPORT_WIDTH, opens_tiled, tile_pyramid_for
+
+PREFETCH_BADGES = {"pending": " (rendering…)", "ready": " ✓", "failed": " (prefetch failed)"}
+FOCUS_MODES = ("Whole graph", "Neighborhood", "Paths between", "Downstream cone", "Upstream cone")
+
+def render_graph(graph, output=DEFAULT_OUTPUT, engine=DEFAULT_ENGINE, expand_depth=0,
+                 detail=AUTO, expanded=(), layout_id=None, highlight=False):
+    """
+    Render through the shared scheduler, so identical renders from other
+    sessions are shared and dot concurrency stays bounded. expand_depth
+    draws nested group nodes inline as clusters; detail and expanded pick
+    the level of detail (see create_node_graph). In-process layered
+    renders keep their layout stable across edits under layout_id.
+    """
+    key, job = render_job(graph, output, engine, expand_depth, detail, expanded)
+    if renders_in_process(graph, output, engine, expand_depth):
+        # No dot process involved, so skip the queue and the IPC round trip.
+        # Running here also keeps the previous layout in this process.
+        if graph.format == GRAPH_TRANSITIONS:
+            return job[0](*job[1:])
+        return create_node_graph(*job[1:], layout_id=layout_id, highlight=highlight)
+    try:
+        with span("render"):
+            return get_scheduler().render(key, *job, ext=output)
+    except RenderQueueFull as e:
+        st.warning(f"The server is busy: {e}")
+    except RenderTimeout:
+        st.warning("This graph is still rendering. Rerun the app (press R) in a moment to show it.")
+    st.stop()
+
+def show_image(data, caption, key, output=DEFAULT_OUTPUT):
+    """
+    Display rendered image bytes with a matching download button.
+    """
+    # st.image takes SVG as markup text rather than bytes
+    with span("image_transfer", size=len(data)):
+        st.image(data.decode("utf-8") if output == "svg" else data, caption=caption)
+        st.download_button(
+            f"Download {output.upper()}",
+            data=data,
+            file_name=f"{caption}.{output}",
+            mime=MIME_TYPES[output],
+            key=f"download_{key}",
+        )
+
+def show_tiled(graph, caption, key, expand_depth=0):
+    """
+    Show a large graph through a zoomable tile pyramid. Only the tiles in
+    the current viewport are composed and sent to the browser.
+    """
+    try:
+        pyramid = tile_pyramid_for(graph, expand_depth=expand_depth)
+    except RenderQueueFull as e:
+        st.warning(f"The server is busy: {e}")
+        st.stop()
+    except RenderTimeout:
+        st.warning("This graph is still rendering. Rerun the app (press R) in a moment to show it.")
+        st.stop()
+
+    fit = pyramid.fit_level(VIEWPORT_WIDTH, VIEWPORT_HEIGHT)
+    level = fit
+    if pyramid.max_level > fit:
+        level = st.slider("Zoom", fit, pyramid.max_level, fit, key=f"zoom_{key}")
+    col_x, col_y = st.columns(2)
+    pan_x = col_x.slider("Pan left/right", 0.0, 1.0, 0.5, key=f"pan_x_{key}")
+    pan_y = col_y.slider("Pan up/down", 0.0, 1.0, 0.5, key=f"pan_y_{key}")
+
+    view = pyramid.viewport(level, pan_x, pan_y)
+    if view is None:
+        # Some tiles were evicted from the cache since the pyramid was built
+        view = tile_pyramid_for(graph, rebuild=True, expand_depth=expand_depth).viewport(level, pan_x, pan_y)
+    st.image(view, caption=caption)
+
+def show_graph(graph, caption, key, output, engine=DEFAULT_ENGINE, expand_depth=0,
+               detail=AUTO, expanded=()):
+    """
+    Render and display a GraphIR, switching to the tiled viewer
+    for large graphs when PNG output is selected. The layered engine keeps
+    unchanged nodes in place across edits and can highlight the changes.
+    The "browser" output leaves layout and drawing to the client.
+    """
+    if output == CLIENT_OUTPUT:
+        selected = graph_view(client_graph_json(graph, expand_depth, detail, expanded), key=f"view_{key}")
+        st.caption(f"{caption} — selected node: {selected}" if selected else caption)
+        return
+    if output == "png" and graph.format == REACT_FLOW:
+        tiled = st.checkbox(
+            "Large-graph mode (zoomable tiles, full detail)",
+            value=opens_tiled(graph, output, expand_depth, detail),
+            key=f"tiled_{key}",
+        )
+        if tiled:
+            show_tiled(graph, caption, key, expand_depth)
+            return
+    highlight = False
+    if engine == "layered" and output == "svg" and graph.format == REACT_FLOW:
+        highlight = st.checkbox("Highlight changes since the last render", key=f"highlight_{key}")
+    image = render_graph(graph, output, engine, expand_depth, detail, expanded, key, highlight)
+    show_image(image, caption, key, output)
+
+def detail_controls(graph, key, expand_depth=0):
+    """
+    Level-of-detail selector. When the overview is in effect, also offers
+    the folded chains and fans for expansion. Returns (detail, expanded).
+    """
+    if graph.format != REACT_FLOW:
+        return AUTO, ()
+    detail = st.radio(
+        "Level of detail:",
+        DETAIL_LEVELS,
+        horizontal=True,
+        key=f"detail_{key}",
+        help="'auto' switches large graphs to a folded overview without handle rows.",
+    )
+    if node_graph_detail(graph, detail, expand_depth) != OVERVIEW:
+        return detail, ()
+
+    regions = fold_regions(graph)
+    if not regions:
+        return detail, ()
+    names = {node.id: node.name or node.id for node in graph.nodes}
+    labels = {region.id: region_label(graph, region, names) for region in regions}
+    expanded = st.multiselect(
+        "Expand folded regions:",
+        list(labels),
+        format_func=labels.get,
+        key=f"unfold_{key}",
+    )
+    return detail, tuple(sorted(expanded))
+
+def focus_graph(graph, key):
+    """
+    Let the user narrow graph to the neighborhood of a node, the paths
+    between two nodes, or the cone of a handle. Returns the slice to render,
+    or graph itself for "Whole graph".
+    """
+    mode = st.selectbox("Focus:", FOCUS_MODES, key=f"focus_{key}")
+    if mode == FOCUS_MODES[0] or not graph.nodes:
+        return graph
+
+    nodes = {node.id: node for node in graph.nodes}
+
+    def label(node_id):
+        return f"{nodes[node_id].name or nodes[node_id].kind} ({node_id})"
+
+    node_id = st.selectbox("Node:", list(nodes), format_func=label, key=f"focus_node_{key}")
+
+    if mode == "Neighborhood":
+        hops = st.slider("Hops", 1, 10, 2, key=f"focus_hops_{key}")
+        direction = st.radio("Direction", DIRECTIONS, horizontal=True, key=f"focus_dir_{key}")
+        node_ids = neighborhood(graph, node_id, hops, direction)
+    elif mode == "Paths between":
+        target_id = st.selectbox("To node:", list(nodes), format_func=label, key=f"focus_to_{key}")
+        node_ids = path_nodes(graph, node_id, target_id)
+        if not node_ids:
+            st.info("No path between these nodes.")
+            node_ids = {node_id, target_id}
+    else:
+        direction = DOWNSTREAM if mode == "Downstream cone" else UPSTREAM
+        handles = nodes[node_id].outputs if direction == DOWNSTREAM else nodes[node_id].inputs
+        handle_id = st.selectbox(
+            "Handle:",
+            [None] + [h.id for h in handles],
+            format_func=lambda h: "(all handles)" if h is None else h,
+            key=f"focus_handle_{key}",
+        )
+        node_ids = cone(graph, node_id, handle_id, direction)
+
+    focused = slice_graph(graph, node_ids)
+    st.caption(f"Showing {len(focused.nodes)} of {len(graph.nodes)} nodes.")
+    return focused
+
+def show_workflow(graph, caption, key, output, engine=DEFAULT_ENGINE):
+    """
+    Show a graph, or a focused slice of it, with controls for its group
+    nodes at any nesting depth: expand them inline as clusters, or drill
+    into one of them. The group
+    hierarchy is indexed once per GraphIR and every render is cached, so
+    switching groups neither rescans nor re-renders the parent.
+    """
+    report = lint_graph(graph)
+    if report.issues:
+        with st.expander(f"Lint: {report.summary()}", expanded=not report.ok):
+            for issue in report.issues:
+                st.text(str(issue))
+
+    graph = focus_graph(graph, key)
+    hierarchy = graph.hierarchy()
+    groups = hierarchy.walk()
+    expand_depth = 0
+    if groups:
+        max_depth = max(entry.depth for entry in groups)
+        expand_depth = st.slider(
+            "Expand group nodes inline (levels)", 0, max_depth, 0, key=f"expand_{key}",
+        )
+    detail, expanded = detail_controls(graph, key, expand_depth)
+    show_graph(graph, caption, key, output, engine, expand_depth, detail, expanded)
+    if not groups:
+        return
+
+    labels = {entry.path: " / ".join(hierarchy.breadcrumbs(entry.path)) for entry in groups}
+    path = st.selectbox(
+        "Render group node:",
+        [None] + list(labels),
+        format_func=lambda p: "(none)" if p is None else labels[p],
+        key=f"group_{key}",
+    )
+    if path:
+        entry = hierarchy.get(path)
+        sub_key = group_key(key, path)
+        sub_graph = focus_graph(entry.graph, sub_key)
+        show_graph(sub_graph, f"{labels[path]} (subgraph)", sub_key, output, engine)
+
+def group_key(key, path):
+    """
+    Widget key prefix for the group node at path inside the workflow view key.
+    """
+    return f"{key}_sub_" + "/".join(path)
+
+def show_search_hits(query, token, workflows):
+    """
+    List the nodes matching query in the given (id, name) workflows. A
+    click selects the workflow and focuses the render on the node, inside
+    the view of the group node it is nested in, if any.
+    """
+    names = dict(workflows)
+    search_index.sync(workflow_index.all_items(token))
+    hits = search_index.search(query, workflow_ids=set(names))
+    if not hits:
+        st.caption("No matching nodes.")
+        return
+
+    for hit in hits:
+        where = " / ".join((names[hit.workflow_id],) + hit.group_names)
+        hit_key = "/".join((hit.workflow_id,) + hit.path + (hit.node_id,))
+        if st.button(f"{hit.node_name} in {where} ({', '.join(hit.fields)})", key=f"hit_{hit_key}"):
+            key = f"wf_{hit.workflow_id}"
+            st.session_state["selected_workflow"] = (hit.workflow_id, names[hit.workflow_id])
+            st.session_state[f"group_{key}"] = hit.path or None
+            if hit.path:
+                # Keep the whole graph, so the group is there to select
+                st.session_state[f"focus_{key}"] = FOCUS_MODES[0]
+                key = group_key(key, hit.path)
+            st.session_state[f"focus_{key}"] = "Neighborhood"
+            st.session_state[f"focus_node_{key}"] = hit.node_id
+
+def show_timings(request_trace):
+    """
+    Sidebar breakdown of where this run's time went, when metrics are on.
+    Nested stages are indented under the stage that includes them.
+    """
+    if request_trace is None or not request_trace.spans:
+        return
+    with st.sidebar.expander(f"Timings: {request_trace.elapsed() * 1000:.0f} ms this run"):
+        st.table([
+            {
+                "stage": "\u2003" * s.depth + s.stage,
+                "ms": round(s.seconds * 1000, 1),
+                "size": f"{s.size / 1024:.1f} KiB" if s.size else "",
+            }
+            for s in request_trace.spans
+        ])
 
 def main():
     st.title("Workflows Graph Viewer")
 
     data_source = st.radio("Select data source:", ["Workspace URL", "Paste JSON"])
+    output = st.radio(
+        "Output format:",
+        OUTPUT_FORMATS + (CLIENT_OUTPUT,),
+        index=OUTPUT_FORMATS.index(DEFAULT_OUTPUT),
+        horizontal=True,
+        help="SVG is vector output. PNG resolution adapts to the graph size. "
+             "'browser' lays out and draws the graph in your browser, with pan and zoom.",
+    )
+    engine = DEFAULT_ENGINE
+    if output == "svg":
+        engine = st.radio(
+            "Layout engine:",
+            ENGINES,
+            index=ENGINES.index(DEFAULT_ENGINE),
+            horizontal=True,
+            help="'layered' lays out in-process without starting Graphviz.",
+        )
 
     if data_source == "Workspace URL":
         token = auth()
@@ -31,43 +323,37 @@ def main():
 
         st.subheader("Workflows")
 
+        # Optionally fetch and render everything in the background so that
+        # switching between workflows is a cache hit
+        prefetcher = None
+        if output != CLIENT_OUTPUT and st.checkbox("Prefetch and pre-render all workflows", value=PREFETCH_DEFAULT):
+            prefetcher = get_prefetcher()
+            prefetcher.prefetch(token, [wf_id for wf_id, _ in workflows], output, engine)
+
+        # Search every workflow of this workspace without rendering any
+        query = st.text_input("Search node names, handle types and ids:", key="search_query")
+        if query:
+            show_search_hits(query, token, workflows)
+
         # 1) Pick which workflow to render
         if "selected_workflow" not in st.session_state:
             st.session_state["selected_workflow"] = None
 
         for wf_id, wf_name in workflows:
-            if st.button(f"Render: {wf_name}", key=f"wf_{wf_id}"):
+            badge = PREFETCH_BADGES.get(prefetcher.status(wf_id, output, engine), "") if prefetcher else ""
+            if st.button(f"Render: {wf_name}{badge}", key=f"wf_{wf_id}"):
                 st.session_state["selected_workflow"] = (wf_id, wf_name)
-                # Clear any previously selected subgraph
-                st.session_state["selected_subgraph"] = None
 
         # 2) Render the selected workflow
         if st.session_state["selected_workflow"]:
             wf_id, wf_name = st.session_state["selected_workflow"]
             graph_data = get_workflow_graph(token, wf_id)
-            if not graph_data:
+            if graph_data is None:
                 st.error("Failed to retrieve graph data.")
                 st.stop()
 
-            filtered_data = filter_graph_data(graph_data)
-            png_path = create_node_graph(filtered_data)
-            st.image(png_path, caption=wf_name)
-
-            # 3) List subgraphs for this workflow
-            subgraphs = get_group_subgraphs(graph_data)
-            if "selected_subgraph" not in st.session_state:
-                st.session_state["selected_subgraph"] = None
-
-            for group_id, group_name, group_workflow in subgraphs:
-                if st.button(f"Render group node: {group_name}", key=f"sub_{group_id}"):
-                    st.session_state["selected_subgraph"] = (group_id, group_name, group_workflow)
-
-            # 4) Render the selected subgraph (if any)
-            if st.session_state["selected_subgraph"]:
-                group_id, group_name, group_workflow = st.session_state["selected_subgraph"]
-                sub_filtered = filter_graph_data(group_workflow)
-                sub_png_path = create_node_graph(sub_filtered)
-                st.image(sub_png_path, caption=f"{group_name} (subgraph)")
+            graph = load_graph(graph_data)
+            show_workflow(graph, wf_name, f"wf_{wf_id}", output, engine)
 
     else:
         # Paste JSON case
@@ -76,28 +362,23 @@ def main():
             if not js_input.strip():
                 st.error("No JSON provided.")
                 st.stop()
+            # Keep the graph across reruns so zoom and subgraph buttons work
+            st.session_state["pasted_json"] = js_input
 
+        if st.session_state.get("pasted_json"):
             try:
-                data = json.loads(js_input)
-                png_path = create_node_graph(data)
-                st.image(png_path, caption="Pasted JSON Graph")
-
-                # Same idea: show subgraphs
-                subgraphs = get_group_subgraphs(data)
-                if "selected_pasted_subgraph" not in st.session_state:
-                    st.session_state["selected_pasted_subgraph"] = None
-
-                for group_id, group_name, group_workflow in subgraphs:
-                    if st.button(f"Render group node: {group_name}", key=f"pasted_sub_{group_id}"):
-                        st.session_state["selected_pasted_subgraph"] = (group_id, group_name, group_workflow)
-
-                if st.session_state["selected_pasted_subgraph"]:
-                    group_id, group_name, group_workflow = st.session_state["selected_pasted_subgraph"]
-                    sub_filtered = filter_graph_data(group_workflow)
-                    sub_png_path = create_node_graph(sub_filtered)
-                    st.image(sub_png_path, caption=f"{group_name} (subgraph)")
+                # Parse once per paste, not on every rerun
+                if st.session_state.get("pasted_graph_source") != st.session_state["pasted_json"]:
+                    st.session_state["pasted_graph"] = load_graph_text(st.session_state["pasted_json"])
+                    st.session_state["pasted_graph_source"] = st.session_state["pasted_json"]
+                graph = st.session_state["pasted_graph"]
+                show_workflow(graph, "Pasted JSON Graph", "pasted", output, engine)
             except Exception as e:
                 st.error(f"Failed to parse or render graph: {e}")
 
 if __name__ == "__main__":
-    main()
+    with trace() as request_trace:
+        try:
+            main()
+        finally:
+            show_timings(request_trace)
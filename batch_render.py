@@ -0,0 +1,235 @@
+"""
+Headless batch renderer.
+
+Renders every workflow of a workspace, or every JSON file under a
+directory, plus all of their nested group subgraphs, into an output
+directory. Inputs are rendered in parallel on a process pool. A manifest
+in the output directory records a hash of each input and of the render
+options, so inputs that have not changed since the last run are skipped
+without being parsed.
+
+  python batch_render.py docs/workflows/ -o docs/images --format svg
+  python batch_render.py --workspace https://.../workspaces/<id> -o out/
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from graph_ir import GRAPH_TRANSITIONS, load_graph
+from graph_stream import CHUNK_SIZE, load_graph_stream
+from level_of_detail import AUTO, DETAIL_LEVELS
+from render_cache import render_cache, render_key
+from render_options import DEFAULT_ENGINE, DEFAULT_OUTPUT, ENGINES, OUTPUT_FORMATS, PNG_PIXEL_BUDGET
+
+MANIFEST_NAME = ".batch_manifest.json"
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", os.cpu_count() or 1))
+
+
+def safe_name(name):
+    """
+    File-name-safe version of a workflow, file or group name. Names that
+    had to be changed get a short hash of the original, so e.g. "a/b" and
+    "a_b" do not end up as the same file.
+    """
+    safe = re.sub(r"[^\w.-]+", "_", name).strip("_") or "untitled"
+    if safe != name:
+        safe += "-" + hashlib.sha256(name.encode("utf-8")).hexdigest()[:8]
+    return safe
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _init_worker():
+    # Each image is written once and never read back in this process
+    render_cache.max_memory_bytes = 0
+
+
+def render_input(name, source, out_dir, output, engine, detail, expand_depth):
+    """
+    Render one input (a JSON file path or a GraphIR) and all of its nested
+    groups into out_dir. Runs in a worker process. Returns the list of
+    written file names and the elapsed seconds.
+    """
+    # Imported here: these pull in streamlit, which only the workers need
+    from make_alt_node_graph import create_alt_node_graph_with_handles
+    from make_node_graph import create_node_graph
+
+    start = time.perf_counter()
+    if isinstance(source, str):
+        with open(source, encoding="utf-8") as f:
+            graph = load_graph_stream(iter(lambda: f.read(CHUNK_SIZE), ""))
+    else:
+        graph = load_graph(source)
+
+    written = []
+    hierarchy = graph.hierarchy()
+    for entry in [hierarchy.root] + hierarchy.walk():
+        if graph.format == GRAPH_TRANSITIONS:
+            data = create_alt_node_graph_with_handles(entry.graph, output, engine, PNG_PIXEL_BUDGET)
+        else:
+            data = create_node_graph(
+                entry.graph, output, PNG_PIXEL_BUDGET, engine, expand_depth, detail,
+            )
+        file_name = "__".join([name] + [safe_name(part) for part in entry.path]) + f".{output}"
+        with open(os.path.join(out_dir, file_name), "wb") as f:
+            f.write(data)
+        written.append(file_name)
+    return written, time.perf_counter() - start
+
+
+def file_inputs(paths):
+    """
+    (name, path, content hash) for each JSON file given or found under a
+    given directory.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(root, f)
+                for root, _, names in os.walk(path)
+                for f in names
+                if f.endswith(".json")
+            )
+            for file_path in files:
+                rel = os.path.splitext(os.path.relpath(file_path, path))[0]
+                yield safe_name(rel), file_path, file_hash(file_path)
+        else:
+            yield safe_name(os.path.splitext(os.path.basename(path))[0]), path, file_hash(path)
+
+
+def workspace_inputs(workspace_url):
+    """
+    (name, GraphIR, fingerprint) for each workflow of a workspace. A
+    workflow whose graph cannot be fetched is yielded as (name, None,
+    None), and so is the workspace itself if logging in fails or it has
+    no workflows, so that main() counts them as failed.
+    """
+    # Imported here so file batches need no credentials or network
+    from workflows import auth, get_workflow_graph, get_workflows_from_url
+
+    token = auth()
+    if not token:
+        print("Authentication failed.", file=sys.stderr)
+        yield workspace_url, None, None
+        return
+    workflows = get_workflows_from_url(workspace_url, token)
+    if not workflows:
+        print(f"No workflows found for {workspace_url}", file=sys.stderr)
+        yield workspace_url, None, None
+        return
+    for wf_id, wf_name in workflows:
+        name = safe_name(f"{wf_name}_{wf_id}")
+        graph = get_workflow_graph(token, wf_id)
+        if graph is None:
+            print(f"{name}: failed to retrieve graph data", file=sys.stderr)
+            yield name, None, None
+            continue
+        yield name, graph, graph.fingerprint()
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render workflows and their group subgraphs to files.")
+    parser.add_argument("inputs", nargs="*", help="JSON files or directories of JSON files")
+    parser.add_argument("--workspace", help="render every workflow of this workspace URL")
+    parser.add_argument("-o", "--out", required=True, help="output directory")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=DEFAULT_OUTPUT)
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument("--detail", choices=DETAIL_LEVELS, default=AUTO)
+    parser.add_argument("--expand-depth", type=int, default=0,
+                        help="draw nested groups inline as clusters, this many levels deep")
+    parser.add_argument("-j", "--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--force", action="store_true", help="render even unchanged inputs")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.workspace:
+        parser.error("give JSON files, directories or --workspace")
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest = load_manifest(args.out)
+    options = (args.format, args.engine, args.detail, args.expand_depth)
+
+    inputs = list(file_inputs(args.inputs))
+    if args.workspace:
+        inputs += list(workspace_inputs(args.workspace))
+    counts = Counter(name for name, _, _ in inputs)
+    duplicates = sorted(name for name, count in counts.items() if count > 1)
+    if duplicates:
+        # Their images and manifest entries would overwrite each other
+        print(f"Inputs given more than once: {', '.join(duplicates)}", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    skipped = failed = rendered = 0
+    jobs = {}
+    with ProcessPoolExecutor(
+        max_workers=max(1, args.workers),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    ) as pool:
+        for name, source, content_hash in inputs:
+            if source is None:
+                failed += 1
+                continue
+            key = render_key("batch", content_hash, format=args.format, engine=args.engine,
+                             detail=args.detail, expand=args.expand_depth)
+            previous = manifest.get(name)
+            if (
+                not args.force and previous and previous["key"] == key
+                and all(os.path.exists(os.path.join(args.out, f)) for f in previous["files"])
+            ):
+                skipped += 1
+                print(f"{name}: unchanged, skipped")
+                continue
+            job = pool.submit(render_input, name, source, args.out, *options)
+            jobs[job] = (name, key)
+
+        for job in as_completed(jobs):
+            name, key = jobs[job]
+            try:
+                written, seconds = job.result()
+            except Exception as err:
+                failed += 1
+                manifest.pop(name, None)
+                print(f"{name}: failed: {err}", file=sys.stderr)
+                continue
+            rendered += 1
+            manifest[name] = {"key": key, "files": written}
+            print(f"{name}: {len(written)} images in {seconds:.2f}s")
+
+    save_manifest(args.out, manifest)
+    print(
+        f"Rendered {rendered}, skipped {skipped}, failed {failed} "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
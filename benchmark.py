@@ -0,0 +1,389 @@
+"""
+Benchmarks for every stage of the render pipeline on synthetic workflows.
+
+synthetic_workflow() builds a seeded, reproducible workflow in either
+input format with a chosen number of nodes, handles per node, edge
+density, duplicate and dangling ratios and group nesting depth. Each
+scenario is timed stage by stage:
+
+  parse     load_graph: dict -> GraphIR
+  filter    workflows.filter_graph_data (React Flow only)
+  labels    render model and Graphviz source with all HTML labels
+  layout    Graphviz layout and SVG output (needs the dot binary)
+  layered   the in-process layered layout (up to LAYERED_MAX_NODES)
+  groups    workflows.get_group_subgraphs plus the nested GroupHierarchy
+
+Times are the median of --repeat runs. Peak memory is measured in a
+separate tracemalloc run, so it does not slow the timed runs down; it
+covers Python allocations only, not the dot subprocess.
+
+  python benchmark.py                          # the whole suite
+  python benchmark.py -s rf-medium -s gt-medium --repeat 5
+  python benchmark.py --nodes 3000 --handles 8 --group-depth 2
+  python benchmark.py --save-baseline bench.json
+  python benchmark.py --baseline bench.json --tolerance 0.3
+
+With --baseline, a stage that got slower (or used more memory) than the
+baseline by more than the tolerance is reported as a regression and the
+exit status is 1. Baselines are machine specific; record them on the
+machine that compares against them.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from graphviz import ExecutableNotFound
+
+from graph_ir import GRAPH_TRANSITIONS, REACT_FLOW, GroupHierarchy, load_graph
+from layered_layout import compute_layout
+from make_alt_node_graph import alt_node_graph_model
+from make_node_graph import node_graph_model
+from render_model import LAYERED_MAX_NODES, to_digraph
+from workflows import filter_graph_data, get_group_subgraphs
+
+STAGES = ("parse", "filter", "labels", "layout", "layered", "groups")
+FORMATS = (REACT_FLOW, GRAPH_TRANSITIONS)
+
+HANDLE_TYPES = ("formant.Number", "formant.Text", "formant.Bool", "formant.Image",
+                "formant.Json", "formant.Location")
+NODE_KINDS = ("workflow-constant", "workflow-filter", "workflow-map", "workflow-trigger",
+              "workflow-http", "workflow-delay")
+# Group nodes per graph and the size of their workflows relative to the
+# parent, for group_depth > 0
+GROUPS_PER_LEVEL = 3
+GROUP_SIZE_RATIO = 0.25
+# How far back (in node order) edges reach, which keeps layouts layered
+# the way hand-built workflows are
+EDGE_REACH = 12
+# Differences below these are noise, not regressions
+TIME_NOISE_SECONDS = 0.001
+MEMORY_NOISE_BYTES = 256 * 1024
+
+# Named scenarios run by default
+SUITE = {
+    "rf-small": {"nodes": 50},
+    "rf-medium": {"nodes": 300},
+    "rf-large": {"nodes": 1500, "handles": 6},
+    "rf-dense": {"nodes": 300, "edge_density": 4.0},
+    "rf-dirty": {"nodes": 300, "duplicate_ratio": 0.05, "dangling_ratio": 0.05},
+    "rf-nested": {"nodes": 200, "group_depth": 3},
+    "gt-medium": {"nodes": 300, "format": GRAPH_TRANSITIONS},
+    "gt-large": {"nodes": 1500, "format": GRAPH_TRANSITIONS},
+}
+
+
+def _uuid(rng):
+    return "%08x-%04x-%04x-%04x-%012x" % (
+        rng.getrandbits(32), rng.getrandbits(16), rng.getrandbits(16),
+        rng.getrandbits(16), rng.getrandbits(48),
+    )
+
+
+def _react_flow(rng, nodes, handles, edge_density, duplicate_ratio, dangling_ratio, group_depth):
+    node_list = []
+    outputs = []   # [(node id, handle id)] per node
+    inputs = []
+    handle_ids = []
+    for i in range(nodes):
+        if node_list and rng.random() < duplicate_ratio:
+            node_id = rng.choice(node_list)["id"]
+        else:
+            node_id = _uuid(rng)
+        handlers = []
+        node_inputs, node_outputs = [], []
+        for j in range(handles):
+            if handle_ids and rng.random() < duplicate_ratio:
+                handle_id = rng.choice(handle_ids)
+            else:
+                handle_id = _uuid(rng)
+            handle_ids.append(handle_id)
+            direction = "input" if j % 2 == 0 else "output"
+            handlers.append({"id": handle_id, "type": rng.choice(HANDLE_TYPES), "handlerType": direction})
+            (node_inputs if direction == "input" else node_outputs).append((node_id, handle_id))
+        data = {"name": f"{rng.choice(NODE_KINDS)} {i}", "handlers": handlers}
+        if group_depth > 0 and i < GROUPS_PER_LEVEL:
+            data["isGroup"] = True
+            data["groupNodeData"] = {"workflow": _react_flow(
+                rng, max(5, int(nodes * GROUP_SIZE_RATIO)), handles, edge_density,
+                duplicate_ratio, dangling_ratio, group_depth - 1,
+            )}
+        node_list.append({"id": node_id, "type": "custom", "position": {"x": 0, "y": 0}, "data": data})
+        outputs.append(node_outputs)
+        inputs.append(node_inputs)
+
+    edges = []
+    for _ in range(int(nodes * edge_density)):
+        if nodes < 2:
+            break
+        t = rng.randrange(1, nodes)
+        s = rng.randrange(max(0, t - EDGE_REACH), t)
+        source, source_handle = rng.choice(outputs[s] or [(node_list[s]["id"], "NONE")])
+        target, target_handle = rng.choice(inputs[t] or [(node_list[t]["id"], "NONE")])
+        if rng.random() < dangling_ratio:
+            # Half point at a node that does not exist, half at a handle
+            if rng.random() < 0.5:
+                target = _uuid(rng)
+            else:
+                target_handle = _uuid(rng)
+        edges.append({
+            "id": _uuid(rng),
+            "source": source, "sourceHandle": source_handle,
+            "target": target, "targetHandle": target_handle,
+        })
+    return {"nodes": node_list, "edges": edges}
+
+
+def _graph_transitions(rng, nodes, handles, edge_density, duplicate_ratio, dangling_ratio):
+    node_list = []
+    for i in range(nodes):
+        if node_list and rng.random() < duplicate_ratio:
+            node_id = rng.choice(node_list)["id"]
+        else:
+            node_id = _uuid(rng)
+        node_list.append({
+            "id": node_id,
+            "type": rng.choice(NODE_KINDS),
+            "attributes": [{"name": f"attr{j}", "value": rng.randrange(1000)} for j in range(2)],
+            "enabled": "always",
+        })
+
+    ports = max(1, handles // 2)
+    edges = []
+    transitions = []
+    for _ in range(int(nodes * edge_density)):
+        if nodes < 2:
+            break
+        t = rng.randrange(1, nodes)
+        s = rng.randrange(max(0, t - EDGE_REACH), t)
+        target = node_list[t]["id"]
+        if rng.random() < dangling_ratio:
+            target = _uuid(rng)
+        if rng.random() < 0.8:
+            edges.append({
+                "from": {"node": node_list[s]["id"], "output": f"out{rng.randrange(ports)}"},
+                "to": {"node": target, "input": f"in{rng.randrange(ports)}"},
+            })
+        else:
+            transitions.append({
+                "from": node_list[s]["id"], "to": target, "method": {"type": "immediately_after"},
+            })
+    return {"graph": {"id": _uuid(rng), "nodes": node_list, "edges": edges}, "transitions": transitions}
+
+
+def synthetic_workflow(nodes=100, handles=4, edge_density=1.5, duplicate_ratio=0.0,
+                       dangling_ratio=0.0, group_depth=0, format=REACT_FLOW, seed=0):
+    """
+    A reproducible workflow dict in format (REACT_FLOW or
+    GRAPH_TRANSITIONS). edge_density is edges per node; duplicate_ratio
+    is the share of node and handle ids that repeat an earlier one and
+    dangling_ratio the share of edges into a missing node or handle.
+    group_depth nests group nodes (React Flow only) that many levels deep.
+    """
+    rng = random.Random(seed)
+    if format == GRAPH_TRANSITIONS:
+        return _graph_transitions(rng, nodes, handles, edge_density, duplicate_ratio, dangling_ratio)
+    return _react_flow(rng, nodes, handles, edge_density, duplicate_ratio, dangling_ratio, group_depth)
+
+
+def scenario_name(params):
+    """
+    Name for an ad-hoc scenario from its non-default parameters.
+    """
+    defaults = {"nodes": 100, "handles": 4, "edge_density": 1.5, "duplicate_ratio": 0.0,
+                "dangling_ratio": 0.0, "group_depth": 0, "format": REACT_FLOW, "seed": 0}
+    parts = ["rf" if params.get("format", REACT_FLOW) == REACT_FLOW else "gt"]
+    for name, value in sorted(params.items()):
+        if name != "format" and value != defaults.get(name):
+            parts.append(f"{name}={value}")
+    return "-".join(parts)
+
+
+def _stages(data, expand_depth=0):
+    """
+    (stage, callable or reason it is skipped) for one workflow dict. The
+    inputs each stage needs are built here, outside the timed calls.
+    React Flow models draw groups down to expand_depth levels inline.
+    """
+    graph = load_graph(data)
+    react_flow = graph.format == REACT_FLOW
+    if react_flow:
+        def build_model(graph):
+            return node_graph_model(graph, expand_depth)
+    else:
+        build_model = alt_node_graph_model
+    model = build_model(graph)
+
+    def labels():
+        return to_digraph(build_model(graph), "bench", "svg", {}).source
+
+    digraph = to_digraph(model, "bench", "svg", {})
+
+    def layout():
+        return digraph.pipe(format="svg")
+
+    def groups():
+        return get_group_subgraphs(data), GroupHierarchy(graph).walk()
+
+    return [
+        ("parse", lambda: load_graph(data)),
+        ("filter", (lambda: filter_graph_data(data)) if react_flow else "React Flow only"),
+        ("labels", labels),
+        ("layout", layout),
+        ("layered", (lambda: compute_layout(model)) if len(model.nodes) <= LAYERED_MAX_NODES
+         else f"over {LAYERED_MAX_NODES} nodes"),
+        ("groups", groups if react_flow else "React Flow only"),
+    ]
+
+
+def measure(fn, repeat):
+    """
+    Median seconds over repeat calls, and the peak traced memory of one
+    more call in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def run_scenario(params, stages=STAGES, repeat=3):
+    """
+    Generate the workflow for params and benchmark the selected stages.
+    Returns {stage: {"seconds", "peak_bytes"} or {"skipped": reason}} plus
+    the graph size, nested groups included, under "size".
+    """
+    data = synthetic_workflow(**params)
+    graph = load_graph(data)
+    # Expand every group, so the model the stages time has the size reported
+    expand_depth = params.get("group_depth", 0)
+    node_count, edge_count = graph.hierarchy().size(expand_depth)
+    result = {"size": {"nodes": node_count, "edges": edge_count}}
+    for stage, fn in _stages(data, expand_depth):
+        if stage not in stages:
+            continue
+        if isinstance(fn, str):
+            result[stage] = {"skipped": fn}
+            continue
+        try:
+            seconds, peak = measure(fn, repeat)
+        except ExecutableNotFound:
+            result[stage] = {"skipped": "Graphviz dot not installed"}
+            continue
+        result[stage] = {"seconds": seconds, "peak_bytes": peak}
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of results against baseline (both scenario -> stage ->
+    measurements): stages more than tolerance (a fraction) slower or
+    hungrier than before. Differences within the noise floors are ignored.
+    """
+    regressions = []
+    for name, stages in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        for stage, now in stages.items():
+            old = before.get(stage)
+            if stage == "size" or not old or "seconds" not in now or "seconds" not in old:
+                continue
+            slower = now["seconds"] - old["seconds"]
+            if now["seconds"] > old["seconds"] * (1 + tolerance) and slower > TIME_NOISE_SECONDS:
+                regressions.append(
+                    f"{name} {stage}: {old['seconds'] * 1000:.1f} ms -> {now['seconds'] * 1000:.1f} ms"
+                )
+            grown = now["peak_bytes"] - old["peak_bytes"]
+            if now["peak_bytes"] > old["peak_bytes"] * (1 + tolerance) and grown > MEMORY_NOISE_BYTES:
+                regressions.append(
+                    f"{name} {stage}: peak {old['peak_bytes'] / 1e6:.1f} MB -> {now['peak_bytes'] / 1e6:.1f} MB"
+                )
+    return regressions
+
+
+def _format_row(stage, measurement):
+    if "skipped" in measurement:
+        return f"  {stage:<8} skipped ({measurement['skipped']})"
+    return (
+        f"  {stage:<8} {measurement['seconds'] * 1000:10.1f} ms"
+        f"  peak {measurement['peak_bytes'] / 1e6:8.2f} MB"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the render pipeline on synthetic workflows.")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SUITE),
+                        help="run only these suite scenarios (repeatable)")
+    parser.add_argument("--nodes", type=int, help="run one ad-hoc scenario with this many nodes")
+    parser.add_argument("--handles", type=int, default=4)
+    parser.add_argument("--edge-density", type=float, default=1.5, help="edges per node")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0)
+    parser.add_argument("--dangling-ratio", type=float, default=0.0)
+    parser.add_argument("--group-depth", type=int, default=0)
+    parser.add_argument("--format", choices=FORMATS, default=REACT_FLOW)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a stage counts as a regression (default 0.25)")
+    args = parser.parse_args(argv)
+
+    if args.nodes is not None:
+        params = {
+            "nodes": args.nodes, "handles": args.handles, "edge_density": args.edge_density,
+            "duplicate_ratio": args.duplicate_ratio, "dangling_ratio": args.dangling_ratio,
+            "group_depth": args.group_depth, "format": args.format, "seed": args.seed,
+        }
+        scenarios = {scenario_name(params): params}
+    else:
+        scenarios = {name: SUITE[name] for name in (args.scenario or SUITE)}
+
+    results = {}
+    for name, params in scenarios.items():
+        results[name] = run_scenario(params, args.stages, max(1, args.repeat))
+        if not args.json:
+            size = results[name]["size"]
+            print(f"{name}: {size['nodes']} nodes, {size['edges']} edges")
+            for stage in args.stages:
+                print(_format_row(stage, results[name][stage]))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.save_baseline}", file=sys.stderr)
+
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as err:
+            print(f"Could not read baseline {args.baseline}: {err}", file=sys.stderr)
+            return 2
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Client-side rendering: instead of laying out and drawing on the server,
+send the RenderModel as compact JSON to the graph_view component in
+client_graph_frontend/, which lays it out and draws it in the browser
+with pan and zoom. The server only builds the model and serializes it,
+and the JSON is cached like any other render.
+
+The component is plain HTML and JavaScript loaded from disk, so it needs
+no build step and no network access.
+"""
+import json
+import os
+
+import streamlit.components.v1 as components
+
+from graph_ir import GRAPH_TRANSITIONS, load_graph
+from level_of_detail import AUTO, OVERVIEW
+from make_alt_node_graph import alt_node_graph_model
+from make_node_graph import node_graph_detail, node_graph_view_model
+from metrics import span
+from render_cache import render_cache, render_key
+
+# Offered next to OUTPUT_FORMATS; nothing is rendered on the server
+CLIENT_OUTPUT = "browser"
+CLIENT_GRAPH_HEIGHT = int(os.getenv("CLIENT_GRAPH_HEIGHT", 600))
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "client_graph_frontend")
+
+_graph_view = components.declare_component("graph_view", path=FRONTEND_DIR)
+
+
+def _rows(rows):
+    return [[row.port, row.text, row.color, row.mono] for row in rows]
+
+
+def _clusters(clusters):
+    return [
+        {"id": c.id, "label": c.label, "nodes": c.node_ids, "clusters": _clusters(c.clusters)}
+        for c in clusters
+    ]
+
+
+def model_payload(model):
+    """
+    A RenderModel as plain lists and dicts, as graph_view.js reads it.
+    Edges are [source, source_port, target, target_port, color, style,
+    label, mark] to keep large graphs small.
+    """
+    return {
+        "nodes": [
+            {
+                "id": node.id,
+                "header": [list(line) for line in node.header],
+                "body": node.body,
+                "inputs": _rows(node.inputs),
+                "outputs": _rows(node.outputs),
+                "dotted": node.dotted,
+                "mark": node.mark,
+            }
+            for node in model.nodes
+        ],
+        "edges": [
+            [e.source, e.source_port, e.target, e.target_port, e.color, e.style, e.label, e.mark]
+            for e in model.edges
+        ],
+        "clusters": _clusters(model.clusters),
+    }
+
+
+def client_graph_json(json_data, expand_depth=0, detail=AUTO, expanded=()):
+    """
+    The JSON graph_view draws for the graph (a dict or a GraphIR): the
+    same model create_node_graph or create_alt_node_graph_with_handles
+    would render, with the same duplicate and dangling markings.
+    """
+    graph = load_graph(json_data)
+    if graph.format == GRAPH_TRANSITIONS:
+        key = render_key("client_graph", graph.fingerprint(), format=graph.format)
+    else:
+        extra = {}
+        if node_graph_detail(graph, detail, expand_depth) == OVERVIEW:
+            expand_depth = 0
+            extra = {"detail": OVERVIEW, "expanded": sorted(expanded)}
+        elif expand_depth:
+            extra = {"expand": expand_depth}
+        key = render_key("client_graph", graph.fingerprint(), format=graph.format, **extra)
+
+    cached = render_cache.get(key, ext="json")
+    if cached is not None:
+        return cached.decode("utf-8")
+
+    if graph.format == GRAPH_TRANSITIONS:
+        with span("model"):
+            model = alt_node_graph_model(graph)
+    else:
+        model = node_graph_view_model(graph, expand_depth, detail, expanded)
+    with span("serialize") as s:
+        data = json.dumps(model_payload(model), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        s.size = len(data)
+    render_cache.put(key, data, ext="json")
+    return data.decode("utf-8")
+
+
+def graph_view(graph_json, key, height=CLIENT_GRAPH_HEIGHT):
+    """
+    Show graph_json (from client_graph_json) in the browser-side viewer.
+    Returns the id of the node the user last clicked, or None.
+    """
+    return _graph_view(graph=graph_json, height=height, key=key, default=None)
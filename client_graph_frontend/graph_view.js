@@ -0,0 +1,586 @@
+// Browser-side renderer for client_graph.py.
+//
+// Receives the compact render model (nodes with header lines and handle
+// rows, edges with their duplicate / dangling markings, clusters) through
+// the Streamlit component protocol, lays it out left to right with the
+// same layered algorithm as layered_layout.py, and draws it as SVG with
+// pan (drag), zoom (wheel, buttons) and fit (double-click). Clicking a
+// node sends its id back to Python.
+//
+// No build step and no network access: this file and index.html are all
+// there is.
+"use strict";
+
+const FONT_SIZE = 12;
+const LINE_HEIGHT = 16;
+const ROW_HEIGHT = 18;
+const PADDING = 8;
+const COLUMN_GAP = 16;
+const LAYER_GAP = 80;
+const NODE_GAP = 24;
+const DUMMY_GAP = 10;
+const MARGIN = 20;
+const ORDER_SWEEPS = 8;
+const PLACEMENT_PASSES = 8;
+const CLUSTER_PADDING = 12;
+const MIN_SCALE = 0.02;
+const MAX_SCALE = 8;
+const MARK_COLORS = {added: "#2a9d3a", changed: "#e08a00", removed: "#999999"};
+
+// ---------------------------------------------------------------------------
+// Streamlit component protocol
+
+function send(type, data) {
+  window.parent.postMessage(Object.assign({isStreamlitMessage: true, type: type}, data || {}), "*");
+}
+
+function setFrameHeight() {
+  send("streamlit:setFrameHeight", {height: document.body.scrollHeight});
+}
+
+function setValue(value) {
+  send("streamlit:setComponentValue", {value: value, dataType: "json"});
+}
+
+// ---------------------------------------------------------------------------
+// Measuring
+
+const measureContext = document.createElement("canvas").getContext("2d");
+
+function textWidth(text, mono, bold) {
+  measureContext.font = (bold ? "bold " : "") + FONT_SIZE + "px " +
+    (mono ? "monospace" : "Helvetica, Arial, sans-serif");
+  return measureContext.measureText(String(text)).width;
+}
+
+function makeBox(id, node) {
+  return {
+    id: id, node: node, dummy: node === null, width: 0, height: 0,
+    inPorts: new Map(), outPorts: new Map(), layer: 0, order: 0, x: 0, y: 0,
+  };
+}
+
+function measure(node) {
+  const box = makeBox(node.id, node);
+  if (node.dotted) {
+    box.width = textWidth(node.id) + 2 * PADDING;
+    box.height = LINE_HEIGHT + 2 * PADDING;
+    return box;
+  }
+  const widths = node.header.map(h => textWidth(h[0], h[2], h[3]));
+  const headerH = node.header.length * LINE_HEIGHT + PADDING;
+  let bodyH = 0;
+  if (node.body) {
+    node.body.forEach(line => widths.push(textWidth(line)));
+    bodyH = node.body.length * LINE_HEIGHT + PADDING;
+  }
+  const inW = node.inputs.reduce((w, r) => Math.max(w, textWidth(r[1], r[3])), 0);
+  const outW = node.outputs.reduce((w, r) => Math.max(w, textWidth(r[1], r[3])), 0);
+  widths.push(inW + outW + COLUMN_GAP);
+
+  const rows = Math.max(node.inputs.length, node.outputs.length, 1);
+  const rowsTop = headerH + bodyH + PADDING / 2;
+  node.inputs.forEach((r, i) => { if (r[0] !== null) box.inPorts.set(r[0], rowsTop + (i + 0.5) * ROW_HEIGHT); });
+  node.outputs.forEach((r, i) => { if (r[0] !== null) box.outPorts.set(r[0], rowsTop + (i + 0.5) * ROW_HEIGHT); });
+
+  box.width = Math.max(...widths) + 2 * PADDING;
+  box.height = headerH + bodyH + rows * ROW_HEIGHT + PADDING;
+  return box;
+}
+
+function portY(box, port, incoming) {
+  const ports = incoming ? box.inPorts : box.outPorts;
+  const offset = ports.get(port);
+  return offset === undefined ? box.height / 2 : offset;
+}
+
+// ---------------------------------------------------------------------------
+// Layered layout (see layered_layout.py for the Python original)
+
+function breakCycles(ids, pairs) {
+  const succ = new Map(ids.map(v => [v, []]));
+  pairs.forEach(([s, t], i) => succ.get(s).push([t, i]));
+  const state = new Map();  // 1 = on the DFS stack, 2 = finished
+  const back = new Set();
+  for (const root of ids) {
+    if (state.has(root)) continue;
+    state.set(root, 1);
+    const stack = [[root, 0]];
+    while (stack.length) {
+      const top = stack[stack.length - 1];
+      const out = succ.get(top[0]);
+      if (top[1] >= out.length) {
+        state.set(top[0], 2);
+        stack.pop();
+        continue;
+      }
+      const [w, i] = out[top[1]++];
+      const seen = state.get(w);
+      if (seen === 1) {
+        back.add(i);
+      } else if (seen === undefined) {
+        state.set(w, 1);
+        stack.push([w, 0]);
+      }
+    }
+  }
+  return back;
+}
+
+function assignLayers(ids, dagPairs) {
+  const succ = new Map(ids.map(v => [v, []]));
+  const indegree = new Map(ids.map(v => [v, 0]));
+  dagPairs.forEach(([u, v]) => { succ.get(u).push(v); indegree.set(v, indegree.get(v) + 1); });
+  const layer = new Map(ids.map(v => [v, 0]));
+  const ready = ids.filter(v => indegree.get(v) === 0);
+  while (ready.length) {
+    const u = ready.pop();
+    for (const v of succ.get(u)) {
+      layer.set(v, Math.max(layer.get(v), layer.get(u) + 1));
+      indegree.set(v, indegree.get(v) - 1);
+      if (indegree.get(v) === 0) ready.push(v);
+    }
+  }
+  return layer;
+}
+
+// Pool-adjacent-violators: the non-decreasing sequence closest to targets
+function isotonic(targets, weights) {
+  const blocks = [];  // [mean, weight, count]
+  targets.forEach((t, i) => {
+    blocks.push([t, weights[i], 1]);
+    while (blocks.length > 1 && blocks[blocks.length - 2][0] > blocks[blocks.length - 1][0]) {
+      const [m2, w2, c2] = blocks.pop();
+      const [m1, w1, c1] = blocks.pop();
+      blocks.push([(m1 * w1 + m2 * w2) / (w1 + w2), w1 + w2, c1 + c2]);
+    }
+  });
+  const result = [];
+  blocks.forEach(([mean, , count]) => { for (let i = 0; i < count; i++) result.push(mean); });
+  return result;
+}
+
+function computeLayout(graph) {
+  const boxes = new Map();
+  graph.nodes.forEach(node => boxes.set(node.id, measure(node)));
+  const ids = [...boxes.keys()];
+
+  const pairs = [];
+  const edgeIndex = [];
+  graph.edges.forEach((e, i) => {
+    if (boxes.has(e[0]) && boxes.has(e[2]) && e[0] !== e[2]) {
+      pairs.push([e[0], e[2]]);
+      edgeIndex.push(i);
+    }
+  });
+  const back = breakCycles(ids, pairs);
+  const dagPairs = pairs.map((p, k) => back.has(k) ? [p[1], p[0]] : p);
+  const layerOf = assignLayers(ids, dagPairs);
+  boxes.forEach((box, v) => { box.layer = layerOf.get(v); });
+
+  // Split long edges into chains of unit-length segments
+  const chains = new Map();
+  const segments = [];
+  dagPairs.forEach(([u, v], k) => {
+    const i = edgeIndex[k];
+    const e = graph.edges[i];
+    const reversed = back.has(k);
+    const outPort = reversed ? e[3] : e[1];
+    const inPort = reversed ? e[1] : e[3];
+    const chain = [u];
+    for (let step = boxes.get(u).layer + 1; step < boxes.get(v).layer; step++) {
+      const dummy = makeBox("\u0000" + i + ":" + step, null);
+      dummy.layer = step;
+      boxes.set(dummy.id, dummy);
+      chain.push(dummy.id);
+    }
+    chain.push(v);
+    chains.set(i, chain);
+    for (let j = 0; j + 1 < chain.length; j++) {
+      segments.push([chain[j], chain[j + 1], j === 0 ? outPort : null, j + 1 === chain.length - 1 ? inPort : null]);
+    }
+  });
+
+  let layerCount = 0;
+  boxes.forEach(box => { layerCount = Math.max(layerCount, box.layer + 1); });
+  const layers = Array.from({length: layerCount}, () => []);
+  boxes.forEach(box => layers[box.layer].push(box.id));
+  layers.forEach(nodes => nodes.forEach((v, order) => { boxes.get(v).order = order; }));
+
+  // Neighbours in the previous / next layer as [id, their port, own port]
+  const up = new Map();
+  const down = new Map();
+  boxes.forEach((box, v) => { up.set(v, []); down.set(v, []); });
+  segments.forEach(([a, b, aPort, bPort]) => {
+    down.get(a).push([b, bPort, aPort]);
+    up.get(b).push([a, aPort, bPort]);
+  });
+
+  function portFraction(box, port, incoming) {
+    if (box.dummy || !box.height) return 0.5;
+    return portY(box, port, incoming) / box.height;
+  }
+
+  function sweep(neighbours, incoming, range) {
+    for (const l of range) {
+      const keyed = layers[l].map(v => {
+        const adj = neighbours.get(v);
+        const own = boxes.get(v);
+        let bary = own.order + 0.5;
+        if (adj.length) {
+          bary = adj.reduce((sum, [w, p]) => sum + boxes.get(w).order + portFraction(boxes.get(w), p, !incoming), 0) / adj.length;
+        }
+        return [bary, own.order, v];
+      });
+      keyed.sort((a, b) => a[0] - b[0] || a[1] - b[1]);
+      layers[l] = keyed.map(k => k[2]);
+      layers[l].forEach((v, order) => { boxes.get(v).order = order; });
+    }
+  }
+
+  const forward = [];
+  for (let l = 1; l < layerCount; l++) forward.push(l);
+  const backward = [];
+  for (let l = layerCount - 2; l >= 0; l--) backward.push(l);
+  for (let i = 0; i < ORDER_SWEEPS; i++) {
+    sweep(up, true, forward);
+    sweep(down, false, backward);
+  }
+
+  // Horizontal placement: one column per layer
+  let x = MARGIN;
+  layers.forEach(nodes => {
+    const column = nodes.reduce((w, v) => Math.max(w, boxes.get(v).width), 0);
+    nodes.forEach(v => { const box = boxes.get(v); box.x = x + (column - box.width) / 2; });
+    x += column + LAYER_GAP;
+  });
+
+  // Vertical placement: start stacked, then pull towards neighbours
+  const gap = (a, b) => (a.dummy || b.dummy) ? DUMMY_GAP : NODE_GAP;
+  layers.forEach(nodes => {
+    let y = MARGIN;
+    nodes.forEach(v => { const box = boxes.get(v); box.y = y; y += box.height + NODE_GAP; });
+  });
+
+  function place(l, neighbours, incoming) {
+    const nodes = layers[l];
+    if (!nodes.length) return;
+    const targets = [], weights = [], offsets = [];
+    let offset = 0;
+    let prev = null;
+    nodes.forEach(v => {
+      const box = boxes.get(v);
+      if (prev !== null) offset += prev.height + gap(prev, box);
+      offsets.push(offset);
+      const adj = neighbours.get(v);
+      if (adj.length) {
+        let sum = 0;
+        adj.forEach(([w, p, ownPort]) => {
+          const other = boxes.get(w);
+          sum += other.y + portY(other, p, !incoming) - portY(box, ownPort, incoming);
+        });
+        targets.push(sum / adj.length - offset);
+        weights.push(adj.length);
+      } else {
+        targets.push(box.y - offset);
+        weights.push(0.1);
+      }
+      prev = box;
+    });
+    isotonic(targets, weights).forEach((z, i) => { boxes.get(nodes[i]).y = z + offsets[i]; });
+  }
+
+  for (let i = 0; i < PLACEMENT_PASSES; i++) {
+    if (i % 2 === 0) {
+      forward.forEach(l => place(l, up, true));
+    } else {
+      backward.forEach(l => place(l, down, false));
+    }
+  }
+
+  let top = Infinity;
+  boxes.forEach(box => { top = Math.min(top, box.y); });
+  if (top !== Infinity) boxes.forEach(box => { box.y += MARGIN - top; });
+
+  // Routes, parallel to graph.edges
+  const routes = graph.edges.map((e, i) => {
+    const source = boxes.get(e[0]);
+    const target = boxes.get(e[2]);
+    if (!source || !target) return [];
+    const start = [source.x + source.width, source.y + portY(source, e[1], false)];
+    const end = [target.x, target.y + portY(target, e[3], true)];
+    const chain = chains.get(i);
+    if (!chain) return [start, end];
+    const middle = chain.slice(1, -1).map(d => [boxes.get(d).x, boxes.get(d).y]);
+    if (chain[0] !== e[0]) {
+      // Reversed back edge: leave to the right, travel back through the
+      // dummies and come into the target from the left
+      middle.reverse();
+      return [start, [start[0] + LAYER_GAP / 2, start[1]], ...middle, [end[0] - LAYER_GAP / 2, end[1]], end];
+    }
+    return [start, ...middle, end];
+  });
+
+  const real = new Map();
+  let width = 0, height = 0;
+  boxes.forEach((box, v) => {
+    if (box.dummy) return;
+    real.set(v, box);
+    width = Math.max(width, box.x + box.width);
+    height = Math.max(height, box.y + box.height);
+  });
+  return {boxes: real, routes: routes, width: width + MARGIN, height: height + MARGIN};
+}
+
+// ---------------------------------------------------------------------------
+// Drawing
+
+function esc(text) {
+  return String(text).replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;");
+}
+
+function curve(points) {
+  const [x0, y0] = points[0];
+  const parts = ["M" + x0.toFixed(1) + "," + y0.toFixed(1)];
+  if (points.length === 2 && points[0][0] >= points[1][0] - 1) {
+    // Self loop or a target to the left: bow out above
+    const [x1, y1] = points[1];
+    const lift = Math.min(y0, y1) - 40;
+    parts.push("C" + (x0 + 40).toFixed(1) + "," + lift.toFixed(1) + " " + (x1 - 40).toFixed(1) + "," +
+               lift.toFixed(1) + " " + x1.toFixed(1) + "," + y1.toFixed(1));
+    return parts.join(" ");
+  }
+  for (let i = 0; i + 1 < points.length; i++) {
+    const [ax, ay] = points[i];
+    const [bx, by] = points[i + 1];
+    const dx = (bx - ax) / 2;
+    parts.push("C" + (ax + dx).toFixed(1) + "," + ay.toFixed(1) + " " + (bx - dx).toFixed(1) + "," +
+               by.toFixed(1) + " " + bx.toFixed(1) + "," + by.toFixed(1));
+  }
+  return parts.join(" ");
+}
+
+function edgeStroke(e) {
+  const mark = e[7];
+  return MARK_COLORS[mark] && e[4] === "black" ? MARK_COLORS[mark] : e[4];
+}
+
+function nodeSvg(box) {
+  const node = box.node;
+  const x = box.x, y = box.y;
+  let stroke = 'stroke="' + (MARK_COLORS[node.mark] || "black") + '"';
+  if (node.mark === "added" || node.mark === "changed") stroke += ' stroke-width="2.5"';
+  if (node.dotted || node.mark === "removed") stroke += ' stroke-dasharray="2,3"';
+  const out = ['<g class="node" data-id="' + esc(node.id) + '"' + (node.mark === "removed" ? ' opacity="0.45"' : "") + ">"];
+  out.push('<title>' + esc(node.id) + '</title>');
+  out.push('<rect class="frame" x="' + x.toFixed(1) + '" y="' + y.toFixed(1) + '" width="' + box.width.toFixed(1) +
+           '" height="' + box.height.toFixed(1) + '" fill="white" ' + stroke + "/>");
+  if (node.dotted) {
+    out.push('<text x="' + (x + box.width / 2).toFixed(1) + '" y="' + (y + box.height / 2 + 4).toFixed(1) +
+             '" text-anchor="middle">' + esc(node.id) + "</text></g>");
+    return out.join("");
+  }
+  let lineY = y + PADDING / 2 + LINE_HEIGHT * 0.8;
+  node.header.forEach(([text, color, mono, bold]) => {
+    out.push('<text x="' + (x + box.width / 2).toFixed(1) + '" y="' + lineY.toFixed(1) + '" text-anchor="middle" fill="' +
+             esc(color) + '"' + (mono ? ' font-family="monospace"' : "") + (bold ? ' font-weight="bold"' : "") + ">" +
+             esc(text) + "</text>");
+    lineY += LINE_HEIGHT;
+  });
+  if (node.body) {
+    lineY += PADDING / 2;
+    node.body.forEach(line => {
+      out.push('<text x="' + (x + PADDING).toFixed(1) + '" y="' + lineY.toFixed(1) + '">' + esc(line) + "</text>");
+      lineY += LINE_HEIGHT;
+    });
+    lineY += PADDING / 2;
+  }
+  const rowsTop = lineY - LINE_HEIGHT * 0.8 + PADDING / 2;
+  [[node.inputs, "start", x + PADDING], [node.outputs, "end", x + box.width - PADDING]].forEach(([rows, anchor, tx]) => {
+    rows.forEach(([, text, color, mono], i) => {
+      const ry = rowsTop + (i + 0.5) * ROW_HEIGHT + FONT_SIZE * 0.35;
+      out.push('<text x="' + tx.toFixed(1) + '" y="' + ry.toFixed(1) + '" text-anchor="' + anchor + '" fill="' + esc(color) +
+               '"' + (mono ? ' font-family="monospace"' : "") + ">" + esc(text) + "</text>");
+    });
+  });
+  out.push("</g>");
+  return out.join("");
+}
+
+// Bounding boxes of clusters (and their nested clusters), outermost last
+function clusterSvg(clusters, boxes, out) {
+  let bounds = null;
+  clusters.forEach(cluster => {
+    let b = clusterSvg(cluster.clusters || [], boxes, out);
+    cluster.nodes.forEach(id => {
+      const box = boxes.get(id);
+      if (!box) return;
+      const nb = [box.x, box.y, box.x + box.width, box.y + box.height];
+      b = b ? [Math.min(b[0], nb[0]), Math.min(b[1], nb[1]), Math.max(b[2], nb[2]), Math.max(b[3], nb[3])] : nb;
+    });
+    if (!b) return;
+    const x0 = b[0] - CLUSTER_PADDING, y0 = b[1] - CLUSTER_PADDING - LINE_HEIGHT;
+    const x1 = b[2] + CLUSTER_PADDING, y1 = b[3] + CLUSTER_PADDING;
+    out.push('<rect x="' + x0.toFixed(1) + '" y="' + y0.toFixed(1) + '" width="' + (x1 - x0).toFixed(1) + '" height="' +
+             (y1 - y0).toFixed(1) + '" rx="8" fill="none" stroke="#666" stroke-dasharray="6,4"/>');
+    out.push('<text x="' + (x0 + 8).toFixed(1) + '" y="' + (y0 + LINE_HEIGHT - 2).toFixed(1) + '" fill="#444">' +
+             esc(cluster.label) + "</text>");
+    const outer = [x0, y0, x1, y1];
+    bounds = bounds ? [Math.min(bounds[0], outer[0]), Math.min(bounds[1], outer[1]),
+                       Math.max(bounds[2], outer[2]), Math.max(bounds[3], outer[3])] : outer;
+  });
+  return bounds;
+}
+
+function drawGraph(graph, layout) {
+  const strokes = graph.edges.map(edgeStroke);
+  const colors = [...new Set(strokes)].sort();
+  const markerIds = new Map(colors.map((c, i) => [c, "arrow" + i]));
+  const out = ["<defs>"];
+  markerIds.forEach((id, color) => {
+    out.push('<marker id="' + id + '" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" markerHeight="8" ' +
+             'orient="auto-start-reverse"><path d="M0,0 L10,5 L0,10 z" fill="' + esc(color) + '"/></marker>');
+  });
+  out.push("</defs>");
+
+  const clusterOut = [];
+  const bounds = clusterSvg(graph.clusters || [], layout.boxes, clusterOut);
+  out.push(...clusterOut);
+
+  graph.edges.forEach((e, i) => {
+    const points = layout.routes[i];
+    if (!points.length) return;
+    const dash = e[5] === "dotted" || e[7] === "removed" ? ' stroke-dasharray="2,3"' : "";
+    const width = e[7] === "added" ? ' stroke-width="2"' : "";
+    out.push('<path d="' + curve(points) + '" fill="none" stroke="' + esc(strokes[i]) + '"' + dash + width +
+             ' marker-end="url(#' + markerIds.get(strokes[i]) + ')"/>');
+    if (e[6]) {
+      const a = points[Math.floor(points.length / 2) - (points.length % 2 === 0 ? 1 : 0)];
+      const b = points[Math.floor(points.length / 2)];
+      out.push('<text x="' + ((a[0] + b[0]) / 2).toFixed(1) + '" y="' + ((a[1] + b[1]) / 2 - 4).toFixed(1) +
+               '" text-anchor="middle" font-size="' + (FONT_SIZE - 1) + '" fill="' + esc(strokes[i]) + '">' +
+               esc(e[6]) + "</text>");
+    }
+  });
+  layout.boxes.forEach(box => out.push(nodeSvg(box)));
+
+  let [minX, minY, maxX, maxY] = [0, 0, layout.width, layout.height];
+  if (bounds) {
+    minX = Math.min(minX, bounds[0] - MARGIN);
+    minY = Math.min(minY, bounds[1] - MARGIN);
+    maxX = Math.max(maxX, bounds[2] + MARGIN);
+    maxY = Math.max(maxY, bounds[3] + MARGIN);
+  }
+  return {svg: out.join(""), extent: [minX, minY, maxX, maxY]};
+}
+
+// ---------------------------------------------------------------------------
+// View: pan, zoom, selection
+
+const view = document.getElementById("view");
+const status = document.getElementById("status");
+const state = {graphText: null, extent: [0, 0, 1, 1], scale: 1, tx: 0, ty: 0, selected: null, scene: null};
+
+function applyTransform() {
+  if (state.scene) {
+    state.scene.setAttribute("transform", "translate(" + state.tx + "," + state.ty + ") scale(" + state.scale + ")");
+  }
+}
+
+function fit() {
+  const [minX, minY, maxX, maxY] = state.extent;
+  const w = view.clientWidth || 800, h = view.clientHeight || 600;
+  state.scale = Math.min(w / (maxX - minX), h / (maxY - minY), 1.5);
+  state.tx = (w - (maxX - minX) * state.scale) / 2 - minX * state.scale;
+  state.ty = (h - (maxY - minY) * state.scale) / 2 - minY * state.scale;
+  applyTransform();
+}
+
+function zoomAt(factor, cx, cy) {
+  const scale = Math.min(MAX_SCALE, Math.max(MIN_SCALE, state.scale * factor));
+  factor = scale / state.scale;
+  state.tx = cx - (cx - state.tx) * factor;
+  state.ty = cy - (cy - state.ty) * factor;
+  state.scale = scale;
+  applyTransform();
+}
+
+function select(id) {
+  view.querySelectorAll(".node.selected").forEach(n => n.classList.remove("selected"));
+  state.selected = id;
+  if (id === null) return;
+  view.querySelectorAll(".node").forEach(n => { if (n.dataset.id === id) n.classList.add("selected"); });
+}
+
+view.addEventListener("wheel", event => {
+  event.preventDefault();
+  const rect = view.getBoundingClientRect();
+  zoomAt(Math.exp(-event.deltaY * 0.0015), event.clientX - rect.left, event.clientY - rect.top);
+}, {passive: false});
+
+let drag = null;
+view.addEventListener("pointerdown", event => {
+  drag = {x: event.clientX, y: event.clientY, tx: state.tx, ty: state.ty, moved: false};
+  view.setPointerCapture(event.pointerId);
+});
+view.addEventListener("pointermove", event => {
+  if (!drag) return;
+  const dx = event.clientX - drag.x, dy = event.clientY - drag.y;
+  if (!drag.moved && Math.abs(dx) + Math.abs(dy) < 4) return;
+  drag.moved = true;
+  view.classList.add("dragging");
+  state.tx = drag.tx + dx;
+  state.ty = drag.ty + dy;
+  applyTransform();
+});
+view.addEventListener("pointerup", event => {
+  const wasDrag = drag && drag.moved;
+  drag = null;
+  view.classList.remove("dragging");
+  if (wasDrag) return;
+  const target = document.elementFromPoint(event.clientX, event.clientY);
+  const node = target && target.closest ? target.closest(".node") : null;
+  const id = node ? node.dataset.id : null;
+  if (id !== state.selected) {
+    select(id);
+    setValue(id);
+  }
+});
+view.addEventListener("dblclick", fit);
+document.getElementById("fit").addEventListener("click", fit);
+document.getElementById("zoom-in").addEventListener("click", () => zoomAt(1.25, view.clientWidth / 2, view.clientHeight / 2));
+document.getElementById("zoom-out").addEventListener("click", () => zoomAt(0.8, view.clientWidth / 2, view.clientHeight / 2));
+
+function render(args) {
+  view.style.height = (args.height || 600) + "px";
+  if (args.graph !== state.graphText) {
+    state.graphText = args.graph;
+    const started = performance.now();
+    const graph = JSON.parse(args.graph);
+    const layout = computeLayout(graph);
+    const drawn = drawGraph(graph, layout);
+    view.innerHTML = '<rect width="100%" height="100%" fill="white"/><g id="scene" font-family="Helvetica, Arial, sans-serif" font-size="' +
+                     FONT_SIZE + '">' + drawn.svg + "</g>";
+    state.scene = document.getElementById("scene");
+    state.extent = drawn.extent;
+    status.textContent = graph.nodes.length + " nodes, " + graph.edges.length + " edges, laid out in " +
+                         Math.round(performance.now() - started) + " ms";
+    fit();
+    select(state.selected);
+  }
+  setFrameHeight();
+}
+
+window.addEventListener("message", event => {
+  const message = event.data;
+  if (message && message.type === "streamlit:render") {
+    try {
+      render(message.args);
+    } catch (err) {
+      status.textContent = "Could not draw the graph: " + err;
+      setFrameHeight();
+    }
+  }
+});
+
+send("streamlit:componentReady", {apiVersion: 1});
@@ -0,0 +1,411 @@
+"""
+Compact intermediate representation shared by both input formats.
+
+load_graph() detects the format and builds a GraphIR:
+
+  * React Flow style: {"nodes": [{"id", "data": {"name", "handlers"}}], "edges": [...]}
+  * graph/transitions: {"graph": {"nodes", "edges"}, "transitions": [...]}
+
+Ids and type strings are interned, records use __slots__, and the id and
+handle indexes are dicts/sets, so resolving an edge endpoint is O(1).
+Only the fields the renderers read are kept.
+
+Group nodes carry their nested workflow as a child GraphIR, to any depth.
+GraphIR.hierarchy() indexes all of them in one walk.
+"""
+import hashlib
+import sys
+from collections import Counter
+
+REACT_FLOW = "react_flow"
+GRAPH_TRANSITIONS = "graph_transitions"
+
+INPUT = "input"
+OUTPUT = "output"
+
+# Version of the pickled state of the IR classes below. Bump it whenever
+# their __slots__ or __getstate__ change, so stored pickles (snapshot
+# store) from older code are discarded instead of loaded.
+IR_PICKLE_VERSION = 1
+
+_intern = sys.intern
+
+
+def _istr(value):
+    return _intern(value) if isinstance(value, str) else value
+
+
+class IRHandle:
+    __slots__ = ("id", "type", "direction")
+
+    def __init__(self, id, type, direction):
+        self.id = id
+        self.type = type
+        self.direction = direction
+
+
+class IRNode:
+    """
+    One node. attributes holds (name, value) pairs for graph/transitions
+    data, and group holds the nested GraphIR of a group node.
+    """
+    __slots__ = ("id", "name", "kind", "handles", "attributes", "group")
+
+    def __init__(self, id, name="", kind=None, handles=(), attributes=(), group=None):
+        self.id = id
+        self.name = name
+        self.kind = kind
+        self.handles = tuple(handles)
+        self.attributes = tuple(attributes)
+        self.group = group
+
+    @property
+    def inputs(self):
+        return [h for h in self.handles if h.direction == INPUT]
+
+    @property
+    def outputs(self):
+        return [h for h in self.handles if h.direction == OUTPUT]
+
+
+class IREdge:
+    """
+    A data edge between handles, or (kind="transition") a labelled
+    control-flow edge between nodes.
+    """
+    __slots__ = ("source", "source_handle", "target", "target_handle", "kind", "label")
+
+    def __init__(self, source, source_handle, target, target_handle, kind="data", label=None):
+        self.source = source
+        self.source_handle = source_handle
+        self.target = target
+        self.target_handle = target_handle
+        self.kind = kind
+        self.label = label
+
+
+class GraphIR:
+    """
+    Node, handle and edge tables for one graph plus lookup indexes.
+
+    node_handles maps a node id to the set of its handle ids. For a
+    duplicated node id the last definition wins, which matches what
+    Graphviz draws. node_id_counts and handle_id_counts flag duplicates.
+    """
+    __slots__ = ("format", "nodes", "edges", "node_handles", "node_id_counts",
+                 "handle_id_counts", "_fingerprint", "_hierarchy", "_adjacency")
+
+    def __init__(self, format, nodes, edges):
+        self.format = format
+        self.nodes = nodes
+        self.edges = edges
+        self.node_handles = {}
+        self.node_id_counts = Counter()
+        self.handle_id_counts = Counter()
+        for node in nodes:
+            self.node_id_counts[node.id] += 1
+            self.node_handles[node.id] = {h.id for h in node.handles}
+            self.handle_id_counts.update(h.id for h in node.handles)
+        self._fingerprint = None
+        self._hierarchy = None
+        self._adjacency = None
+
+    def __getstate__(self):
+        # The indexes are rebuilt on load, so pickles (snapshot store,
+        # render worker arguments) carry only the tables
+        return self.format, self.nodes, self.edges, self._fingerprint
+
+    def __setstate__(self, state):
+        format, nodes, edges, fingerprint = state
+        self.__init__(format, nodes, edges)
+        self._fingerprint = fingerprint
+
+    def has_node(self, node_id):
+        return node_id in self.node_handles
+
+    def has_handle(self, node_id, handle_id):
+        handles = self.node_handles.get(node_id)
+        return handles is not None and handle_id in handles
+
+    def group_subgraphs(self):
+        """
+        (group_node_id, group_node_name, group GraphIR) for every group
+        node, like workflows.get_group_subgraphs.
+        """
+        return [
+            (node.id, node.name or "Untitled group", node.group)
+            for node in self.nodes
+            if node.group is not None
+        ]
+
+    def hierarchy(self):
+        """
+        The GroupHierarchy over all nested group nodes, built on first use
+        and kept for the lifetime of this GraphIR.
+        """
+        if self._hierarchy is None:
+            self._hierarchy = GroupHierarchy(self)
+        return self._hierarchy
+
+    def adjacency(self):
+        """
+        The Adjacency index over this graph's edges, built on first use.
+        """
+        if self._adjacency is None:
+            self._adjacency = Adjacency(self)
+        return self._adjacency
+
+    def fingerprint(self):
+        """
+        Stable content hash over everything the renderers draw, used as
+        the render cache key.
+        """
+        if self._fingerprint is None:
+            h = hashlib.sha256(self.format.encode("utf-8"))
+            for node in self.nodes:
+                h.update(repr((
+                    node.id, node.name, node.kind,
+                    tuple((x.id, x.type, x.direction) for x in node.handles),
+                    node.attributes,
+                    node.group.fingerprint() if node.group is not None else None,
+                )).encode("utf-8"))
+            for edge in self.edges:
+                h.update(repr((
+                    edge.source, edge.source_handle, edge.target, edge.target_handle,
+                    edge.kind, edge.label,
+                )).encode("utf-8"))
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def to_dict(self):
+        """
+        React Flow style dict with the same fields filter_graph_data keeps.
+        """
+        return {
+            "nodes": [
+                {
+                    "id": node.id,
+                    "data": {
+                        "name": node.name,
+                        "handlers": [
+                            {"id": h.id, "type": h.type, "handlerType": h.direction}
+                            for h in node.handles
+                        ],
+                    },
+                }
+                for node in self.nodes
+            ],
+            "edges": [
+                {
+                    "source": edge.source,
+                    "sourceHandle": edge.source_handle,
+                    "target": edge.target,
+                    "targetHandle": edge.target_handle,
+                }
+                for edge in self.edges
+                if edge.kind == "data"
+            ],
+        }
+
+
+class Adjacency:
+    """
+    Position indexes of one GraphIR for traversal queries. node_positions
+    maps a node id to its positions in graph.nodes (several for duplicate
+    ids). out_edges and in_edges map a node id to the positions of its
+    edges in graph.edges; out_handle and in_handle do the same per
+    (node id, handle id). Edge endpoints that are not defined nodes are
+    indexed too.
+    """
+    __slots__ = ("node_positions", "out_edges", "in_edges", "out_handle", "in_handle")
+
+    def __init__(self, graph):
+        self.node_positions = {}
+        for i, node in enumerate(graph.nodes):
+            self.node_positions.setdefault(node.id, []).append(i)
+        self.out_edges = {}
+        self.in_edges = {}
+        self.out_handle = {}
+        self.in_handle = {}
+        for i, edge in enumerate(graph.edges):
+            self.out_edges.setdefault(edge.source, []).append(i)
+            self.in_edges.setdefault(edge.target, []).append(i)
+            self.out_handle.setdefault((edge.source, edge.source_handle), []).append(i)
+            self.in_handle.setdefault((edge.target, edge.target_handle), []).append(i)
+
+
+class GroupEntry:
+    """
+    One group in a GroupHierarchy. path is the tuple of group node ids from
+    the top-level graph down to this group; the root entry has path ().
+    """
+    __slots__ = ("path", "name", "graph", "children")
+
+    def __init__(self, path, name, graph):
+        self.path = path
+        self.name = name
+        self.graph = graph
+        self.children = []
+
+    @property
+    def depth(self):
+        return len(self.path)
+
+
+class GroupHierarchy:
+    """
+    Index of every group node nested under a GraphIR, keyed by path.
+
+    Built in a single iterative walk, so arbitrarily deep nesting neither
+    recurses nor needs rescanning. The child graphs are the GraphIR
+    objects already held by the group nodes, so their fingerprints and
+    render cache keys are computed once and shared with the parent.
+    """
+    __slots__ = ("root", "entries")
+
+    def __init__(self, graph):
+        self.root = GroupEntry((), "", graph)
+        self.entries = {(): self.root}
+        stack = [self.root]
+        while stack:
+            entry = stack.pop()
+            for node_id, name, group in entry.graph.group_subgraphs():
+                child = GroupEntry(entry.path + (node_id,), name, group)
+                entry.children.append(child)
+                self.entries[child.path] = child
+                stack.append(child)
+
+    def __len__(self):
+        return len(self.entries) - 1
+
+    def get(self, path):
+        return self.entries.get(tuple(path))
+
+    def walk(self, max_depth=None):
+        """
+        Group entries in depth-first display order, without the root.
+        """
+        out = []
+        stack = list(reversed(self.root.children))
+        while stack:
+            entry = stack.pop()
+            out.append(entry)
+            if max_depth is None or entry.depth < max_depth:
+                stack.extend(reversed(entry.children))
+        return out
+
+    def breadcrumbs(self, path):
+        """
+        Names of the groups along path, outermost first.
+        """
+        return [self.entries[tuple(path[:i])].name for i in range(1, len(path) + 1)]
+
+    def size(self, max_depth=0):
+        """
+        (node_count, edge_count) of the graph with every group down to
+        max_depth levels expanded inline.
+        """
+        nodes = len(self.root.graph.nodes)
+        edges = len(self.root.graph.edges)
+        for entry in self.walk(max_depth):
+            if entry.depth <= max_depth:
+                nodes += len(entry.graph.nodes)
+                edges += len(entry.graph.edges)
+        return nodes, edges
+
+
+def detect_format(data):
+    if isinstance(data, dict) and isinstance(data.get("graph"), dict):
+        return GRAPH_TRANSITIONS
+    return REACT_FLOW
+
+
+def react_flow_node(node):
+    """
+    Build an IRNode from one React Flow node dict.
+    """
+    data = node.get("data") or {}
+    handles = [
+        IRHandle(
+            _istr(h["id"]),
+            _istr(h["type"]),
+            INPUT if h["handlerType"].lower() == INPUT else OUTPUT,
+        )
+        for h in data.get("handlers", [])
+    ]
+    group = None
+    if data.get("isGroup") and "groupNodeData" in data:
+        gdata = data["groupNodeData"].get("workflow")
+        if gdata:
+            group = load_react_flow(gdata)
+    return IRNode(_istr(node["id"]), data.get("name", ""), handles=handles, group=group)
+
+
+def react_flow_edge(edge):
+    """
+    Build an IREdge from one React Flow edge dict. A missing handle key
+    becomes "NONE", as in create_node_graph.
+    """
+    return IREdge(
+        _istr(edge["source"]),
+        _istr(edge.get("sourceHandle", "NONE")),
+        _istr(edge["target"]),
+        _istr(edge.get("targetHandle", "NONE")),
+    )
+
+
+def load_react_flow(data):
+    nodes = [react_flow_node(node) for node in data.get("nodes", [])]
+    edges = [react_flow_edge(edge) for edge in data.get("edges", [])]
+    return GraphIR(REACT_FLOW, nodes, edges)
+
+
+def load_graph_transitions(data):
+    graph = data.get("graph", {})
+
+    # Ports exist only through the edges that use them
+    input_ports = {}
+    output_ports = {}
+    edges = []
+    for edge in graph.get("edges", []):
+        from_node = _istr(edge["from"]["node"])
+        to_node = _istr(edge["to"]["node"])
+        out_name = _istr(edge["from"].get("output", ""))
+        in_name = _istr(edge["to"].get("input", ""))
+        if out_name:
+            output_ports.setdefault(from_node, set()).add(out_name)
+        if in_name:
+            input_ports.setdefault(to_node, set()).add(in_name)
+        edges.append(IREdge(from_node, out_name, to_node, in_name))
+
+    for t in data.get("transitions", []):
+        edges.append(IREdge(
+            _istr(t["from"]), None, _istr(t["to"]), None,
+            kind="transition", label=t.get("method", {}).get("type", ""),
+        ))
+
+    nodes = []
+    for node in graph.get("nodes", []):
+        node_id = _istr(node["id"])
+        handles = [IRHandle(p, None, INPUT) for p in sorted(input_ports.get(node_id, ()))]
+        handles += [IRHandle(p, None, OUTPUT) for p in sorted(output_ports.get(node_id, ()))]
+        attributes = [(a["name"], str(a["value"])) for a in node.get("attributes", [])]
+        nodes.append(IRNode(
+            node_id,
+            kind=_istr(node.get("type", "Untitled")),
+            handles=handles,
+            attributes=attributes,
+        ))
+    return GraphIR(GRAPH_TRANSITIONS, nodes, edges)
+
+
+def load_graph(data):
+    """
+    Return a GraphIR for data in either input format. A GraphIR is
+    returned unchanged.
+    """
+    if isinstance(data, GraphIR):
+        return data
+    if detect_format(data) == GRAPH_TRANSITIONS:
+        return load_graph_transitions(data)
+    return load_react_flow(data)
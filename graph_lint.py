@@ -0,0 +1,264 @@
+"""
+Integrity checks for workflow graphs, without rendering anything.
+
+lint_graph() runs over a GraphIR in one pass over its indexed nodes and
+edges (and the same for every nested group) and returns a LintReport.
+It finds the problems create_node_graph marks in red or dotted, and a
+few more:
+
+  duplicate-node-id       error    node id defined more than once
+  duplicate-handle-id     error    handle id used more than once
+  dangling-source         error    edge source is not a node
+  dangling-target         error    edge target is not a node
+  missing-target-handle   error    target node lacks the edge's handle
+  missing-source-handle   warning  source node lacks the edge's handle
+  handle-direction        warning  edge leaves an input or enters an output
+  self-loop               warning  edge from a node to itself
+  isolated-node           info     node without any edge
+
+Run it as a script to lint JSON files or every workflow of a workspace:
+
+  python graph_lint.py workflow.json other.json
+  python graph_lint.py --workspace https://.../workspaces/<id>
+"""
+import argparse
+import itertools
+import json
+import sys
+
+from graph_ir import GRAPH_TRANSITIONS, INPUT, OUTPUT, load_graph
+from graph_stream import CHUNK_SIZE, load_graph_stream
+
+ERROR = "error"
+WARNING = "warning"
+INFO = "info"
+SEVERITIES = (ERROR, WARNING, INFO)
+
+
+class LintIssue:
+    """
+    One finding. path is the tuple of group node ids leading to the graph
+    the issue is in; () for the top-level graph.
+    """
+    __slots__ = ("code", "severity", "message", "path", "node", "handle")
+
+    def __init__(self, code, severity, message, path=(), node=None, handle=None):
+        self.code = code
+        self.severity = severity
+        self.message = message
+        self.path = path
+        self.node = node
+        self.handle = handle
+
+    def to_dict(self):
+        return {
+            "code": self.code,
+            "severity": self.severity,
+            "message": self.message,
+            "path": list(self.path),
+            "node": self.node,
+            "handle": self.handle,
+        }
+
+    def __str__(self):
+        where = " / ".join(self.path)
+        return f"{self.severity}: {self.code}: {self.message}" + (f" (in group {where})" if where else "")
+
+
+class LintReport:
+    """
+    All issues found in a graph and its nested groups.
+    """
+    __slots__ = ("issues", "node_count", "edge_count")
+
+    def __init__(self, issues, node_count, edge_count):
+        self.issues = issues
+        self.node_count = node_count
+        self.edge_count = edge_count
+
+    def count(self, severity):
+        return sum(1 for issue in self.issues if issue.severity == severity)
+
+    @property
+    def ok(self):
+        return self.count(ERROR) == 0
+
+    def failed(self, fail_on=ERROR):
+        """
+        True if there is an issue at fail_on severity or worse.
+        """
+        levels = SEVERITIES[:SEVERITIES.index(fail_on) + 1]
+        return any(issue.severity in levels for issue in self.issues)
+
+    def summary(self):
+        return (
+            f"{self.count(ERROR)} errors, {self.count(WARNING)} warnings, "
+            f"{self.count(INFO)} notes in {self.node_count} nodes / {self.edge_count} edges"
+        )
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "nodes": self.node_count,
+            "edges": self.edge_count,
+            "counts": {severity: self.count(severity) for severity in SEVERITIES},
+            "issues": [issue.to_dict() for issue in self.issues],
+        }
+
+
+def _lint_one(graph, path, issues):
+    for node_id, count in graph.node_id_counts.items():
+        if count > 1:
+            issues.append(LintIssue(
+                "duplicate-node-id", ERROR, f"node {node_id} is defined {count} times", path, node_id,
+            ))
+    for handle_id, count in graph.handle_id_counts.items():
+        if count > 1:
+            issues.append(LintIssue(
+                "duplicate-handle-id", ERROR, f"handle {handle_id} is used {count} times", path,
+                handle=handle_id,
+            ))
+
+    directions = {}
+    for node in graph.nodes:
+        for h in node.handles:
+            directions[(node.id, h.id)] = h.direction
+
+    connected = set()
+    for edge in graph.edges:
+        connected.add(edge.source)
+        connected.add(edge.target)
+        label = f"edge {edge.source} -> {edge.target}"
+        if edge.source == edge.target:
+            issues.append(LintIssue("self-loop", WARNING, f"{label} is a self-loop", path, edge.source))
+
+        s_valid = graph.has_node(edge.source)
+        t_valid = graph.has_node(edge.target)
+        if not s_valid:
+            issues.append(LintIssue(
+                "dangling-source", ERROR, f"{label}: source node does not exist", path, edge.source,
+            ))
+        if not t_valid:
+            issues.append(LintIssue(
+                "dangling-target", ERROR, f"{label}: target node does not exist", path, edge.target,
+            ))
+        if edge.kind != "data" or graph.format == GRAPH_TRANSITIONS:
+            # Transitions have no handles, and graph/transitions ports are
+            # derived from the edges themselves
+            continue
+
+        if t_valid and not graph.has_handle(edge.target, edge.target_handle):
+            issues.append(LintIssue(
+                "missing-target-handle", ERROR,
+                f"{label}: target has no handle {edge.target_handle}", path, edge.target, edge.target_handle,
+            ))
+        elif directions.get((edge.target, edge.target_handle)) == OUTPUT:
+            issues.append(LintIssue(
+                "handle-direction", WARNING,
+                f"{label}: enters output handle {edge.target_handle}", path, edge.target, edge.target_handle,
+            ))
+        if s_valid and not graph.has_handle(edge.source, edge.source_handle):
+            issues.append(LintIssue(
+                "missing-source-handle", WARNING,
+                f"{label}: source has no handle {edge.source_handle}", path, edge.source, edge.source_handle,
+            ))
+        elif directions.get((edge.source, edge.source_handle)) == INPUT:
+            issues.append(LintIssue(
+                "handle-direction", WARNING,
+                f"{label}: leaves input handle {edge.source_handle}", path, edge.source, edge.source_handle,
+            ))
+
+    if len(graph.nodes) > 1:
+        for node in graph.nodes:
+            if node.id not in connected:
+                issues.append(LintIssue("isolated-node", INFO, f"node {node.id} has no edges", path, node.id))
+
+
+def lint_graph(data):
+    """
+    Lint a graph in either input format (a dict or a GraphIR), including
+    all nested group nodes, and return a LintReport.
+    """
+    graph = load_graph(data)
+    issues = []
+    node_count = edge_count = 0
+    for entry in [graph.hierarchy().root] + graph.hierarchy().walk():
+        _lint_one(entry.graph, entry.path, issues)
+        node_count += len(entry.graph.nodes)
+        edge_count += len(entry.graph.edges)
+    return LintReport(issues, node_count, edge_count)
+
+
+def _file_graphs(paths):
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                yield path, load_graph_stream(iter(lambda: f.read(CHUNK_SIZE), ""))
+        except (OSError, ValueError, KeyError) as err:
+            print(f"Could not read {path}: {err}", file=sys.stderr)
+            yield path, None
+
+
+def _workspace_graphs(workspace_url):
+    """
+    (name, GraphIR) for each workflow of a workspace. Failing to log in,
+    or finding no workflows, yields (workspace_url, None) so that main()
+    counts it as a failure.
+    """
+    # Imported here so file linting needs no credentials or network
+    from workflows import auth, get_workflow_graph, get_workflows_from_url
+
+    token = auth()
+    if not token:
+        print("Authentication failed.", file=sys.stderr)
+        yield workspace_url, None
+        return
+    workflows = get_workflows_from_url(workspace_url, token)
+    if not workflows:
+        print(f"No workflows found for {workspace_url}", file=sys.stderr)
+        yield workspace_url, None
+        return
+    for wf_id, wf_name in workflows:
+        name = f"{wf_name} ({wf_id})"
+        graph = get_workflow_graph(token, wf_id)
+        if graph is None:
+            print(f"Could not fetch the graph of {name}", file=sys.stderr)
+        yield name, graph
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lint workflow graphs without rendering them.")
+    parser.add_argument("files", nargs="*", help="JSON files in either input format")
+    parser.add_argument("--workspace", help="lint every workflow of this workspace URL")
+    parser.add_argument("--json", action="store_true", help="print one JSON report per graph")
+    parser.add_argument("--fail-on", choices=SEVERITIES + ("never",), default=ERROR,
+                        help="exit with status 1 if any graph has an issue this severe (default: error)")
+    parser.add_argument("--quiet", action="store_true", help="print only the per-graph summaries")
+    args = parser.parse_args(argv)
+    if not args.files and not args.workspace:
+        parser.error("give JSON files or --workspace")
+
+    graphs = _file_graphs(args.files)
+    if args.workspace:
+        graphs = itertools.chain(graphs, _workspace_graphs(args.workspace))
+
+    failed = False
+    for name, graph in graphs:
+        if graph is None:
+            failed = True
+            continue
+        report = lint_graph(graph)
+        if args.fail_on != "never" and report.failed(args.fail_on):
+            failed = True
+        if args.json:
+            print(json.dumps({"graph": name, **report.to_dict()}))
+            continue
+        print(f"{name}: {report.summary()}")
+        if not args.quiet:
+            for issue in report.issues:
+                print(f"  {issue}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
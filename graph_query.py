@@ -0,0 +1,109 @@
+"""
+Focused slices of large graphs.
+
+The queries walk GraphIR.adjacency() and return a set of node ids, and
+slice_graph() turns such a set into a smaller GraphIR for the renderers.
+Edges that cross the cut are kept, so their outside endpoints are drawn
+as dotted stub nodes, like any node an edge references but the data
+lacks. Every step costs time in proportion to the slice, not the graph.
+"""
+from graph_ir import GraphIR
+
+DOWNSTREAM = "downstream"
+UPSTREAM = "upstream"
+BOTH = "both"
+DIRECTIONS = (BOTH, DOWNSTREAM, UPSTREAM)
+
+
+def _neighbours(graph, node_id, direction):
+    adjacency = graph.adjacency()
+    edges = graph.edges
+    if direction in (DOWNSTREAM, BOTH):
+        for i in adjacency.out_edges.get(node_id, ()):
+            yield edges[i].target
+    if direction in (UPSTREAM, BOTH):
+        for i in adjacency.in_edges.get(node_id, ()):
+            yield edges[i].source
+
+
+def neighborhood(graph, node_id, hops=1, direction=BOTH):
+    """
+    Ids of the nodes at most hops edges away from node_id.
+    """
+    seen = {node_id}
+    frontier = [node_id]
+    for _ in range(hops):
+        next_frontier = []
+        for current in frontier:
+            for other in _neighbours(graph, current, direction):
+                if other not in seen:
+                    seen.add(other)
+                    next_frontier.append(other)
+        if not next_frontier:
+            break
+        frontier = next_frontier
+    return seen
+
+
+def reachable(graph, start_ids, direction=DOWNSTREAM):
+    """
+    Ids of start_ids and every node reachable from them.
+    """
+    seen = set(start_ids)
+    stack = list(seen)
+    while stack:
+        current = stack.pop()
+        for other in _neighbours(graph, current, direction):
+            if other not in seen:
+                seen.add(other)
+                stack.append(other)
+    return seen
+
+
+def path_nodes(graph, source_id, target_id):
+    """
+    Ids of the nodes on any path from source_id to target_id: those
+    downstream of the source and upstream of the target. Empty if the
+    target cannot be reached. Two traversals instead of enumerating
+    paths, whose number can grow exponentially.
+    """
+    forward = reachable(graph, [source_id], DOWNSTREAM)
+    if target_id not in forward:
+        return set()
+    return forward & reachable(graph, [target_id], UPSTREAM)
+
+
+def cone(graph, node_id, handle_id=None, direction=DOWNSTREAM):
+    """
+    Ids of the nodes downstream (or upstream) of node_id. With handle_id,
+    only edges leaving (or entering) that handle start the walk.
+    """
+    if handle_id is None:
+        return reachable(graph, [node_id], direction)
+    adjacency = graph.adjacency()
+    if direction == DOWNSTREAM:
+        starts = [graph.edges[i].target for i in adjacency.out_handle.get((node_id, handle_id), ())]
+    else:
+        starts = [graph.edges[i].source for i in adjacency.in_handle.get((node_id, handle_id), ())]
+    return {node_id} | reachable(graph, starts, direction)
+
+
+def slice_graph(graph, node_ids):
+    """
+    GraphIR with the nodes in node_ids and every edge touching them, in
+    the original order. Edges to nodes outside the slice are kept as
+    boundary edges.
+    """
+    adjacency = graph.adjacency()
+    node_positions = sorted(i for node_id in node_ids for i in adjacency.node_positions.get(node_id, ()))
+    edge_positions = sorted({
+        i
+        for node_id in node_ids
+        for index in (adjacency.out_edges, adjacency.in_edges)
+        for i in index.get(node_id, ())
+    })
+    return GraphIR(
+        graph.format,
+        [graph.nodes[i] for i in node_positions],
+        [graph.edges[i] for i in edge_positions],
+    )
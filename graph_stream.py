@@ -0,0 +1,360 @@
+"""
+Streaming JSON ingestion for large graphs and workflow lists.
+
+iter_json_values() scans JSON text chunk by chunk and yields the values
+at selected paths one at a time, so only one node or edge is materialized
+as a dict at any moment, even inside one large workflow item. The loaders below turn those
+elements straight into graph_ir records and drop the rest (positions,
+styles, handler metadata, ...).
+"""
+import codecs
+import json
+import re
+import time
+
+import metrics
+from graph_ir import (
+    REACT_FLOW, GraphIR, load_graph, load_graph_transitions, react_flow_edge, react_flow_node,
+)
+
+CHUNK_SIZE = 64 * 1024
+
+# Yielded by iter_json_values for the paths in objects when an object
+# starts there
+OBJECT = object()
+
+_WHITESPACE = re.compile(r"\s*")
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_LITERAL = re.compile(r'[^\s{}\[\]:,"]+')
+_DECODER = json.JSONDecoder()
+
+# What _Pending holds
+_KEY = "key"
+_VALUE = "value"
+_SKIP = "skip"
+
+# Array paths holding the graph, relative to the graph object
+GRAPH_PATHS = (("nodes",), ("edges",), ("graph", "nodes"), ("graph", "edges"), ("transitions",))
+
+
+def iter_text_chunks(text, size=CHUNK_SIZE):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def iter_decoded(byte_chunks):
+    """
+    Decode an iterable of UTF-8 byte chunks into text chunks.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in byte_chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _scan(buf, scan, depth, in_string):
+    """
+    Continue scanning a string or container in buf from scan. Returns
+    (end, scan, depth, in_string): end is the index just past the value,
+    or None if buf ends first, and the rest say where to resume.
+    """
+    while True:
+        if in_string:
+            scan = _STRING_BODY.match(buf, scan).end()
+            if scan == len(buf) or buf[scan] != '"':
+                # End of buf, possibly right after a backslash
+                return None, scan, depth, True
+            scan += 1
+            in_string = False
+            if depth == 0:
+                return scan, scan, 0, False
+        else:
+            match = _STRUCTURE.search(buf, scan)
+            if match is None:
+                return None, len(buf), depth, False
+            scan = match.end()
+            char = match.group()
+            if char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return scan, scan, 0, False
+
+
+class _Pending:
+    """
+    A key, selected value or skipped string that runs past the end of the
+    buffer. parts holds its text from earlier chunks (not kept for _SKIP).
+    """
+    __slots__ = ("kind", "path", "start", "scan", "depth", "in_string", "parts")
+
+    def __init__(self, kind, path, start, depth, in_string):
+        self.kind = kind
+        self.path = path
+        self.start = start
+        self.scan = start + 1
+        self.depth = depth
+        self.in_string = in_string
+        self.parts = []
+
+
+def iter_json_values(chunks, paths, objects=()):
+    """
+    Yield (path, value) for every value at one of the given paths, e.g.
+    {("nodes", "*"), ("graph", "edges", "*")}; "*" stands for any array
+    index. The path yielded has the actual indices. For the paths in
+    objects, (path, OBJECT) is yielded when an object starts there.
+
+    chunks is an iterable of text. Each selected value is scanned once and
+    parsed with the json module when it is complete; everything else is
+    tokenized and skipped without building Python objects.
+    """
+    targets = {tuple(p) for p in paths}
+    opened = {tuple(p) for p in objects}
+    # Each frame is [is_object, key]; key is the current member name in
+    # objects and the current index in arrays
+    stack = []
+    expect_key = False
+    pending = None
+
+    buf = ""
+    pos = 0
+    chunks = iter(chunks)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        final = chunk is None
+        if pending is not None:
+            # Keep what belongs to the pending value out of buf, so each
+            # chunk is copied and scanned only once
+            if pending.kind != _SKIP:
+                pending.parts.append(buf[pending.start:pending.scan])
+            buf = buf[pending.scan:] + (chunk or "")
+            pending.start = pending.scan = 0
+        else:
+            buf = buf[pos:] + (chunk or "")
+        pos = 0
+
+        while True:
+            if pending is not None:
+                end, pending.scan, pending.depth, pending.in_string = _scan(
+                    buf, pending.scan, pending.depth, pending.in_string,
+                )
+                if end is None:
+                    break
+                done, pending = pending, None
+                pos = end
+                if done.kind == _KEY:
+                    stack[-1][1] = json.loads("".join(done.parts) + buf[done.start:end])
+                elif done.kind == _VALUE:
+                    yield done.path, json.loads("".join(done.parts) + buf[done.start:end])
+                continue
+
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            first = buf[pos]
+
+            if first in "]}":
+                if not stack:
+                    raise ValueError(f"Unexpected {first!r} in JSON input")
+                stack.pop()
+                # The container was a complete value of its parent
+                expect_key = False
+                pos += 1
+                continue
+            if first == ",":
+                if stack:
+                    if stack[-1][0]:
+                        expect_key = True
+                    else:
+                        stack[-1][1] += 1
+                pos += 1
+                continue
+            if first == ":":
+                pos += 1
+                continue
+            if expect_key:
+                if first != '"':
+                    raise ValueError(f"Expecting a property name, got {first!r}")
+                pending = _Pending(_KEY, None, pos, 0, True)
+                expect_key = False
+                continue
+
+            path = tuple(frame[1] for frame in stack)
+            pattern = tuple("*" if type(key) is int else key for key in path)
+            if pattern in targets:
+                if first in '{["':
+                    # Usually the whole value is in buf and the C decoder
+                    # parses it directly; otherwise scan it as it arrives
+                    try:
+                        value, end = _DECODER.raw_decode(buf, pos)
+                    except json.JSONDecodeError:
+                        pending = _Pending(_VALUE, path, pos, 0 if first == '"' else 1, first == '"')
+                        continue
+                    yield path, value
+                    pos = end
+                    continue
+            elif first in "{[":
+                if first == "{":
+                    if pattern in opened:
+                        yield path, OBJECT
+                    stack.append([True, None])
+                    expect_key = True
+                else:
+                    stack.append([False, 0])
+                pos += 1
+                continue
+            elif first == '"':
+                pending = _Pending(_SKIP, None, pos, 0, True)
+                continue
+
+            match = _LITERAL.match(buf, pos)
+            if match is None:
+                raise ValueError(f"Unexpected {first!r} in JSON input")
+            if match.end() == len(buf) and not final:
+                # A number or literal may continue in the next chunk
+                break
+            if pattern in targets:
+                yield path, json.loads(match.group())
+            pos = match.end()
+
+    if pending is not None or stack or buf[pos:].strip():
+        raise ValueError("Unexpected end of JSON input")
+
+
+def iter_json_arrays(chunks, paths):
+    """
+    Yield (path, element) for every element of the arrays at the given
+    object-key paths, e.g. {("nodes",), ("graph", "edges")}.
+    """
+    for path, value in iter_json_values(chunks, {tuple(p) + ("*",) for p in paths}):
+        yield path[:-1], value
+
+
+class _GraphParts:
+    """
+    Collects graph_ir records from the elements of the GRAPH_PATHS arrays
+    of one graph, in either input format.
+    """
+    __slots__ = ("nodes", "edges", "alt_nodes", "alt_edges", "transitions", "alt")
+
+    def __init__(self):
+        self.nodes, self.edges = [], []
+        self.alt_nodes, self.alt_edges, self.transitions = [], [], []
+        # A "graph" object makes it the graph/transitions format
+        self.alt = False
+
+    def add(self, path, value):
+        if path == ("nodes",):
+            self.nodes.append(react_flow_node(value))
+        elif path == ("edges",):
+            self.edges.append(react_flow_edge(value))
+        elif path == ("graph", "nodes"):
+            self.alt_nodes.append({
+                "id": value["id"],
+                "type": value.get("type", "Untitled"),
+                "attributes": value.get("attributes", []),
+            })
+        elif path == ("graph", "edges"):
+            self.alt_edges.append({"from": value["from"], "to": value["to"]})
+        else:
+            self.transitions.append(value)
+
+    def build(self):
+        if self.alt or self.alt_nodes or self.alt_edges or self.transitions:
+            return load_graph_transitions({
+                "graph": {"nodes": self.alt_nodes, "edges": self.alt_edges},
+                "transitions": self.transitions,
+            })
+        return GraphIR(REACT_FLOW, self.nodes, self.edges)
+
+
+def load_graph_stream(chunks):
+    """
+    Build a GraphIR from JSON text chunks in either input format without
+    parsing the whole document into one dict.
+    """
+    with metrics.span("load_graph"):
+        parts = _GraphParts()
+        paths = {p + ("*",) for p in GRAPH_PATHS}
+        for path, value in iter_json_values(chunks, paths, {("graph",)}):
+            if value is OBJECT:
+                parts.alt = True
+            else:
+                parts.add(path[:-1], value)
+        return parts.build()
+
+
+def load_graph_text(text):
+    """
+    Build a GraphIR from a JSON string, e.g. the pasted text area.
+    """
+    return load_graph_stream(iter_text_chunks(text))
+
+
+def iter_workflow_items(chunks, previous=None):
+    """
+    Yield the items of an api/workflows response one by one. Only the id,
+    name, updatedAt and graph are kept, and the graph is converted to a
+    GraphIR node by node as it streams in, so neither the item nor its
+    workflow is ever built as one dict. Items found in previous (id ->
+    item) with the same updatedAt are yielded as they are, without
+    converting again. The time spent converting is recorded as the
+    "load_graph" stage.
+    """
+    previous = previous or {}
+    prefix = ("items", "*", "workflow")
+    paths = {("items", "*", key) for key in ("id", "name", "updatedAt")}
+    paths |= {prefix + p + ("*",) for p in GRAPH_PATHS}
+    objects = {prefix, prefix + ("graph",)}
+
+    def unchanged(item):
+        known = previous.get(item["id"])
+        return known is not None and item["updatedAt"] is not None and known["updatedAt"] == item["updatedAt"]
+
+    converting = 0.0
+
+    def finish(item, parts):
+        nonlocal converting
+        if unchanged(item):
+            return previous[item["id"]]
+        start = time.perf_counter()
+        item["workflow"] = parts.build() if parts is not None else None
+        converting += time.perf_counter() - start
+        return item
+
+    index = item = parts = None
+    for path, value in iter_json_values(chunks, paths, objects):
+        if path[1] != index:
+            if item is not None:
+                yield finish(item, parts)
+            index = path[1]
+            item = {"id": None, "name": None, "updatedAt": None, "workflow": None}
+            parts = None
+        if len(path) == 3:
+            if path[2] == "workflow":
+                # Skip converting a graph that is known already, if the id
+                # and updatedAt came first
+                parts = None if unchanged(item) else _GraphParts()
+            else:
+                item[path[2]] = value
+        elif parts is None:
+            continue
+        elif value is OBJECT:
+            parts.alt = True
+        else:
+            start = time.perf_counter()
+            parts.add(path[3:-1], value)
+            converting += time.perf_counter() - start
+    if item is not None:
+        yield finish(item, parts)
+    metrics.record("load_graph", converting)
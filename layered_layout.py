@@ -0,0 +1,675 @@
+"""
+In-process left-to-right layered (Sugiyama-style) layout with SVG output.
+
+The steps are the classic ones:
+  1. break cycles by reversing DFS back edges
+  2. assign layers by longest path
+  3. split long edges with dummy nodes
+  4. order each layer with barycenter sweeps
+  5. place nodes vertically so ports line up with their neighbours
+  6. route edges through the dummy points and draw them as curves
+
+It works on a render_model.RenderModel, so it draws the same handle rows,
+duplicate markings and dotted placeholders as the Graphviz path.
+
+Given the layout of a previous render, compute_layout can instead keep
+the nodes that did not change where they were and only place the new and
+changed ones (see stable_layout.py).
+"""
+from html import escape
+
+from render_model import ADDED, CHANGED, REMOVED
+
+FONT_SIZE = 12
+LINE_HEIGHT = 16
+ROW_HEIGHT = 18
+CHAR_WIDTH = 6.6
+MONO_CHAR_WIDTH = 7.2
+PADDING = 8
+COLUMN_GAP = 16
+LAYER_GAP = 80
+NODE_GAP = 24
+DUMMY_GAP = 10
+MARGIN = 20
+ORDER_SWEEPS = 8
+PLACEMENT_PASSES = 8
+
+MARK_COLORS = {ADDED: "#2a9d3a", CHANGED: "#e08a00", REMOVED: "#999999"}
+
+
+def _text_width(text, mono=False, bold=False):
+    width = len(text) * (MONO_CHAR_WIDTH if mono else CHAR_WIDTH)
+    return width * 1.1 if bold else width
+
+
+class Box:
+    """
+    Placed rectangle for a model node, or a zero-size dummy on a long edge.
+    in_ports/out_ports map a port name to its y offset from the top.
+    """
+    __slots__ = ("id", "node", "width", "height", "in_ports", "out_ports",
+                 "layer", "order", "x", "y")
+
+    def __init__(self, id, node=None, width=0.0, height=0.0):
+        self.id = id
+        self.node = node
+        self.width = width
+        self.height = height
+        self.in_ports = {}
+        self.out_ports = {}
+        self.layer = 0
+        self.order = 0
+        self.x = 0.0
+        self.y = 0.0
+
+    @property
+    def dummy(self):
+        return self.node is None
+
+    def in_point(self, port):
+        offset = self.in_ports.get(port, self.height / 2)
+        return (self.x, self.y + offset)
+
+    def out_point(self, port):
+        offset = self.out_ports.get(port, self.height / 2)
+        return (self.x + self.width, self.y + offset)
+
+
+def measure(node):
+    """
+    Size a ModelNode and work out where its ports sit.
+    """
+    box = Box(node.id, node)
+    if node.dotted:
+        box.width = _text_width(node.id) + 2 * PADDING
+        box.height = LINE_HEIGHT + 2 * PADDING
+        return box
+
+    widths = [_text_width(text, mono, bold) for text, _, mono, bold in node.header]
+    header_h = len(node.header) * LINE_HEIGHT + PADDING
+    body_h = 0
+    if node.body is not None:
+        widths.extend(_text_width(line) for line in node.body)
+        body_h = len(node.body) * LINE_HEIGHT + PADDING
+
+    in_w = max((_text_width(r.text, r.mono) for r in node.inputs), default=0)
+    out_w = max((_text_width(r.text, r.mono) for r in node.outputs), default=0)
+    widths.append(in_w + out_w + COLUMN_GAP)
+
+    rows = max(len(node.inputs), len(node.outputs), 1)
+    rows_top = header_h + body_h + PADDING / 2
+    for i, row in enumerate(node.inputs):
+        if row.port is not None:
+            box.in_ports[row.port] = rows_top + (i + 0.5) * ROW_HEIGHT
+    for i, row in enumerate(node.outputs):
+        if row.port is not None:
+            box.out_ports[row.port] = rows_top + (i + 0.5) * ROW_HEIGHT
+
+    box.width = max(widths) + 2 * PADDING
+    box.height = header_h + body_h + rows * ROW_HEIGHT + PADDING
+    return box
+
+
+class Layout:
+    """
+    Result of compute_layout: placed boxes by id, per-edge point lists
+    (parallel to model.edges) and the overall drawing size. columns holds
+    the (x, width) of each layer and edge_routes the routes by edge
+    identity, for laying out the next version of the graph.
+    """
+    __slots__ = ("boxes", "routes", "width", "height", "columns", "edge_routes")
+
+    def __init__(self, boxes, routes, width, height, columns=(), edge_routes=None):
+        self.boxes = boxes
+        self.routes = routes
+        self.width = width
+        self.height = height
+        self.columns = list(columns)
+        self.edge_routes = edge_routes if edge_routes is not None else {}
+
+
+def _break_cycles(ids, pairs):
+    """
+    Return the indexes of edges that close a cycle in DFS order.
+    """
+    succ = {v: [] for v in ids}
+    for i, (s, t) in enumerate(pairs):
+        succ[s].append((t, i))
+
+    state = {}  # 1 = on the DFS stack, 2 = finished
+    back = set()
+    for root in ids:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(succ[root]))]
+        while stack:
+            v, it = stack[-1]
+            nxt = next(it, None)
+            if nxt is None:
+                state[v] = 2
+                stack.pop()
+                continue
+            w, i = nxt
+            seen = state.get(w)
+            if seen == 1:
+                back.add(i)
+            elif seen is None:
+                state[w] = 1
+                stack.append((w, iter(succ[w])))
+    return back
+
+
+def _assign_layers(ids, dag_pairs):
+    """
+    Longest-path layering over a DAG given as (u, v) pairs.
+    """
+    succ = {v: [] for v in ids}
+    indegree = dict.fromkeys(ids, 0)
+    for u, v in dag_pairs:
+        succ[u].append(v)
+        indegree[v] += 1
+
+    layer = dict.fromkeys(ids, 0)
+    ready = [v for v in ids if indegree[v] == 0]
+    while ready:
+        u = ready.pop()
+        for v in succ[u]:
+            if layer[u] + 1 > layer[v]:
+                layer[v] = layer[u] + 1
+            indegree[v] -= 1
+            if indegree[v] == 0:
+                ready.append(v)
+    return layer
+
+
+def _isotonic(targets, weights=None):
+    """
+    Pool-adjacent-violators: the non-decreasing sequence closest (least
+    squares) to targets.
+    """
+    blocks = []  # [mean, weight, count]
+    for i, t in enumerate(targets):
+        w = weights[i] if weights else 1.0
+        blocks.append([t, w, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            m2, w2, c2 = blocks.pop()
+            m1, w1, c1 = blocks.pop()
+            blocks.append([(m1 * w1 + m2 * w2) / (w1 + w2), w1 + w2, c1 + c2])
+    result = []
+    for mean, _, count in blocks:
+        result.extend([mean] * count)
+    return result
+
+
+def compute_layout(model, previous=None, keep=()):
+    """
+    Lay out a RenderModel left to right and return a Layout. With a
+    previous Layout, the nodes in keep stay where they were in it and only
+    the others are placed.
+    """
+    if previous is not None and keep:
+        return _incremental_layout(model, previous, keep)
+
+    boxes = {}
+    for node in model.nodes:
+        boxes[node.id] = measure(node)
+    ids = list(boxes)
+
+    # Edges that take part in layering (no self loops, known endpoints)
+    pairs = []
+    edge_index = []
+    for i, edge in enumerate(model.edges):
+        if edge.source in boxes and edge.target in boxes and edge.source != edge.target:
+            pairs.append((edge.source, edge.target))
+            edge_index.append(i)
+
+    back = _break_cycles(ids, pairs)
+    dag_pairs = [(t, s) if k in back else (s, t) for k, (s, t) in enumerate(pairs)]
+    layer_of = _assign_layers(ids, dag_pairs)
+    for v, box in boxes.items():
+        box.layer = layer_of[v]
+
+    # Split long edges into chains of unit-length segments
+    chains = {}  # model edge index -> [u, dummy..., v] in DAG direction
+    segments = []  # (upper id, lower id, upper port, lower port)
+    for k, (u, v) in enumerate(dag_pairs):
+        i = edge_index[k]
+        edge = model.edges[i]
+        reversed_ = k in back
+        out_port = edge.target_port if reversed_ else edge.source_port
+        in_port = edge.source_port if reversed_ else edge.target_port
+        chain = [u]
+        for step in range(boxes[u].layer + 1, boxes[v].layer):
+            dummy = Box(f"_dummy_{i}_{step}")
+            dummy.layer = step
+            boxes[dummy.id] = dummy
+            chain.append(dummy.id)
+        chain.append(v)
+        chains[i] = chain
+        for a, b in zip(chain, chain[1:]):
+            segments.append((
+                a, b,
+                out_port if a == u else None,
+                in_port if b == v else None,
+            ))
+
+    layer_count = max((b.layer for b in boxes.values()), default=0) + 1
+    layers = [[] for _ in range(layer_count)]
+    for box in boxes.values():
+        layers[box.layer].append(box.id)
+    for nodes in layers:
+        for order, v in enumerate(nodes):
+            boxes[v].order = order
+
+    # Neighbours in the previous / next layer as (id, their port, own port)
+    up = {v: [] for v in boxes}
+    down = {v: [] for v in boxes}
+    for a, b, a_port, b_port in segments:
+        down[a].append((b, b_port, a_port))
+        up[b].append((a, a_port, b_port))
+
+    def port_fraction(box, port, incoming):
+        if box.dummy or not box.height:
+            return 0.5
+        ports = box.in_ports if incoming else box.out_ports
+        return ports.get(port, box.height / 2) / box.height
+
+    def sweep(neighbours, incoming, layer_range):
+        for l in layer_range:
+            keyed = []
+            for v in layers[l]:
+                adj = neighbours[v]
+                if adj:
+                    bary = sum(
+                        boxes[w].order + port_fraction(boxes[w], p, not incoming)
+                        for w, p, _ in adj
+                    ) / len(adj)
+                else:
+                    bary = boxes[v].order + 0.5
+                keyed.append((bary, boxes[v].order, v))
+            keyed.sort()
+            layers[l] = [v for _, _, v in keyed]
+            for order, v in enumerate(layers[l]):
+                boxes[v].order = order
+
+    for _ in range(ORDER_SWEEPS):
+        sweep(up, True, range(1, layer_count))
+        sweep(down, False, range(layer_count - 2, -1, -1))
+
+    # Horizontal placement: one column per layer
+    columns = []
+    x = MARGIN
+    for nodes in layers:
+        column = max((boxes[v].width for v in nodes), default=0)
+        for v in nodes:
+            boxes[v].x = x + (column - boxes[v].width) / 2
+        columns.append((x, column))
+        x += column + LAYER_GAP
+
+    # Vertical placement: start stacked, then pull towards neighbours
+    def gap(a, b):
+        return NODE_GAP if not (a.dummy or b.dummy) else DUMMY_GAP
+
+    for nodes in layers:
+        y = MARGIN
+        for v in nodes:
+            boxes[v].y = y
+            y += boxes[v].height + NODE_GAP
+
+    def place(l, neighbours, incoming):
+        nodes = layers[l]
+        if not nodes:
+            return
+        targets, weights, offsets = [], [], []
+        offset = 0.0
+        prev = None
+        for v in nodes:
+            box = boxes[v]
+            if prev is not None:
+                offset += prev.height + gap(prev, box)
+            offsets.append(offset)
+            adj = neighbours[v]
+            if adj:
+                own = box.in_ports if incoming else box.out_ports
+                wanted = []
+                for w, p, own_port in adj:
+                    other = boxes[w]
+                    other_ports = other.out_ports if incoming else other.in_ports
+                    other_y = other.y + other_ports.get(p, other.height / 2)
+                    # Top y that would put our port level with theirs
+                    wanted.append(other_y - own.get(own_port, box.height / 2))
+                targets.append(sum(wanted) / len(wanted) - offset)
+                weights.append(float(len(adj)))
+            else:
+                targets.append(box.y - offset)
+                weights.append(0.1)
+            prev = box
+        for v, z, off in zip(nodes, _isotonic(targets, weights), offsets):
+            boxes[v].y = z + off
+
+    for i in range(PLACEMENT_PASSES):
+        if i % 2 == 0:
+            for l in range(1, layer_count):
+                place(l, up, True)
+        else:
+            for l in range(layer_count - 2, -1, -1):
+                place(l, down, False)
+
+    _shift_to_margin(boxes.values())
+
+    # Routes, parallel to model.edges
+    routes = []
+    for i, edge in enumerate(model.edges):
+        source = boxes.get(edge.source)
+        target = boxes.get(edge.target)
+        if source is None or target is None:
+            routes.append([])
+            continue
+        start = source.out_point(edge.source_port)
+        end = target.in_point(edge.target_port)
+        chain = chains.get(i)
+        if chain is None:
+            # Self loop
+            routes.append([start, end])
+            continue
+        middle = [
+            (boxes[d].x, boxes[d].y) for d in chain[1:-1]
+        ]
+        if chain[0] != edge.source:
+            # Reversed back edge: leave to the right, travel back through
+            # the dummies and come into the target from the left
+            middle.reverse()
+            routes.append(
+                [start, (start[0] + LAYER_GAP / 2, start[1])]
+                + middle
+                + [(end[0] - LAYER_GAP / 2, end[1]), end]
+            )
+        else:
+            routes.append([start] + middle + [end])
+
+    real = {v: b for v, b in boxes.items() if not b.dummy}
+    return _finish(model, real, routes, columns)
+
+
+def _shift_to_margin(boxes):
+    """
+    Move boxes up or down so the topmost sits at MARGIN; returns the shift.
+    """
+    shift = MARGIN - min((b.y for b in boxes), default=MARGIN)
+    for box in boxes:
+        box.y += shift
+    return shift
+
+
+def _finish(model, boxes, routes, columns):
+    width = max((b.x + b.width for b in boxes.values()), default=0) + MARGIN
+    height = max((b.y + b.height for b in boxes.values()), default=0) + MARGIN
+    edge_routes = {edge.identity(): points for edge, points in zip(model.edges, routes) if points}
+    return Layout(boxes, routes, width, height, columns, edge_routes)
+
+
+def _free_slot(placed, top, height):
+    """
+    The y nearest to top at which a box of height fits between the
+    (top, bottom) intervals already placed in its column.
+    """
+    def fits(y):
+        return all(y + height + NODE_GAP <= a or y >= b + NODE_GAP for a, b in placed)
+
+    candidates = [top]
+    for a, b in placed:
+        candidates.append(b + NODE_GAP)
+        candidates.append(a - NODE_GAP - height)
+    return min((y for y in candidates if fits(y)), key=lambda y: abs(y - top))
+
+
+def _incremental_layout(model, previous, keep):
+    """
+    Lay out model with the nodes in keep pinned to their box in previous.
+    New nodes go into the layer after their predecessors (or before their
+    pinned successors), in the column that layer had before, as close as
+    they fit to the height of their placed neighbours. Edges between two
+    pinned nodes keep their old route; other edges are drawn directly.
+    """
+    boxes = {}
+    for node in model.nodes:
+        box = boxes[node.id] = measure(node)
+        old = previous.boxes.get(node.id) if node.id in keep else None
+        if old is not None:
+            box.layer, box.x, box.y = old.layer, old.x, old.y
+    pinned = {v for v in boxes if v in keep and v in previous.boxes}
+    ids = list(boxes)
+
+    pairs = [
+        (edge.source, edge.target, edge.source_port, edge.target_port)
+        for edge in model.edges
+        if edge.source in boxes and edge.target in boxes and edge.source != edge.target
+    ]
+    back = _break_cycles(ids, [(s, t) for s, t, _, _ in pairs])
+    preds = {v: [] for v in ids}
+    succs = {v: [] for v in ids}
+    for k, (s, t, s_port, t_port) in enumerate(pairs):
+        if k in back:
+            continue
+        preds[t].append((s, s_port, t_port))
+        succs[s].append((t, t_port, s_port))
+
+    # Topological order of the DAG, so predecessors are placed first
+    indegree = {v: len(preds[v]) for v in ids}
+    ready = [v for v in ids if indegree[v] == 0]
+    order = []
+    while ready:
+        u = ready.pop()
+        order.append(u)
+        for v, _, _ in succs[u]:
+            indegree[v] -= 1
+            if indegree[v] == 0:
+                ready.append(v)
+
+    for v in order:
+        if v in pinned:
+            continue
+        if preds[v]:
+            boxes[v].layer = max(boxes[u].layer for u, _, _ in preds[v]) + 1
+        else:
+            later = [boxes[w].layer for w, _, _ in succs[v] if w in pinned]
+            boxes[v].layer = max(0, min(later) - 1) if later else 0
+
+    columns = list(previous.columns)
+    layer_count = max((b.layer for b in boxes.values()), default=0) + 1
+    for layer in range(len(columns), layer_count):
+        width = max((b.width for b in boxes.values() if b.layer == layer), default=0)
+        x = columns[-1][0] + columns[-1][1] + LAYER_GAP if columns else MARGIN
+        columns.append((x, width))
+
+    placed = [[] for _ in range(layer_count)]
+    for v in pinned:
+        box = boxes[v]
+        placed[box.layer].append((box.y, box.y + box.height))
+    bottom = max((b.y + b.height for b in previous.boxes.values()), default=MARGIN)
+
+    for v in order:
+        if v in pinned:
+            continue
+        box = boxes[v]
+        x, width = columns[box.layer]
+        box.x = x + max(0.0, (width - box.width) / 2)
+        wanted = []
+        for w, w_port, own_port in preds[v]:
+            other = boxes[w]
+            wanted.append(other.y + other.out_ports.get(w_port, other.height / 2)
+                          - box.in_ports.get(own_port, box.height / 2))
+        for w, w_port, own_port in succs[v]:
+            if w in pinned:
+                other = boxes[w]
+                wanted.append(other.y + other.in_ports.get(w_port, other.height / 2)
+                              - box.out_ports.get(own_port, box.height / 2))
+        top = sum(wanted) / len(wanted) if wanted else bottom + NODE_GAP
+        box.y = _free_slot(placed[box.layer], top, box.height)
+        placed[box.layer].append((box.y, box.y + box.height))
+
+    # Old routes move with the pinned boxes
+    shift = _shift_to_margin(boxes.values())
+
+    routes = []
+    for edge in model.edges:
+        source = boxes.get(edge.source)
+        target = boxes.get(edge.target)
+        if source is None or target is None:
+            routes.append([])
+            continue
+        old = previous.edge_routes.get(edge.identity())
+        if old and edge.source in pinned and edge.target in pinned:
+            routes.append([(x, y + shift) for x, y in old])
+            continue
+        start = source.out_point(edge.source_port)
+        end = target.in_point(edge.target_port)
+        if edge.source != edge.target and end[0] <= start[0]:
+            routes.append([start, (start[0] + LAYER_GAP / 2, start[1]),
+                           (end[0] - LAYER_GAP / 2, end[1]), end])
+        else:
+            routes.append([start, end])
+    return _finish(model, boxes, routes, columns)
+
+
+def _curve(points):
+    """
+    SVG path through points with horizontal tangents at every point.
+    """
+    (x0, y0) = points[0]
+    parts = [f"M{x0:.1f},{y0:.1f}"]
+    if len(points) == 2 and points[0][0] >= points[1][0] - 1:
+        # Self loop or a target to the left: bow out above
+        (x1, y1) = points[1]
+        lift = min(y0, y1) - 40
+        parts.append(f"C{x0 + 40:.1f},{lift:.1f} {x1 - 40:.1f},{lift:.1f} {x1:.1f},{y1:.1f}")
+        return " ".join(parts)
+    for (ax, ay), (bx, by) in zip(points, points[1:]):
+        dx = (bx - ax) / 2
+        parts.append(f"C{ax + dx:.1f},{ay:.1f} {bx - dx:.1f},{by:.1f} {bx:.1f},{by:.1f}")
+    return " ".join(parts)
+
+
+def _edge_stroke(edge):
+    # Red and other warning colors win over the change marking
+    if edge.mark in MARK_COLORS and edge.color == "black":
+        return MARK_COLORS[edge.mark]
+    return edge.color
+
+
+def _node_svg(box):
+    node = box.node
+    x, y = box.x, box.y
+    out = []
+    stroke = f'stroke="{MARK_COLORS.get(node.mark, "black")}"'
+    if node.mark in (ADDED, CHANGED):
+        stroke += ' stroke-width="2.5"'
+    if node.dotted or node.mark == REMOVED:
+        stroke += ' stroke-dasharray="2,3"'
+    if node.mark == REMOVED:
+        out.append('<g opacity="0.45">')
+    out.append(
+        f'<rect x="{x:.1f}" y="{y:.1f}" width="{box.width:.1f}" height="{box.height:.1f}" '
+        f'fill="white" {stroke}/>'
+    )
+    out.extend(_node_text(box))
+    if node.mark == REMOVED:
+        out.append("</g>")
+    return out
+
+
+def _node_text(box):
+    node = box.node
+    x, y = box.x, box.y
+    out = []
+    if node.dotted:
+        out.append(
+            f'<text x="{x + box.width / 2:.1f}" y="{y + box.height / 2 + 4:.1f}" '
+            f'text-anchor="middle">{escape(node.id)}</text>'
+        )
+        return out
+
+    line_y = y + PADDING / 2 + LINE_HEIGHT * 0.8
+    for text, color, mono, bold in node.header:
+        attrs = ' font-family="monospace"' if mono else ""
+        attrs += ' font-weight="bold"' if bold else ""
+        out.append(
+            f'<text x="{x + box.width / 2:.1f}" y="{line_y:.1f}" text-anchor="middle" '
+            f'fill="{color}"{attrs}>{escape(text)}</text>'
+        )
+        line_y += LINE_HEIGHT
+    if node.body is not None:
+        line_y += PADDING / 2
+        for line in node.body:
+            out.append(f'<text x="{x + PADDING:.1f}" y="{line_y:.1f}">{escape(line)}</text>')
+            line_y += LINE_HEIGHT
+        line_y += PADDING / 2
+
+    rows_top = line_y - LINE_HEIGHT * 0.8 + PADDING / 2
+    for rows, anchor, tx in (
+        (node.inputs, "start", x + PADDING),
+        (node.outputs, "end", x + box.width - PADDING),
+    ):
+        for i, row in enumerate(rows):
+            attrs = ' font-family="monospace"' if row.mono else ""
+            ry = rows_top + (i + 0.5) * ROW_HEIGHT + FONT_SIZE * 0.35
+            out.append(
+                f'<text x="{tx:.1f}" y="{ry:.1f}" text-anchor="{anchor}" '
+                f'fill="{row.color}"{attrs}>{escape(row.text)}</text>'
+            )
+    return out
+
+
+def to_svg(model, layout):
+    """
+    Draw a laid-out RenderModel as a standalone SVG document.
+    """
+    strokes = [_edge_stroke(edge) for edge in model.edges]
+    colors = sorted(set(strokes))
+    marker_ids = {color: f"arrow{i}" for i, color in enumerate(colors)}
+
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{layout.width:.0f}" '
+        f'height="{layout.height:.0f}" viewBox="0 0 {layout.width:.1f} {layout.height:.1f}" '
+        f'font-family="Helvetica, Arial, sans-serif" font-size="{FONT_SIZE}">',
+        "<defs>",
+    ]
+    for color, marker in marker_ids.items():
+        out.append(
+            f'<marker id="{marker}" viewBox="0 0 10 10" refX="10" refY="5" '
+            f'markerWidth="8" markerHeight="8" orient="auto-start-reverse">'
+            f'<path d="M0,0 L10,5 L0,10 z" fill="{color}"/></marker>'
+        )
+    out.append("</defs>")
+    out.append('<rect width="100%" height="100%" fill="white"/>')
+
+    for edge, stroke, points in zip(model.edges, strokes, layout.routes):
+        if not points:
+            continue
+        dash = ' stroke-dasharray="2,3"' if edge.style == "dotted" or edge.mark == REMOVED else ""
+        width = ' stroke-width="2"' if edge.mark == ADDED else ""
+        out.append(
+            f'<path d="{_curve(points)}" fill="none" stroke="{stroke}"{dash}{width} '
+            f'marker-end="url(#{marker_ids[stroke]})"/>'
+        )
+        if edge.label:
+            (mx, my) = points[len(points) // 2 - (1 if len(points) % 2 == 0 else 0)]
+            (nx, ny) = points[len(points) // 2]
+            out.append(
+                f'<text x="{(mx + nx) / 2:.1f}" y="{(my + ny) / 2 - 4:.1f}" text-anchor="middle" '
+                f'fill="{stroke}" font-size="{FONT_SIZE - 1}">{escape(edge.label)}</text>'
+            )
+
+    for box in layout.boxes.values():
+        out.extend(_node_svg(box))
+
+    out.append("</svg>")
+    return "\n".join(out)
+
+
+def layered_svg(model):
+    """
+    Lay out a RenderModel and return it as SVG markup.
+    """
+    return to_svg(model, compute_layout(model))
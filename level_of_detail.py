@@ -0,0 +1,205 @@
+"""
+Overview rendering for graphs too large to draw in full.
+
+The overview model keeps every node but drops the handle rows (a node shows
+"3 in / 5 out" instead) and the edge ports, folds linear chains and fans of
+leaf nodes into single summary nodes, and merges parallel edges into one
+edge labelled with their count. Labels stay short and dot gets far fewer
+nodes, ports and edges to place.
+
+fold_regions() finds the foldable regions; any of them can be expanded
+again by passing its id in expanded.
+"""
+import os
+
+from graph_ir import INPUT
+from render_model import ModelEdge, ModelNode, RenderModel
+
+FULL = "full"
+OVERVIEW = "overview"
+AUTO = "auto"
+DETAIL_LEVELS = (AUTO, FULL, OVERVIEW)
+
+# "auto" switches to the overview past either threshold
+LOD_NODE_THRESHOLD = int(os.getenv("LOD_NODE_THRESHOLD", 300))
+LOD_HANDLE_THRESHOLD = int(os.getenv("LOD_HANDLE_THRESHOLD", 3000))
+
+# Smallest chain and fan that are worth folding
+CHAIN_MIN_NODES = 3
+FAN_MIN_NODES = 4
+# Member names listed in a summary node
+SUMMARY_NAMES = 3
+
+
+def resolve_detail(detail, node_count, handle_count):
+    """
+    Turn "auto" into "full" or "overview" for a graph of this size.
+    """
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"Unknown detail level {detail!r}, expected one of {DETAIL_LEVELS}")
+    if detail != AUTO:
+        return detail
+    if node_count > LOD_NODE_THRESHOLD or handle_count > LOD_HANDLE_THRESHOLD:
+        return OVERVIEW
+    return FULL
+
+
+class Region:
+    """
+    A foldable set of nodes: a linear chain, or the leaf nodes fanning out
+    of (or into) one hub node.
+    """
+    __slots__ = ("id", "kind", "node_ids", "hub")
+
+    def __init__(self, id, kind, node_ids, hub=None):
+        self.id = id
+        self.kind = kind
+        self.node_ids = node_ids
+        self.hub = hub
+
+
+def _neighbour_sets(graph):
+    succ = {node.id: set() for node in graph.nodes}
+    pred = {node.id: set() for node in graph.nodes}
+    for edge in graph.edges:
+        if edge.source == edge.target:
+            continue
+        if edge.source in succ:
+            succ[edge.source].add(edge.target)
+        if edge.target in pred:
+            pred[edge.target].add(edge.source)
+    return succ, pred
+
+
+def fold_regions(graph):
+    """
+    Linear chains of at least CHAIN_MIN_NODES nodes, then fans of at least
+    FAN_MIN_NODES leaves hanging off one hub. A node belongs to at most one
+    region. Ids are derived from node ids, so they are stable across
+    reruns. They contain no ":", which Graphviz would read as a port.
+    """
+    succ, pred = _neighbour_sets(graph)
+    folded = set()
+    regions = []
+
+    def linear(node_id):
+        return (
+            node_id in succ and node_id not in folded
+            and len(pred[node_id]) == 1 and len(succ[node_id]) == 1
+        )
+
+    for node in graph.nodes:
+        if not linear(node.id):
+            continue
+        # Walk back to the first linear node, then forward to the last
+        start = node.id
+        seen = {start}
+        while True:
+            (prev,) = pred[start]
+            if not linear(prev) or prev in seen:
+                break
+            start = prev
+            seen.add(prev)
+        chain = [start]
+        in_chain = {start}
+        while True:
+            (nxt,) = succ[chain[-1]]
+            if not linear(nxt) or nxt in in_chain:
+                break
+            chain.append(nxt)
+            in_chain.add(nxt)
+        if len(chain) >= CHAIN_MIN_NODES:
+            regions.append(Region(f"chain__{chain[0]}", "chain", chain))
+            folded.update(chain)
+
+    for node in graph.nodes:
+        hub = node.id
+        for kind, outward, inward in (("fan-out", succ, pred), ("fan-in", pred, succ)):
+            leaves = [
+                other for other in sorted(outward[hub])
+                if other in succ and other not in folded
+                and inward[other] == {hub} and not outward[other]
+            ]
+            if len(leaves) >= FAN_MIN_NODES and hub not in folded:
+                regions.append(Region(f"{kind}__{hub}", kind, leaves, hub))
+                folded.update(leaves)
+
+    return regions
+
+
+def region_label(graph, region, names=None):
+    """
+    Short description of a region, e.g. for the expand control.
+    """
+    names = names or {node.id: node.name or node.id for node in graph.nodes}
+    if region.kind == "chain":
+        return f"Chain of {len(region.node_ids)}: {names[region.node_ids[0]]} … {names[region.node_ids[-1]]}"
+    return f"{len(region.node_ids)} nodes {region.kind} {names[region.hub]}"
+
+
+def overview_model(graph, expanded=()):
+    """
+    Build the overview RenderModel for a GraphIR. Regions whose id is in
+    expanded are drawn node by node, still without handle rows. Nodes with
+    duplicate handle ids get a red note, and a merged edge is red if any
+    edge it stands for goes into a missing target handle.
+    """
+    expanded = set(expanded)
+    names = {node.id: node.name or node.id for node in graph.nodes}
+    model = RenderModel()
+
+    representative = {}
+    for region in fold_regions(graph):
+        if region.id in expanded:
+            continue
+        for node_id in region.node_ids:
+            representative[node_id] = region.id
+        shown = [names[n] for n in region.node_ids[:SUMMARY_NAMES]]
+        if len(region.node_ids) > SUMMARY_NAMES:
+            shown.append(f"… {len(region.node_ids) - SUMMARY_NAMES} more")
+        model.nodes.append(ModelNode(
+            region.id,
+            header=[(region_label(graph, region, names), "gray40", False, True)],
+            body=shown,
+        ))
+
+    for node in graph.nodes:
+        if node.id in representative:
+            continue
+        node_color = "red" if graph.node_id_counts[node.id] > 1 else "black"
+        n_in = sum(1 for h in node.handles if h.direction == INPUT)
+        n_out = len(node.handles) - n_in
+        header = [(node.name, node_color, False, False), (node.id.split("-")[0], node_color, True, False)]
+        duplicates = sum(1 for h in node.handles if graph.handle_id_counts[h.id] > 1)
+        if duplicates:
+            header.append((f"{duplicates} duplicate handle id{'s' if duplicates > 1 else ''}", "red", False, False))
+        model.nodes.append(ModelNode(node.id, header=header, body=[f"{n_in} in / {n_out} out"]))
+
+    # One edge per pair of drawn nodes, labelled with the number it stands for
+    dotted_nodes_created = set()
+    counts = {}
+    broken = set()
+    for edge in graph.edges:
+        source = representative.get(edge.source, edge.source)
+        target = representative.get(edge.target, edge.target)
+        if source == target and source != edge.source:
+            continue
+        for node_id in (edge.source, edge.target):
+            if not graph.has_node(node_id) and node_id not in dotted_nodes_created:
+                model.nodes.append(ModelNode(node_id, dotted=True))
+                dotted_nodes_created.add(node_id)
+        pair = (source, target)
+        counts[pair] = counts.get(pair, 0) + 1
+        if graph.has_node(edge.target) and not graph.has_handle(edge.target, edge.target_handle):
+            broken.add(pair)
+
+    for (source, target), count in counts.items():
+        dangling = source in dotted_nodes_created or target in dotted_nodes_created
+        model.edges.append(ModelEdge(
+            source, None, target, None,
+            color="red" if (source, target) in broken else "black",
+            style="dotted" if dangling else "solid",
+            label=f"×{count}" if count > 1 else None,
+        ))
+
+    return model
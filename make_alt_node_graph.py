@@ -1,10 +1,25 @@
 import streamlit as st
 import json
-import tempfile
-from graphviz import Digraph
-from collections import defaultdict
+from graph_ir import load_graph
+from metrics import span
+from render_cache import render_cache, render_key
+from render_model import ModelEdge, ModelNode, RenderModel, Row, render_model
+from render_options import (
+    DEFAULT_ENGINE, DEFAULT_OUTPUT, ENGINES, OUTPUT_FORMATS, PNG_PIXEL_BUDGET, graph_attrs,
+)
+
+def alt_node_graph_key(data, output=DEFAULT_OUTPUT, engine=DEFAULT_ENGINE,
+                       pixel_budget=PNG_PIXEL_BUDGET):
+    """
+    Render cache key for create_alt_node_graph_with_handles with the same
+    arguments.
+    """
+    graph = load_graph(data)
+    attrs = graph_attrs(output, len(graph.nodes), len(graph.edges), pixel_budget)
+    return render_key("alt_node_graph_handles", graph.fingerprint(), format=output, engine=engine, **attrs)
 
-def create_alt_node_graph_with_handles(data):
+def create_alt_node_graph_with_handles(data, output=DEFAULT_OUTPUT, engine=DEFAULT_ENGINE,
+                                       pixel_budget=PNG_PIXEL_BUDGET):
     """
     Renders a Graphviz diagram from the new data structure but uses ports/handles
     for edges (like your original node graph), so edges are unlabeled. Attributes
@@ -42,99 +57,96 @@ def create_alt_node_graph_with_handles(data):
         ...
       ]
     }
+
+    output is "png" (DPI adapted to the graph size) or "svg", and engine
+    "layered" draws SVG in-process instead of running dot. Returns the
+    image as bytes, served from the render cache when the same data has
+    been rendered before.
     """
 
-    dot = Digraph("alt_node_graph_handles", format="png")
-    dot.attr(rankdir="LR", dpi="300", size="10,10!")
-    
-    graph = data.get("graph", {})
-    transitions = data.get("transitions", [])
-
-    # Collect input/output names from edges
-    input_ports = defaultdict(set)   # node_id -> set of input port names
-    output_ports = defaultdict(set)  # node_id -> set of output port names
-
-    for edge in graph.get("edges", []):
-        from_node = edge["from"]["node"]
-        to_node = edge["to"]["node"]
-        out_name = edge["from"].get("output", "")
-        in_name  = edge["to"].get("input", "")
-        if out_name:
-            output_ports[from_node].add(out_name)
-        if in_name:
-            input_ports[to_node].add(in_name)
-
-    # Create nodes with an HTML table label
-    for node in graph.get("nodes", []):
-        node_id = node["id"]
-        node_type = node.get("type", "Untitled")
-        attrs = node.get("attributes", [])
-        # e.g. name: value
-        attr_lines = [f"{a['name']}: {a['value']}" for a in attrs]
-
-        # Build input rows
-        in_rows = "".join(
-            f'<tr><td port="{port}" align="left">{port}</td></tr>'
-            for port in sorted(input_ports[node_id])
-        ) or '<tr><td align="left">&nbsp;</td></tr>'
-        
-        # Build output rows
-        out_rows = "".join(
-            f'<tr><td port="{port}" align="right">{port}</td></tr>'
-            for port in sorted(output_ports[node_id])
-        ) or '<tr><td align="right">&nbsp;</td></tr>'
-
-        # Middle cell for attributes (optional)
-        # Combine them into a single string separated by <br/>
-        attributes_str = "<br/>".join(attr_lines) if attr_lines else ""
-        
-        label = (
-            f'<<table BORDER="1" CELLBORDER="0" CELLSPACING="0">'
-            f'<tr><td colspan="2" align="center"><b>{node_type}</b></td></tr>'
-            f'<tr><td colspan="2" align="left">{attributes_str}</td></tr>'
-            f'<tr>'
-            f'  <td valign="top"><table BORDER="0" CELLBORDER="0" CELLSPACING="0">{in_rows}</table></td>'
-            f'  <td valign="top"><table BORDER="0" CELLBORDER="0" CELLSPACING="0">{out_rows}</table></td>'
-            f'</tr>'
-            f'</table>>'
-        )
-
-        dot.node(node_id, label=label, shape="plaintext")
-
-    # Add normal edges (black, from port to port)
-    for edge in graph.get("edges", []):
-        from_node = edge["from"]["node"]
-        to_node = edge["to"]["node"]
-        out_name = edge["from"].get("output", "")
-        in_name = edge["to"].get("input", "")
+    graph = load_graph(data)
+    attrs = graph_attrs(output, len(graph.nodes), len(graph.edges), pixel_budget)
+    key = alt_node_graph_key(graph, output, engine, pixel_budget)
+    cached = render_cache.get(key, ext=output)
+    if cached is not None:
+        return cached
+
+    with span("model"):
+        model = alt_node_graph_model(graph)
+    return render_model(model, key, "alt_node_graph_handles", output, attrs, engine)
+
+def alt_node_graph_model(data):
+    """
+    Build the RenderModel for the graph/transitions data structure (a dict
+    or a GraphIR). Ports come from the edges, attributes go in the node
+    body, and transitions are blue edges labeled with their method type.
+    Nodes that edges reference but the data lacks become dotted boxes.
+    """
+    graph = load_graph(data)
+    model = RenderModel()
+    dotted_nodes_created = set()
+
+    def ensure_dotted_node(node_id):
+        if node_id not in dotted_nodes_created:
+            model.nodes.append(ModelNode(node_id, dotted=True))
+            dotted_nodes_created.add(node_id)
+
+    input_ports = {}   # node_id -> set of input port names
+    output_ports = {}  # node_id -> set of output port names
+
+    # Create nodes with attributes in the body and one row per port
+    for node in graph.nodes:
+        inputs = [Row(h.id, h.id) for h in node.inputs]
+        outputs = [Row(h.id, h.id) for h in node.outputs]
+        input_ports[node.id] = {row.port for row in inputs}
+        output_ports[node.id] = {row.port for row in outputs}
+
+        model.nodes.append(ModelNode(
+            node.id,
+            header=[(node.kind, "black", False, True)],
+            # e.g. name: value
+            body=[f"{name}: {value}" for name, value in node.attributes],
+            inputs=inputs,
+            outputs=outputs,
+        ))
+
+    for edge in graph.edges:
+        edge_style = "solid"
+        for node_id in (edge.source, edge.target):
+            if not graph.has_node(node_id):
+                ensure_dotted_node(node_id)
+                edge_style = "dotted"
+
+        if edge.kind == "transition":
+            # Transitions are blue edges with label=method.type
+            model.edges.append(ModelEdge(
+                edge.source, None, edge.target, None, color="blue", style=edge_style, label=edge.label,
+            ))
+            continue
 
         # If we have valid ports, link them. Otherwise fall back to the node.
-        source_port = f"{from_node}:{out_name}" if out_name in output_ports[from_node] else from_node
-        target_port = f"{to_node}:{in_name}" if in_name in input_ports[to_node] else to_node
-        
-        dot.edge(source_port, target_port, color="black")
-
-    # Add transitions (blue edges with label=method.type)
-    for t in transitions:
-        src = t["from"]
-        dst = t["to"]
-        method_type = t.get("method", {}).get("type", "")
-        dot.edge(src, dst, label=method_type, color="blue")
-
-    # Render
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmpfile:
-        dot.render(tmpfile.name, cleanup=True)
-        return tmpfile.name + ".png"
+        source_port = edge.source_handle if edge.source_handle in output_ports.get(edge.source, ()) else None
+        target_port = edge.target_handle if edge.target_handle in input_ports.get(edge.target, ()) else None
+        model.edges.append(ModelEdge(
+            edge.source, source_port, edge.target, target_port, color="black", style=edge_style,
+        ))
+
+    return model
 
 def main():
     st.title("New Data Structure (Handles)")
 
     json_data = st.text_area("Paste JSON here:", height=300)
+    output = st.radio("Output format", OUTPUT_FORMATS, horizontal=True)
+    engine = st.radio("Layout engine", ENGINES, horizontal=True)
     if st.button("Render"):
         try:
             data = json.loads(json_data)
-            png_path = create_alt_node_graph_with_handles(data)
-            st.image(png_path, caption="Graph with Ports/Handles")
+            image = create_alt_node_graph_with_handles(data, output, engine)
+            st.image(
+                image.decode("utf-8") if output == "svg" else image,
+                caption="Graph with Ports/Handles",
+            )
         except Exception as e:
             st.error(f"Failed to parse or render: {e}")
 
@@ -1,126 +1,205 @@
 import streamlit as st
 import json
-import tempfile
-from graphviz import Digraph
-from collections import Counter
-
-def create_node_graph(json_data):
-    dot = Digraph("node_graph", format="png")
-    dot.attr(rankdir="LR", dpi="300", size="10,10!")
-
-    # Collect IDs for duplicates
-    node_ids = [node["id"] for node in json_data["nodes"]]
-    handle_ids = []
-    for node in json_data["nodes"]:
-        handle_ids.extend(h["id"] for h in node["data"].get("handlers", []))
-
-    node_id_count = Counter(node_ids)
-    handle_id_count = Counter(handle_ids)
-
-    valid_handles = {}
-    valid_node_ids = set(node_ids)
+from graph_ir import INPUT, load_graph
+from level_of_detail import AUTO, OVERVIEW, overview_model, resolve_detail
+from metrics import span
+from render_cache import render_cache, render_key
+from render_model import ModelCluster, ModelEdge, ModelNode, RenderModel, Row, render_model
+from render_options import (
+    DEFAULT_ENGINE, DEFAULT_OUTPUT, ENGINES, OUTPUT_FORMATS, PNG_PIXEL_BUDGET, graph_attrs,
+)
+from stable_layout import render_stable
+
+def node_graph_attrs(graph, output=DEFAULT_OUTPUT, pixel_budget=PNG_PIXEL_BUDGET, expand_depth=0):
+    """
+    Graphviz graph attributes for rendering graph (a GraphIR) as output,
+    sized for the nodes of groups expanded down to expand_depth levels.
+    """
+    node_count, edge_count = graph.hierarchy().size(expand_depth)
+    return graph_attrs(output, node_count, edge_count, pixel_budget)
+
+def node_graph_detail(graph, detail=AUTO, expand_depth=0):
+    """
+    The detail level create_node_graph uses: "auto" becomes "overview"
+    for graphs past the level-of-detail thresholds, else "full".
+    """
+    node_count, _ = graph.hierarchy().size(expand_depth)
+    handle_count = sum(len(node.handles) for node in graph.nodes)
+    return resolve_detail(detail, node_count, handle_count)
+
+def node_graph_key(json_data, output=DEFAULT_OUTPUT, pixel_budget=PNG_PIXEL_BUDGET,
+                   engine=DEFAULT_ENGINE, expand_depth=0, detail=AUTO, expanded=()):
+    """
+    Render cache key for create_node_graph with the same arguments.
+    """
+    graph = load_graph(json_data)
+    extra = {}
+    if node_graph_detail(graph, detail, expand_depth) == OVERVIEW:
+        # The overview never expands groups
+        expand_depth = 0
+        extra = {"detail": OVERVIEW, "expanded": sorted(expanded)}
+    elif expand_depth:
+        extra = {"expand": expand_depth}
+    attrs = node_graph_attrs(graph, output, pixel_budget, expand_depth)
+    return render_key("node_graph", graph.fingerprint(), format=output, engine=engine, **attrs, **extra)
+
+def node_graph_model(json_data, expand_depth=0):
+    """
+    Build the RenderModel for React Flow-style graph data (a dict or a
+    GraphIR). Duplicate node and handle ids are red, nodes that edges
+    reference but the data lacks become dotted boxes, and edges into a
+    missing target handle are red.
+
+    With expand_depth > 0, group nodes are drawn inline as clusters that
+    hold the group node and its own workflow, nested up to expand_depth
+    levels. Node ids inside a group are prefixed with the group path
+    ("group/child") so they cannot collide with the parent's.
+    """
+    graph = load_graph(json_data)
+    model = RenderModel()
+    add_graph_to_model(model, graph, "", expand_depth, model.clusters)
+    return model
+
+def add_graph_to_model(model, graph, prefix, expand_depth, clusters):
+    """
+    Add the nodes and edges of graph to model with ids prefixed by prefix,
+    expanding group nodes into clusters appended to clusters. Returns the
+    ids added at this level that are not inside a nested cluster.
+    """
+    level_ids = []
     dotted_nodes_created = set()
 
     def ensure_dotted_node(node_id):
         if node_id not in dotted_nodes_created:
-            dot.node(node_id, label=node_id, shape="box", style="dotted")
+            model.nodes.append(ModelNode(prefix + node_id, dotted=True))
+            level_ids.append(prefix + node_id)
             dotted_nodes_created.add(node_id)
 
     # Create normal nodes
-    for node in json_data["nodes"]:
-        node_id = node["id"]
+    for node in graph.nodes:
+        node_id = node.id
         short_id = node_id.split("-")[0]
-        name = node["data"].get("name", "")
 
         # Color node label red if its ID is a duplicate
-        node_color = "red" if node_id_count[node_id] > 1 else "black"
+        node_color = "red" if graph.node_id_counts[node_id] > 1 else "black"
 
         # Build handle rows, coloring handles red if duplicates
         inputs, outputs = [], []
-        for h in node["data"].get("handlers", []):
-            h_id = h["id"]
-            h_type = h["type"].split('.')[-1].lower()
-            color = "red" if handle_id_count[h_id] > 1 else "black"
-            label_str = f'<font face="monospace" color="{color}">{h_id.split("-")[0]} ({h_type})</font>'
-            if h["handlerType"].lower() == "input":
-                inputs.append((h_id, label_str))
+        for h in node.handles:
+            h_type = h.type.split('.')[-1].lower()
+            color = "red" if graph.handle_id_counts[h.id] > 1 else "black"
+            row = Row(h.id, f'{h.id.split("-")[0]} ({h_type})', color, mono=True)
+            if h.direction == INPUT:
+                inputs.append(row)
             else:
-                outputs.append((h_id, label_str))
-
-        valid_handles[node_id] = [h[0] for h in inputs + outputs]
-
-        in_rows = "".join(
-            f'<tr><td port="{h_id}" align="left">{label}</td></tr>'
-            for (h_id, label) in inputs
-        ) or '<tr><td align="left">&nbsp;</td></tr>'
-
-        out_rows = "".join(
-            f'<tr><td port="{h_id}" align="right">{label}</td></tr>'
-            for (h_id, label) in outputs
-        ) or '<tr><td align="right">&nbsp;</td></tr>'
-
-        label = (
-            f'<<table BORDER="1" CELLBORDER="0" CELLSPACING="0">'
-            f'<tr><td colspan="2" align="center">'
-            f'<font color="{node_color}">{name}</font><br/>'
-            f'<font face="monospace" color="{node_color}">{short_id}</font></td></tr>'
-            f'<tr>'
-            f'  <td valign="top"><table BORDER="0" CELLBORDER="0" CELLSPACING="0">{in_rows}</table></td>'
-            f'  <td valign="top"><table BORDER="0" CELLBORDER="0" CELLSPACING="0">{out_rows}</table></td>'
-            f'</tr>'
-            f'</table>>'
-        )
-
-        dot.node(node_id, label=label, shape="plaintext")
+                outputs.append(row)
+
+        header = [(node.name, node_color, False, False), (short_id, node_color, True, False)]
+        model.nodes.append(ModelNode(prefix + node_id, header, inputs=inputs, outputs=outputs))
+
+        if node.group is not None and expand_depth > 0:
+            cluster = ModelCluster(prefix + node_id, node.name or "Untitled group")
+            cluster.node_ids.append(prefix + node_id)
+            cluster.node_ids += add_graph_to_model(
+                model, node.group, f"{prefix}{node_id}/", expand_depth - 1, cluster.clusters,
+            )
+            clusters.append(cluster)
+        else:
+            level_ids.append(prefix + node_id)
 
     # Add edges
-    for edge in json_data["edges"]:
-        s_node = edge["source"]
-        s_handle = edge.get("sourceHandle", "NONE")
-        t_node = edge["target"]
-        t_handle = edge.get("targetHandle", "NONE")
+    for edge in graph.edges:
+        s_node, s_handle = edge.source, edge.source_handle
+        t_node, t_handle = edge.target, edge.target_handle
+        s_valid = graph.has_node(s_node)
+        t_valid = graph.has_node(t_node)
 
         # Ensure dotted node if source/target node is missing from JSON
-        if s_node not in valid_node_ids:
+        if not s_valid:
             ensure_dotted_node(s_node)
-        if t_node not in valid_node_ids:
+        if not t_valid:
             ensure_dotted_node(t_node)
 
         # Determine if the edge should be dotted
-        edge_style = "dotted" if (s_node not in valid_node_ids or t_node not in valid_node_ids) else "solid"
+        edge_style = "solid" if s_valid and t_valid else "dotted"
 
-        # Figure out source port
-        if s_node in valid_node_ids and s_handle in valid_handles[s_node]:
-            from_port = f'{s_node}:{s_handle}'
-        else:
-            from_port = s_node
-
-        # Figure out target port
-        if t_node in valid_node_ids and t_handle in valid_handles[t_node]:
-            to_port = f'{t_node}:{t_handle}'
-        else:
-            to_port = t_node
+        # Ports only when the handle exists on that node
+        from_port = s_handle if graph.has_handle(s_node, s_handle) else None
+        to_port = t_handle if graph.has_handle(t_node, t_handle) else None
 
         # Color edge red if the node is valid but the target handle doesn't exist
-        edge_color = "red" if (t_node in valid_node_ids and t_handle not in valid_handles[t_node]) else "black"
-
-        # Add the edge with the determined style and color
-        dot.edge(from_port, to_port, color=edge_color, style=edge_style)
-
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmpfile:
-        dot.render(tmpfile.name, cleanup=True)
-        return tmpfile.name + ".png"
-
-st.title("Node Graph Generator")
-
-js_input = st.text_area("Paste JSON here", height=300)
-if st.button("Render Graph"):
-    if not js_input.strip():
-        st.error("No JSON provided.")
+        edge_color = "red" if (t_valid and to_port is None) else "black"
+
+        model.edges.append(ModelEdge(
+            prefix + s_node, from_port, prefix + t_node, to_port, edge_color, edge_style,
+        ))
+
+    return level_ids
+
+def node_graph_view_model(graph, expand_depth=0, detail=AUTO, expanded=()):
+    """
+    The RenderModel create_node_graph draws for graph (a GraphIR) at this
+    level of detail: the folded overview, or the full model with groups
+    expanded down to expand_depth.
+    """
+    with span("model"):
+        if node_graph_detail(graph, detail, expand_depth) == OVERVIEW:
+            return overview_model(graph, expanded)
+        return node_graph_model(graph, expand_depth)
+
+def create_node_graph(json_data, output=DEFAULT_OUTPUT, pixel_budget=PNG_PIXEL_BUDGET,
+                      engine=DEFAULT_ENGINE, expand_depth=0, detail=AUTO, expanded=(),
+                      layout_id=None, highlight=False):
+    """
+    Render the graph (a dict or a GraphIR) and return the image bytes.
+    output is "png" (DPI adapted to the graph size, at most pixel_budget
+    pixels) or "svg". engine "layered" draws SVG in-process instead of
+    running dot. expand_depth draws nested groups inline as clusters.
+    detail "overview" (or "auto" on a large graph) draws the folded
+    level-of-detail model, with the regions in expanded unfolded.
+    Identical graphs are served from the render cache instead of being
+    laid out again.
+
+    With a layout_id, the layered engine keeps the nodes that did not
+    change since the last render under that id where they were, and
+    highlight marks what was added, changed or removed (see
+    stable_layout.py).
+    """
+    graph = load_graph(json_data)
+    key = node_graph_key(graph, output, pixel_budget, engine, expand_depth, detail, expanded)
+
+    overview = node_graph_detail(graph, detail, expand_depth) == OVERVIEW
+    if overview:
+        attrs = node_graph_attrs(graph, output, pixel_budget)
     else:
-        try:
-            data = json.loads(js_input)
-            png_path = create_node_graph(data)
-            st.image(png_path)
-        except Exception as e:
-            st.error(f"Failed to parse or render graph: {e}")
+        attrs = node_graph_attrs(graph, output, pixel_budget, expand_depth)
+
+    def make_model():
+        return node_graph_view_model(graph, expand_depth, detail, expanded)
+
+    if layout_id is not None and engine == "layered":
+        return render_stable(key, make_model, layout_id, "node_graph", output, attrs, engine, highlight)
+    cached = render_cache.get(key, ext=output)
+    if cached is not None:
+        return cached
+    return render_model(make_model(), key, "node_graph", output, attrs, engine)
+
+def main():
+    st.title("Node Graph Generator")
+
+    js_input = st.text_area("Paste JSON here", height=300)
+    output = st.radio("Output format", OUTPUT_FORMATS, horizontal=True)
+    engine = st.radio("Layout engine", ENGINES, horizontal=True)
+    if st.button("Render Graph"):
+        if not js_input.strip():
+            st.error("No JSON provided.")
+        else:
+            try:
+                data = json.loads(js_input)
+                image = create_node_graph(data, output, engine=engine)
+                st.image(image.decode("utf-8") if output == "svg" else image)
+            except Exception as e:
+                st.error(f"Failed to parse or render graph: {e}")
+
+if __name__ == "__main__":
+    main()
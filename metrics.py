@@ -0,0 +1,308 @@
+"""
+Per-stage latency instrumentation.
+
+With METRICS=1 (or METRICS_FILE / METRICS_PORT set), span() times one
+stage of handling a request and optionally records its payload size:
+
+    with span("dot") as s:
+        data = dot.pipe()
+        s.size = len(data)
+
+Every span goes into the Trace of the current request (one Streamlit
+script run, see trace()) and into process-wide histograms per stage.
+The histograms are written to METRICS_FILE (Prometheus text format, or
+JSON for a .json path) at most every METRICS_WRITE_SECONDS, and served on
+METRICS_PORT at /metrics and /metrics.json.
+
+Switched off, span() returns one shared no-op object and nothing is
+recorded or written.
+
+The endpoint has no authentication and listens on 127.0.0.1 unless
+METRICS_HOST says otherwise.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_FILE = os.getenv("METRICS_FILE") or None
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_ENABLED = os.getenv("METRICS", "0") == "1" or bool(METRICS_FILE) or bool(METRICS_PORT)
+METRICS_WRITE_SECONDS = float(os.getenv("METRICS_WRITE_SECONDS", 5))
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_local = threading.local()
+
+
+class Span:
+    """
+    One timed stage. depth is how many spans it is nested in; size is the
+    payload in bytes, if the stage has one.
+    """
+    __slots__ = ("stage", "seconds", "size", "depth", "_start")
+
+    def __init__(self, stage, size=None, seconds=0.0, depth=0):
+        self.stage = stage
+        self.size = size
+        self.seconds = seconds
+        self.depth = depth
+        self._start = 0.0
+
+    def __enter__(self):
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        current = getattr(_local, "trace", None)
+        if current is not None:
+            current.spans.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        _local.depth = self.depth
+        registry.observe(self.stage, self.seconds, self.size)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    # Assigning a size is accepted and dropped
+    size = property(lambda self: None, lambda self, value: None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(stage, size=None):
+    """
+    Context manager timing stage; a no-op unless metrics are enabled.
+    """
+    if not METRICS_ENABLED:
+        return _NOOP
+    return Span(stage, size)
+
+
+def record(stage, seconds, size=None):
+    """
+    Record a stage the caller timed itself, e.g. one spread over many
+    small steps, nested in the current span.
+    """
+    if not METRICS_ENABLED:
+        return
+    done = Span(stage, size, seconds, getattr(_local, "depth", 0))
+    current = getattr(_local, "trace", None)
+    if current is not None:
+        current.spans.append(done)
+    registry.observe(stage, seconds, size)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "size_total")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.size_total = 0
+
+    def observe(self, seconds, size=None):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        if size:
+            self.size_total += size
+
+    def cumulative(self):
+        out, running = [], 0
+        for count in self.counts:
+            running += count
+            out.append(running)
+        return out
+
+
+class MetricsRegistry:
+    """
+    Latency histograms and payload byte totals per stage.
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, size=None):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.observe(seconds, size)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "sum_seconds": h.total,
+                    "bytes": h.size_total,
+                    "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.cumulative() + [h.count])),
+                }
+                for stage, h in sorted(self._stages.items())
+            }
+
+    def to_text(self):
+        """
+        Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP render_stage_seconds Time spent in each stage of a request.",
+            "# TYPE render_stage_seconds histogram",
+        ]
+        stages = self.to_dict()
+        for stage, data in stages.items():
+            for bound, count in data["buckets"].items():
+                lines.append(f'render_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'render_stage_seconds_sum{{stage="{stage}"}} {data["sum_seconds"]:.6f}')
+            lines.append(f'render_stage_seconds_count{{stage="{stage}"}} {data["count"]}')
+        lines += [
+            "# HELP render_stage_bytes_total Payload bytes handled by each stage.",
+            "# TYPE render_stage_bytes_total counter",
+        ]
+        for stage, data in stages.items():
+            lines.append(f'render_stage_bytes_total{{stage="{stage}"}} {data["bytes"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        text = json.dumps(self.to_dict(), indent=2) if path.endswith(".json") else self.to_text()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
+
+
+registry = MetricsRegistry()
+
+
+class Trace:
+    """
+    The spans recorded while handling one request, in the order they
+    started, so nested spans follow the span they are nested in.
+    """
+    __slots__ = ("spans", "started")
+
+    def __init__(self):
+        self.spans = []
+        self.started = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+_export_lock = threading.Lock()
+_last_write = 0.0
+_server = None
+
+
+def _export():
+    global _last_write, _server
+    with _export_lock:
+        if METRICS_PORT and _server is None:
+            try:
+                _server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), _MetricsHandler)
+            except OSError as err:
+                print(f"Could not serve metrics on {METRICS_HOST}:{METRICS_PORT}: {err}")
+                _server = False
+            else:
+                threading.Thread(target=_server.serve_forever, daemon=True).start()
+        if METRICS_FILE and time.time() - _last_write >= METRICS_WRITE_SECONDS:
+            _last_write = time.time()
+            try:
+                registry.write(METRICS_FILE)
+            except OSError as err:
+                print(f"Could not write metrics to {METRICS_FILE}: {err}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body, content_type = registry.to_text(), "text/plain; version=0.0.4"
+        elif path == "/metrics.json":
+            body, content_type = json.dumps(registry.to_dict()), "application/json"
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@contextmanager
+def trace(export=True):
+    """
+    Collect the spans of one request in this thread. Yields the Trace, or
+    None when metrics are off. With export, the metrics file and endpoint
+    are updated afterwards.
+    """
+    if not METRICS_ENABLED:
+        yield None
+        return
+    current = Trace()
+    outer = getattr(_local, "trace", None)
+    _local.trace = current
+    try:
+        yield current
+    finally:
+        _local.trace = outer
+        if export:
+            _export()
+
+
+def run_traced(fn, *args):
+    """
+    Run fn(*args) in a render worker process. Returns the result and the
+    (stage, seconds, size, depth) of the spans recorded, for
+    observe_remote() and add_remote().
+    """
+    with trace(export=False) as current:
+        result = fn(*args)
+    return result, [(s.stage, s.seconds, s.size, s.depth) for s in current.spans]
+
+
+def observe_remote(spans):
+    """
+    Count spans recorded in a worker process in this process's histograms.
+    """
+    for stage, seconds, size, _ in spans:
+        registry.observe(stage, seconds, size)
+
+
+def add_remote(spans):
+    """
+    Show spans recorded in a worker process in the current request's
+    trace, nested under the span that is waiting for them.
+    """
+    current = getattr(_local, "trace", None)
+    if current is None:
+        return
+    depth = getattr(_local, "depth", 0)
+    current.spans.extend(Span(stage, size, seconds, depth + d) for stage, seconds, size, d in spans)
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from level_of_detail import AUTO
+from make_alt_node_graph import alt_node_graph_key, create_alt_node_graph_with_handles
+from make_node_graph import create_node_graph, node_graph_key
+from render_model import LAYERED_MAX_NODES
+from render_options import DEFAULT_ENGINE, DEFAULT_OUTPUT, PNG_PIXEL_BUDGET
+from render_scheduler import RenderQueueFull, get_scheduler
+from graph_ir import GRAPH_TRANSITIONS, load_graph
+from tiles import opens_tiled
+from workflows import get_workflow_graph
+
+# Off unless turned on in the UI or with PREFETCH=1
+PREFETCH_DEFAULT = os.getenv("PREFETCH", "0") == "1"
+PREFETCH_FETCH_WORKERS = int(os.getenv("PREFETCH_FETCH_WORKERS", 8))
+# Wait between attempts while the background render slots are taken
+PREFETCH_RETRY_SECONDS = float(os.getenv("PREFETCH_RETRY_SECONDS", 1))
+
+
+def render_job(graph, output=DEFAULT_OUTPUT, engine=DEFAULT_ENGINE, expand_depth=0,
+               detail=AUTO, expanded=()):
+    """
+    The render cache key and the scheduler job (function, *args) for a
+    GraphIR, shared by app.render_graph and prefetching so both use the
+    same renderer and key.
+    """
+    budget = PNG_PIXEL_BUDGET
+    if graph.format == GRAPH_TRANSITIONS:
+        key = alt_node_graph_key(graph, output, engine, budget)
+        return key, (create_alt_node_graph_with_handles, graph, output, engine, budget)
+    key = node_graph_key(graph, output, budget, engine, expand_depth, detail, expanded)
+    return key, (create_node_graph, graph, output, budget, engine, expand_depth, detail, expanded)
+
+
+def renders_in_process(graph, output=DEFAULT_OUTPUT, engine=DEFAULT_ENGINE, expand_depth=0):
+    """
+    Whether app.render_graph draws graph itself rather than through the
+    scheduler: small layered SVGs, which need no dot process.
+    """
+    return (
+        engine == "layered" and output == "svg"
+        and len(graph.nodes) <= LAYERED_MAX_NODES and not expand_depth
+    )
+
+
+class Prefetcher:
+    """
+    Fetches and pre-renders every workflow of a workspace in the background.
+
+    Graphs are fetched on a thread pool and rendered through the shared
+    render scheduler, so prefetching counts against the same Graphviz
+    worker cap as interactive renders. Its renders are submitted in the
+    background and wait for a background slot, leaving the rest of the
+    queue to interactive renders. Finished images land in the render
+    cache, and the "Render" buttons then get cache hits. Each workflow and
+    every nested group is rendered as the app first shows it; graphs the
+    app opens in the tiled viewer or draws in-process are skipped.
+    """
+
+    def __init__(self, fetch_workers=PREFETCH_FETCH_WORKERS):
+        self._fetch_pool = ThreadPoolExecutor(
+            max_workers=fetch_workers, thread_name_prefix="prefetch-fetch"
+        )
+        self._jobs = {}  # (workflow id, output, engine) -> Future
+        self._lock = threading.Lock()
+
+    def prefetch(self, token, workflow_ids, output=DEFAULT_OUTPUT, engine=DEFAULT_ENGINE):
+        """
+        Queue every workflow id that is not already done or in flight for
+        this output format and engine. Failed jobs are retried on the next
+        call.
+        """
+        with self._lock:
+            for wf_id in workflow_ids:
+                job = self._jobs.get((wf_id, output, engine))
+                if job is not None and not (job.done() and job.exception()):
+                    continue
+                self._jobs[(wf_id, output, engine)] = self._fetch_pool.submit(
+                    self._fetch_and_render, token, wf_id, output, engine
+                )
+
+    def _fetch_and_render(self, token, wf_id, output, engine):
+        graph_data = get_workflow_graph(token, wf_id)
+        if graph_data is None:
+            return False
+        scheduler = get_scheduler()
+        hierarchy = load_graph(graph_data).hierarchy()
+        jobs = []
+        for entry in [hierarchy.root] + hierarchy.walk():
+            graph = entry.graph
+            if opens_tiled(graph, output) or renders_in_process(graph, output, engine):
+                continue
+            key, job = render_job(graph, output, engine)
+            jobs.append(self._submit(scheduler, key, *job, ext=output))
+        for job in jobs:
+            job.result(scheduler.timeout)
+        return True
+
+    def _submit(self, scheduler, key, fn, *args, ext):
+        deadline = time.monotonic() + scheduler.timeout
+        while True:
+            try:
+                return scheduler.submit(key, fn, *args, background=True, ext=ext)
+            except RenderQueueFull:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(PREFETCH_RETRY_SECONDS)
+
+    def status(self, wf_id, output=DEFAULT_OUTPUT, engine=DEFAULT_ENGINE):
+        """
+        One of None (not queued), "pending", "ready" or "failed".
+        """
+        job = self._jobs.get((wf_id, output, engine))
+        if job is None:
+            return None
+        if not job.done():
+            return "pending"
+        if job.exception() or not job.result():
+            return "failed"
+        return "ready"
+
+    def shutdown(self):
+        self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+def get_prefetcher():
+    """
+    Return the process-wide Prefetcher, creating its pool on first use.
+    """
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
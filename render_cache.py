@@ -0,0 +1,185 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Optional directory that keeps rendered images between restarts, and how
+# much space it may use. Unset means the cache is memory only.
+CACHE_DIR = os.getenv("RENDER_CACHE_DIR") or None
+MAX_DISK_BYTES = int(os.getenv("RENDER_CACHE_MAX_DISK_BYTES", 512 * 1024 * 1024))
+MAX_MEMORY_BYTES = int(os.getenv("RENDER_CACHE_MAX_MEMORY_BYTES", 128 * 1024 * 1024))
+
+# Leftovers from the old NamedTemporaryFile(delete=False) render path:
+# dot.render(tmpfile.name) wrote its output to "<tmpfile>.png"
+ORPHAN_PATTERNS = ("tmp*.png.png",)
+ORPHAN_MIN_AGE_SECONDS = 3600
+
+
+def render_key(renderer, graph_data, **options):
+    """
+    Build a content-addressed cache key from the renderer name, the graph
+    data and the render options. Dict ordering does not affect the key.
+    """
+    payload = json.dumps(
+        {"renderer": renderer, "graph": graph_data, "options": options},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def purge_orphaned_renders(directory=None, min_age=ORPHAN_MIN_AGE_SECONDS):
+    """
+    Delete temp PNGs left behind by earlier versions of the renderers.
+    Only files older than min_age seconds are touched, so a render that is
+    still in progress in another process is left alone.
+    """
+    directory = directory or tempfile.gettempdir()
+    cutoff = time.time() - min_age
+    removed = 0
+    for pattern in ORPHAN_PATTERNS:
+        for path in glob.glob(os.path.join(directory, pattern)):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+class RenderCache:
+    """
+    Two-tier cache for rendered images.
+
+    The memory tier is an LRU of image bytes bounded by max_memory_bytes.
+    The disk tier keeps one file per key in cache_dir and evicts the least
+    recently used files once the directory grows past max_disk_bytes.
+    It is only used when cache_dir is set.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_memory_bytes=MAX_MEMORY_BYTES,
+                 max_disk_bytes=MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._purged = False
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}.{ext}")
+
+    def get(self, key, ext="png"):
+        """
+        Return the cached bytes for key, or None on a miss.
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        if not self.cache_dir:
+            return None
+        path = self._path(key, ext)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Bump mtime so disk eviction sees this entry as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put(self, key, data, ext="png", disk=True):
+        """
+        Store bytes under key in the memory tier, and in the disk tier
+        unless disk is False (e.g. another process already wrote it).
+        """
+        self._remember(key, data)
+        if not disk or not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key, ext)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as err:
+            print(f"Render cache write failed: {err}")
+            return
+        self._evict_disk()
+
+    def render(self, key, dot):
+        """
+        Render a graphviz.Digraph and return the image bytes. Graphviz
+        output is piped straight into memory; no temp files are written.
+        """
+        if not self._purged:
+            self._purged = True
+            purge_orphaned_renders()
+
+        data = dot.pipe()
+        self.put(key, data, ext=dot.format)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def _remember(self, key, data):
+        size = len(data)
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = data
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        try:
+            entries = []
+            total = 0
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.is_file() or entry.name.endswith(".part"):
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        except OSError:
+            return
+
+        if total <= self.max_disk_bytes:
+            return
+
+        # Oldest first
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+# Shared by every renderer in this process
+render_cache = RenderCache()
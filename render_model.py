@@ -0,0 +1,251 @@
+from html import escape
+
+from graphviz import Digraph
+
+from metrics import span
+from render_cache import render_cache
+from render_options import ENGINES
+
+# The in-process engine only emits SVG and is meant for small and medium
+# graphs; anything else goes to Graphviz
+LAYERED_MAX_NODES = 400
+
+# Change markings set by stable_layout when highlighting edits
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+
+class Row:
+    """
+    One handle row of a node. port is None for rows without an edge anchor.
+    """
+    __slots__ = ("port", "text", "color", "mono")
+
+    def __init__(self, port, text, color="black", mono=False):
+        self.port = port
+        self.text = text
+        self.color = color
+        self.mono = mono
+
+
+class ModelNode:
+    """
+    A node as the renderers draw it: header lines (text, color, mono, bold),
+    free-form body lines, and input/output handle rows. dotted nodes are
+    placeholders for ids that edges reference but the data does not define.
+    mark is None, ADDED, CHANGED or REMOVED.
+    """
+    __slots__ = ("id", "header", "body", "inputs", "outputs", "dotted", "mark")
+
+    def __init__(self, id, header=(), body=None, inputs=(), outputs=(), dotted=False, mark=None):
+        self.id = id
+        self.header = list(header)
+        self.body = body
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.dotted = dotted
+        self.mark = mark
+
+    def signature(self):
+        """
+        Everything that is drawn for the node, for telling whether it
+        changed between two renders.
+        """
+        return (
+            tuple(self.header),
+            tuple(self.body) if self.body is not None else None,
+            tuple((r.port, r.text, r.color, r.mono) for r in self.inputs),
+            tuple((r.port, r.text, r.color, r.mono) for r in self.outputs),
+            self.dotted,
+        )
+
+
+class ModelEdge:
+    __slots__ = ("source", "source_port", "target", "target_port", "color", "style", "label", "mark")
+
+    def __init__(self, source, source_port, target, target_port, color="black",
+                 style="solid", label=None, mark=None):
+        self.source = source
+        self.source_port = source_port
+        self.target = target
+        self.target_port = target_port
+        self.color = color
+        self.style = style
+        self.label = label
+        self.mark = mark
+
+    def identity(self):
+        return (self.source, self.source_port, self.target, self.target_port)
+
+
+class ModelCluster:
+    """
+    A labelled box around node_ids, e.g. a group node drawn together with
+    its expanded workflow. clusters holds nested ModelClusters.
+    """
+    __slots__ = ("id", "label", "node_ids", "clusters")
+
+    def __init__(self, id, label, node_ids=None, clusters=None):
+        self.id = id
+        self.label = label
+        self.node_ids = node_ids if node_ids is not None else []
+        self.clusters = clusters if clusters is not None else []
+
+
+class RenderModel:
+    """
+    Renderer-neutral description of a node graph, with duplicate and
+    dangling markings already applied. Both Graphviz and the layered
+    engine draw from it; clusters are drawn by Graphviz only.
+    """
+    __slots__ = ("nodes", "edges", "clusters")
+
+    def __init__(self, nodes=None, edges=None, clusters=None):
+        self.nodes = nodes if nodes is not None else []
+        self.edges = edges if edges is not None else []
+        self.clusters = clusters if clusters is not None else []
+
+
+def _row_label(row):
+    text = escape(row.text)
+    if row.mono:
+        return f'<font face="monospace" color="{row.color}">{text}</font>'
+    if row.color != "black":
+        return f'<font color="{row.color}">{text}</font>'
+    return text
+
+
+def _header_label(header):
+    parts = []
+    for text, color, mono, bold in header:
+        text = escape(text)
+        if bold:
+            text = f"<b>{text}</b>"
+        if mono:
+            text = f'<font face="monospace" color="{color}">{text}</font>'
+        elif color != "black" or not bold:
+            text = f'<font color="{color}">{text}</font>'
+        parts.append(text)
+    return "<br/>".join(parts)
+
+
+def node_label(node):
+    """
+    Graphviz HTML-table label for a ModelNode.
+    """
+    in_rows = "".join(
+        f'<tr><td port="{row.port}" align="left">{_row_label(row)}</td></tr>'
+        if row.port is not None else
+        f'<tr><td align="left">{_row_label(row)}</td></tr>'
+        for row in node.inputs
+    ) or '<tr><td align="left">&nbsp;</td></tr>'
+
+    out_rows = "".join(
+        f'<tr><td port="{row.port}" align="right">{_row_label(row)}</td></tr>'
+        if row.port is not None else
+        f'<tr><td align="right">{_row_label(row)}</td></tr>'
+        for row in node.outputs
+    ) or '<tr><td align="right">&nbsp;</td></tr>'
+
+    body_row = ""
+    if node.body is not None:
+        body = "<br/>".join(escape(line) for line in node.body)
+        body_row = f'<tr><td colspan="2" align="left">{body}</td></tr>'
+
+    return (
+        f'<<table BORDER="1" CELLBORDER="0" CELLSPACING="0">'
+        f'<tr><td colspan="2" align="center">{_header_label(node.header)}</td></tr>'
+        f'{body_row}'
+        f'<tr>'
+        f'  <td valign="top"><table BORDER="0" CELLBORDER="0" CELLSPACING="0">{in_rows}</table></td>'
+        f'  <td valign="top"><table BORDER="0" CELLBORDER="0" CELLSPACING="0">{out_rows}</table></td>'
+        f'</tr>'
+        f'</table>>'
+    )
+
+
+def to_digraph(model, name, output, attrs):
+    """
+    Build the graphviz.Digraph for a RenderModel.
+    """
+    dot = Digraph(name, format=output)
+    dot.attr(rankdir="LR", **attrs)
+
+    def add_node(graph, node):
+        if node.dotted:
+            graph.node(node.id, label=node.id, shape="box", style="dotted")
+        else:
+            graph.node(node.id, label=node_label(node), shape="plaintext")
+
+    by_id = {node.id: node for node in model.nodes}
+    clustered = set()
+
+    def add_cluster(parent, cluster):
+        with parent.subgraph(name=f"cluster_{cluster.id}") as sub:
+            sub.attr(label=cluster.label, style="rounded,dashed", color="gray40")
+            for node_id in cluster.node_ids:
+                if node_id in by_id and node_id not in clustered:
+                    add_node(sub, by_id[node_id])
+                    clustered.add(node_id)
+            for child in cluster.clusters:
+                add_cluster(sub, child)
+
+    for cluster in model.clusters:
+        add_cluster(dot, cluster)
+
+    for node in model.nodes:
+        if node.id not in clustered:
+            add_node(dot, node)
+
+    for edge in model.edges:
+        from_port = f"{edge.source}:{edge.source_port}" if edge.source_port else edge.source
+        to_port = f"{edge.target}:{edge.target_port}" if edge.target_port else edge.target
+        extra = {"label": edge.label} if edge.label else {}
+        dot.edge(from_port, to_port, color=edge.color, style=edge.style, **extra)
+
+    return dot
+
+
+def uses_layered(model, output, engine):
+    """
+    True if render_model draws model with the in-process layered engine.
+    """
+    return (
+        engine == "layered" and output == "svg"
+        and len(model.nodes) <= LAYERED_MAX_NODES and not model.clusters
+    )
+
+
+def render_model(model, key, name, output, attrs, engine="graphviz"):
+    """
+    Render a RenderModel to image bytes and store them under key.
+
+    engine="layered" lays the graph out in-process and emits SVG without
+    starting dot. Graphviz is used instead for PNG output, for graphs over
+    LAYERED_MAX_NODES nodes, for models with clusters, and if the layered
+    engine fails.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown layout engine {engine!r}, expected one of {ENGINES}")
+
+    if uses_layered(model, output, engine):
+        # Imported here: layered_layout uses the change markings above
+        from layered_layout import layered_svg
+
+        try:
+            with span("layered") as layered:
+                data = layered_svg(model).encode("utf-8")
+                layered.size = len(data)
+        except Exception as err:
+            print(f"Layered layout failed, falling back to Graphviz: {err}")
+        else:
+            render_cache.put(key, data, ext=output)
+            return data
+
+    with span("labels"):
+        dot = to_digraph(model, name, output, attrs)
+    with span("dot") as run:
+        data = render_cache.render(key, dot)
+        run.size = len(data)
+    return data
@@ -0,0 +1,46 @@
+import os
+
+OUTPUT_FORMATS = ("png", "svg")
+DEFAULT_OUTPUT = os.getenv("RENDER_OUTPUT", "png")
+
+# "graphviz" runs dot; "layered" is the in-process SVG engine
+ENGINES = ("graphviz", "layered")
+DEFAULT_ENGINE = os.getenv("RENDER_ENGINE", "graphviz")
+
+# Largest PNG we are willing to produce, in total pixels
+PNG_PIXEL_BUDGET = int(os.getenv("PNG_PIXEL_BUDGET", 16_000_000))
+MIN_DPI = 72
+MAX_DPI = 300
+
+# Rough drawing area a node / an edge adds to an LR layout, in square inches
+AREA_PER_NODE = 3.0
+AREA_PER_EDGE = 0.25
+
+MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def adaptive_dpi(node_count, edge_count, pixel_budget=PNG_PIXEL_BUDGET):
+    """
+    Pick a DPI so the estimated drawing fits in pixel_budget pixels.
+    Small graphs get MAX_DPI and large ones scale down towards MIN_DPI.
+    """
+    area = max(1.0, node_count * AREA_PER_NODE + edge_count * AREA_PER_EDGE)
+    dpi = int((pixel_budget / area) ** 0.5)
+    return max(MIN_DPI, min(MAX_DPI, dpi))
+
+
+def graph_attrs(output, node_count, edge_count, pixel_budget=PNG_PIXEL_BUDGET):
+    """
+    Return the Graphviz graph attributes for an output mode.
+
+    SVG is vector output and needs no resolution. PNG gets an adaptive DPI
+    and a size cap that keeps width * height within pixel_budget. The cap
+    only ever scales a drawing down, never up.
+    """
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output!r}, expected one of {OUTPUT_FORMATS}")
+    if output == "svg":
+        return {}
+    dpi = adaptive_dpi(node_count, edge_count, pixel_budget)
+    side = pixel_budget ** 0.5 / dpi
+    return {"dpi": str(dpi), "size": f"{side:.2f},{side:.2f}"}
@@ -0,0 +1,213 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+from render_cache import render_cache
+
+# Upper bound on concurrent Graphviz processes for the whole server
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# Distinct renders that may be queued or running before new ones are refused
+RENDER_QUEUE_LIMIT = int(os.getenv("RENDER_QUEUE_LIMIT", 64))
+# How many of those may be background (prefetch) renders, so interactive
+# renders always find a free slot
+RENDER_BACKGROUND_LIMIT = int(os.getenv("RENDER_BACKGROUND_LIMIT", RENDER_QUEUE_LIMIT // 4))
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", 120))
+
+
+def _init_worker():
+    # Workers hand their images back to the parent, which keeps the memory
+    # tier. Holding a second copy in every worker would only waste RAM.
+    render_cache.max_memory_bytes = 0
+
+
+def _copy_result(source, target):
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class RenderQueueFull(RuntimeError):
+    """
+    Raised when too many distinct renders are already waiting.
+    """
+
+
+class RenderScheduler:
+    """
+    Process-wide render queue shared by every Streamlit session.
+
+    Requests are identified by their render cache key. A request for a key
+    that is already queued or running joins the existing job instead of
+    starting another dot process. Jobs run on a process pool with
+    max_workers processes, which caps concurrent Graphviz runs. Background
+    requests may hold at most max_background of the max_pending slots.
+    A worker that dies (killed for memory, say) breaks the whole pool; the
+    pool is then replaced and the jobs it took down are retried once.
+    """
+
+    def __init__(self, max_workers=RENDER_WORKERS, max_pending=RENDER_QUEUE_LIMIT,
+                 timeout=RENDER_TIMEOUT_SECONDS, max_background=RENDER_BACKGROUND_LIMIT):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_background = min(max_background, max_pending - 1)
+        self.timeout = timeout
+        self._pool = None
+        self._inflight = {}  # cache key -> Future
+        self._background = set()  # keys in _inflight submitted in the background
+        self._lock = threading.Lock()
+        # Separate from _lock: pool futures may settle, and replace a broken
+        # pool, on the thread that is submitting under _lock
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn, not fork: the Streamlit server process is multi-threaded
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._pool
+
+    def _replace_pool(self, broken):
+        # The broken pool has already terminated its workers
+        with self._pool_lock:
+            if self._pool is broken:
+                self._pool = None
+
+    def _run(self, fn, args, retries=1):
+        """
+        Run fn(*args) in the pool and return a Future for its result. If
+        the pool breaks under the job, it is retried on a new pool.
+        """
+        pool = self._executor()
+        try:
+            inner = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            if not retries:
+                raise
+            self._replace_pool(pool)
+            return self._run(fn, args, retries - 1)
+
+        job = Future()
+
+        def settle(done):
+            if isinstance(done.exception(), BrokenProcessPool) and retries:
+                print(f"Render pool broke, retrying: {done.exception()}")
+                self._replace_pool(pool)
+                try:
+                    done = self._run(fn, args, retries - 1)
+                except BrokenProcessPool as err:
+                    job.set_exception(err)
+                    return
+            done.add_done_callback(lambda d: _copy_result(d, job))
+
+        inner.add_done_callback(settle)
+        return job
+
+    def submit(self, key, fn, *args, background=False, cache=None, ext="png"):
+        """
+        Schedule fn(*args), whose result is the image for key, and return a
+        Future. Cached images resolve immediately, and identical in-flight
+        requests share one Future. background requests (prefetching) are
+        refused once they hold max_background slots. The result is kept in
+        cache, render_cache unless given, as an ext file.
+        """
+        cache = cache or render_cache
+        cached = cache.get(key, ext=ext)
+        if cached is not None:
+            done = Future()
+            done.set_result(cached)
+            return done
+
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                return job
+            if len(self._inflight) >= self.max_pending:
+                raise RenderQueueFull(
+                    f"{len(self._inflight)} renders already queued, try again shortly"
+                )
+            if background and len(self._background) >= self.max_background:
+                raise RenderQueueFull(
+                    f"{len(self._background)} background renders already queued"
+                )
+            if metrics.METRICS_ENABLED:
+                job = self._submit_traced(fn, args)
+            else:
+                job = self._run(fn, args)
+            self._inflight[key] = job
+            if background:
+                self._background.add(key)
+
+        job.add_done_callback(lambda f: self._finish(key, f, cache, ext))
+        return job
+
+    def _submit_traced(self, fn, args):
+        """
+        Run fn in the pool under metrics.run_traced and return a Future for
+        its plain result. The worker's spans are counted here and kept on
+        the Future as .spans for the requests waiting on it.
+        """
+        job = Future()
+
+        def settle(traced):
+            if traced.cancelled():
+                job.cancel()
+            elif traced.exception() is not None:
+                job.set_exception(traced.exception())
+            else:
+                result, spans = traced.result()
+                metrics.observe_remote(spans)
+                job.spans = spans
+                job.set_result(result)
+
+        self._run(metrics.run_traced, (fn, *args)).add_done_callback(settle)
+        return job
+
+    def _finish(self, key, job, cache, ext):
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._background.discard(key)
+        if not job.cancelled() and job.exception() is None:
+            # The worker already wrote the disk tier, if there is one
+            cache.put(key, job.result(), ext=ext, disk=False)
+
+    def render(self, key, fn, *args, timeout=None, cache=None, ext="png"):
+        """
+        Submit and wait for the result. Raises concurrent.futures.TimeoutError
+        after timeout seconds; the job keeps running and lands in the cache.
+        """
+        job = self.submit(key, fn, *args, cache=cache, ext=ext)
+        result = job.result(timeout or self.timeout)
+        metrics.add_remote(getattr(job, "spans", ()))
+        return result
+
+    def pending(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """
+    Return the process-wide RenderScheduler.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RenderScheduler()
+        return _scheduler
@@ -0,0 +1,209 @@
+"""
+Inverted index over the nodes of all fetched workflows.
+
+Node names, node ids, node kinds, handle ids, handle types and group names
+are split into lowercase terms. Each term maps to the (workflow id, group
+path, node id) locations it occurs at, nested groups included. A query
+matches terms exactly or by prefix, and a location must match every query
+word. Workflows are re-indexed only when their version changes.
+"""
+import re
+import threading
+from bisect import bisect_left
+
+_WORD = re.compile(r"\w+")
+
+SEARCH_LIMIT = 50
+
+
+def terms_of(text):
+    """
+    The lowercase terms for a piece of text: the whole string and each
+    word in it, so "formant.Number" is found by "number" and by itself.
+    """
+    if not text:
+        return set()
+    text = str(text).lower()
+    return {text, *_WORD.findall(text)}
+
+
+class SearchHit:
+    """
+    One matching node. path holds the ids of the groups it is nested in and
+    group_names their names; fields lists what matched (name, type, ...).
+    """
+    __slots__ = ("workflow_id", "workflow_name", "path", "group_names", "node_id", "node_name",
+                 "fields")
+
+    def __init__(self, workflow_id, workflow_name, path, group_names, node_id, node_name, fields):
+        self.workflow_id = workflow_id
+        self.workflow_name = workflow_name
+        self.path = path
+        self.group_names = group_names
+        self.node_id = node_id
+        self.node_name = node_name
+        self.fields = fields
+
+
+class SearchIndex:
+    """
+    term -> workflow id -> {(workflow id, path, node id): set of fields}.
+    Grouping postings by workflow lets one workflow be replaced without
+    touching the postings of the others.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._workflow_terms = {}    # workflow id -> terms it contributed
+        self._versions = {}          # workflow id -> indexed version
+        self._names = {}             # workflow id -> workflow name
+        self._node_names = {}        # workflow id -> {location: (node name, group names)}
+        self._sorted_terms = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._versions)
+
+    def _add(self, term, location, field):
+        postings = self._postings.setdefault(term, {}).setdefault(location[0], {})
+        postings.setdefault(location, set()).add(field)
+
+    def update(self, workflow_id, name, graph, version):
+        """
+        (Re-)index one workflow unless version is the one already indexed.
+        Returns True if the index changed.
+        """
+        with self._lock:
+            if workflow_id in self._versions and self._versions[workflow_id] == version:
+                return False
+            self._remove(workflow_id)
+            self._versions[workflow_id] = version
+            self._names[workflow_id] = name or workflow_id
+            if graph is None:
+                return True
+
+            terms = set()
+            node_names = self._node_names[workflow_id] = {}
+            hierarchy = graph.hierarchy()
+            for entry in [hierarchy.root] + hierarchy.walk():
+                group_names = tuple(hierarchy.breadcrumbs(entry.path))
+                for node in entry.graph.nodes:
+                    location = (workflow_id, entry.path, node.id)
+                    node_names[location] = (node.name or node.kind or node.id, group_names)
+                    fields = [("name", node.name), ("id", node.id), ("kind", node.kind)]
+                    if node.group is not None:
+                        fields.append(("group", node.name))
+                    for h in node.handles:
+                        fields.append(("handle", h.id))
+                        fields.append(("type", h.type))
+                    for field, text in fields:
+                        for term in terms_of(text):
+                            self._add(term, location, field)
+                            terms.add(term)
+            self._workflow_terms[workflow_id] = terms
+            self._sorted_terms = None
+            return True
+
+    def _remove(self, workflow_id):
+        for term in self._workflow_terms.pop(workflow_id, ()):
+            postings = self._postings[term]
+            postings.pop(workflow_id, None)
+            if not postings:
+                del self._postings[term]
+        self._node_names.pop(workflow_id, None)
+        self._versions.pop(workflow_id, None)
+        self._names.pop(workflow_id, None)
+        self._sorted_terms = None
+
+    def remove(self, workflow_id):
+        with self._lock:
+            self._remove(workflow_id)
+
+    def sync(self, items):
+        """
+        Bring the index in line with a workflow index (id -> item with
+        name, updatedAt and workflow): re-index changed workflows and drop
+        removed ones. Returns the number of workflows re-indexed.
+        """
+        changed = 0
+        for workflow_id, item in items.items():
+            version = item.get("updatedAt")
+            if version is not None and self._versions.get(workflow_id) == version:
+                # Unchanged; do not load the graph (see snapshot_store.StoredItem)
+                continue
+            graph = item.get("workflow")
+            version = version or (graph.fingerprint() if graph is not None else None)
+            if self.update(workflow_id, item.get("name"), graph, version):
+                changed += 1
+        with self._lock:
+            for workflow_id in [wf for wf in self._versions if wf not in items]:
+                self._remove(workflow_id)
+        return changed
+
+    def _terms_with_prefix(self, word):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = []
+        i = bisect_left(self._sorted_terms, word)
+        while i < len(self._sorted_terms) and self._sorted_terms[i].startswith(word):
+            terms.append(self._sorted_terms[i])
+            i += 1
+        return terms
+
+    def _locations(self, terms, workflow_ids=None):
+        """
+        Locations of any of terms, within workflow_ids if given.
+        """
+        matches = {}
+        for term in terms:
+            for wf_id, postings in self._postings[term].items():
+                if workflow_ids is not None and wf_id not in workflow_ids:
+                    continue
+                for location, fields in postings.items():
+                    matches.setdefault(location, set()).update(fields)
+        return matches
+
+    def _fields_at(self, location, terms):
+        fields = set()
+        for term in terms:
+            found = self._postings[term].get(location[0], {}).get(location)
+            if found:
+                fields |= found
+        return fields
+
+    def search(self, query, workflow_ids=None, limit=SEARCH_LIMIT):
+        """
+        Nodes matching every word of query (exactly or by prefix), as
+        SearchHits sorted by workflow, group path and node. workflow_ids
+        restricts the search.
+        """
+        words = set(_WORD.findall(query.lower()))
+        if not words:
+            return []
+        with self._lock:
+            # Start from the most selective word and only check the
+            # surviving locations against the others
+            word_terms = sorted(
+                (self._terms_with_prefix(word) for word in words),
+                key=lambda terms: sum(len(self._postings[t]) for t in terms),
+            )
+            result = self._locations(word_terms[0], workflow_ids)
+            for terms in word_terms[1:]:
+                if not result:
+                    break
+                narrowed = {}
+                for location, fields in result.items():
+                    more = self._fields_at(location, terms)
+                    if more:
+                        narrowed[location] = fields | more
+                result = narrowed
+            hits = [
+                SearchHit(wf_id, self._names[wf_id], path, group_names, node_id, node_name, sorted(fields))
+                for (wf_id, path, node_id), fields in result.items()
+                for node_name, group_names in [self._node_names[wf_id][(wf_id, path, node_id)]]
+            ]
+        hits.sort(key=lambda hit: (hit.workflow_name, hit.path, hit.node_name, hit.node_id))
+        return hits[:limit]
+
+
+search_index = SearchIndex()
@@ -0,0 +1,255 @@
+"""
+Local SQLite snapshot of workspace layouts and workflow graphs.
+
+With SNAPSHOT_DB set, workflows.py serves workspaces and workflows from
+this store first and syncs with the APIs in the background, so a cold
+start needs no network round trip and keeps working while the APIs are
+slow or down. Every row carries a version stamp (the workflow's updatedAt,
+or a content hash), and a sync only writes rows whose version changed and
+deletes rows the server no longer lists.
+
+Graphs are pickled GraphIRs tagged with graph_ir.IR_PICKLE_VERSION. Rows
+written by code with another version, and graphs that fail to unpickle,
+are deleted and reported by take_invalidated(), so the caller can fetch
+them again in full.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from graph_ir import IR_PICKLE_VERSION
+
+SNAPSHOT_DB = os.getenv("SNAPSHOT_DB") or None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workspaces (
+    id TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    workflows TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workflows (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    version TEXT NOT NULL,
+    updated_at TEXT,
+    graph BLOB,
+    graph_format INTEGER,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def content_version(data):
+    """
+    Version stamp for data that has no updatedAt of its own.
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def workflow_version(item):
+    if item.get("updatedAt"):
+        return str(item["updatedAt"])
+    graph = item.get("workflow")
+    return graph.fingerprint() if graph is not None else ""
+
+
+class StoredItem(dict):
+    """
+    A workflow item loaded from the store. Its graph is unpickled the
+    first time "workflow" is read, so loading the index does not unpickle
+    every stored graph.
+    """
+    __slots__ = ("_store",)
+
+    def __init__(self, store, wf_id, name, updated_at):
+        super().__init__(id=wf_id, name=name, updatedAt=updated_at)
+        self._store = store
+
+    def _graph(self):
+        graph = self._store.load_graph(dict.__getitem__(self, "id"))
+        self["workflow"] = graph
+        return graph
+
+    def __getitem__(self, key):
+        if key == "workflow" and not dict.__contains__(self, key):
+            return self._graph()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == "workflow" and not dict.__contains__(self, key):
+            return self._graph()
+        return dict.get(self, key, default)
+
+
+class SnapshotStore:
+    """
+    Workspaces and workflows by id, with version stamps.
+
+    One connection is shared by all threads behind a lock; writes are
+    batched into one transaction per sync. Graphs are stored as pickled
+    GraphIRs (a local, trusted cache file), so loading one skips the JSON
+    parse and the IR build.
+    """
+
+    def __init__(self, path=SNAPSHOT_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(workflows)")}
+        if "graph_format" not in columns:
+            # Stores from before the version column; their rows count as stale
+            with self._conn:
+                self._conn.execute("ALTER TABLE workflows ADD COLUMN graph_format INTEGER")
+        self._lock = threading.Lock()
+        self._invalidated = set()  # ids deleted as stale or unreadable
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value),
+            )
+
+    def get_workspace(self, workspace_id):
+        """
+        The stored (workflow_id, title) pairs of a workspace, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT workflows FROM workspaces WHERE id = ?", (workspace_id,),
+            ).fetchone()
+        return [tuple(wf) for wf in json.loads(row[0])] if row else None
+
+    def put_workspace(self, workspace_id, version, workflows):
+        """
+        Store a workspace's workflow list. Returns False if the stored
+        version was already the same and nothing was written.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT version FROM workspaces WHERE id = ?", (workspace_id,),
+            ).fetchone()
+            if row and row[0] == version:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workspaces (id, version, workflows, synced_at) VALUES (?, ?, ?, ?)",
+                (workspace_id, version, json.dumps(workflows), time.time()),
+            )
+            return True
+
+    def load_workflows(self):
+        """
+        All stored workflow items, id -> StoredItem {id, name, updatedAt,
+        workflow}. Rows with another graph format are deleted instead.
+        """
+        with self._lock, self._conn:
+            stale = [row[0] for row in self._conn.execute(
+                "SELECT id FROM workflows WHERE graph IS NOT NULL AND graph_format IS NOT ?",
+                (IR_PICKLE_VERSION,),
+            )]
+            self._conn.executemany("DELETE FROM workflows WHERE id = ?", [(wf_id,) for wf_id in stale])
+            self._invalidated.update(stale)
+            rows = self._conn.execute("SELECT id, name, updated_at FROM workflows").fetchall()
+        return {wf_id: StoredItem(self, wf_id, name, updated_at) for wf_id, name, updated_at in rows}
+
+    def load_graph(self, workflow_id):
+        """
+        The stored GraphIR of a workflow, or None if there is none. A graph
+        of another format version or one that cannot be unpickled is
+        deleted, reported by take_invalidated(), and also returned as None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT graph, graph_format FROM workflows WHERE id = ?", (workflow_id,),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        try:
+            if row[1] != IR_PICKLE_VERSION:
+                raise ValueError(f"graph format {row[1]}, expected {IR_PICKLE_VERSION}")
+            return pickle.loads(row[0])
+        except Exception as err:
+            print(f"Could not load stored graph of workflow {workflow_id}: {err}")
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM workflows WHERE id = ?", (workflow_id,))
+            self._invalidated.add(workflow_id)
+        return None
+
+    def take_invalidated(self):
+        """
+        The ids deleted as stale or unreadable since the last call.
+        """
+        with self._lock:
+            ids, self._invalidated = self._invalidated, set()
+        return ids
+
+    def sync_workflows(self, items):
+        """
+        Make the stored workflows match items (id -> item): write only the
+        rows whose version changed, delete the ones that are gone. Returns
+        (written, deleted) counts.
+        """
+        with self._lock, self._conn:
+            # Rows of another graph format have no usable version
+            stored = {
+                wf_id: version if current else None
+                for wf_id, version, current in self._conn.execute(
+                    "SELECT id, version, graph IS NULL OR graph_format = ? FROM workflows",
+                    (IR_PICKLE_VERSION,),
+                )
+            }
+            now = time.time()
+            changed = []
+            for wf_id, item in items.items():
+                version = workflow_version(item)
+                if stored.get(wf_id) == version:
+                    continue
+                graph = item.get("workflow")
+                changed.append((
+                    wf_id, item.get("name"), version, item.get("updatedAt"),
+                    pickle.dumps(graph, pickle.HIGHEST_PROTOCOL) if graph is not None else None,
+                    IR_PICKLE_VERSION, now,
+                ))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO workflows (id, name, version, updated_at, graph, graph_format, synced_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                changed,
+            )
+            gone = [(wf_id,) for wf_id in stored if wf_id not in items]
+            self._conn.executemany("DELETE FROM workflows WHERE id = ?", gone)
+        return len(changed), len(gone)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """
+    The process-wide SnapshotStore, or None when SNAPSHOT_DB is not set.
+    """
+    global _store
+    if SNAPSHOT_DB is None:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore(SNAPSHOT_DB)
+        return _store
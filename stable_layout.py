@@ -0,0 +1,198 @@
+"""
+Stable re-layout of workflows that change between renders.
+
+The last layout drawn for each layout id (the app uses one per workflow)
+is kept in memory. When the next version of the graph is rendered, its
+RenderModel is diffed against that layout by node id and drawn content
+and by edge identity. Unchanged nodes are pinned where they were and
+only new and changed nodes are placed, so a small edit neither reshuffles
+the picture nor pays for a full layout. With highlight, added and changed
+nodes and edges are outlined and removed ones stay as faded ghosts at
+their old position.
+
+Pinning needs the in-process layered engine: Graphviz dot has no way to
+fix node positions, so every other render is laid out from scratch.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from layered_layout import compute_layout, to_svg
+from metrics import span
+from render_cache import render_cache, render_key
+from render_model import ADDED, CHANGED, REMOVED, ModelEdge, ModelNode, render_model, uses_layered
+
+LAYOUT_HISTORY_SIZE = int(os.getenv("LAYOUT_HISTORY_SIZE", 256))
+# Below this share of unchanged nodes a fresh layout reads better than a
+# patched one
+STABLE_MIN_KEPT = 0.5
+
+
+class LayoutState:
+    """
+    One drawn layout: key is the render key of the image, base_key the key
+    of the graph and options without the history, signatures maps node ids to
+    ModelNode.signature() and edges maps edge identities to ModelEdges.
+    Ghosts of removed nodes and edges are in layout but not in signatures
+    or edges.
+    """
+    __slots__ = ("key", "base_key", "layout", "signatures", "edges")
+
+    def __init__(self, key, base_key, layout, signatures, edges):
+        self.key = key
+        self.base_key = base_key
+        self.layout = layout
+        self.signatures = signatures
+        self.edges = edges
+
+
+class LayoutHistory:
+    """
+    The current LayoutState per layout id, plus an LRU of recent states by
+    render key so that a cached image can become current again.
+    """
+
+    def __init__(self, max_states=LAYOUT_HISTORY_SIZE):
+        self.max_states = max_states
+        self._states = OrderedDict()
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def current(self, layout_id):
+        with self._lock:
+            state = self._states.get(self._current.get(layout_id))
+            if state is None:
+                self._current.pop(layout_id, None)
+            return state
+
+    def restore(self, layout_id, key):
+        """
+        Make the state drawn under key current again. Returns False if it
+        has been evicted.
+        """
+        with self._lock:
+            if key not in self._states:
+                return False
+            self._states.move_to_end(key)
+            self._current[layout_id] = key
+            return True
+
+    def put(self, layout_id, state):
+        with self._lock:
+            self._states[state.key] = state
+            self._states.move_to_end(state.key)
+            self._current[layout_id] = state.key
+            while len(self._states) > self.max_states:
+                self._states.popitem(last=False)
+
+    def clear(self, layout_id):
+        with self._lock:
+            self._current.pop(layout_id, None)
+
+
+layout_history = LayoutHistory()
+
+
+def diff_model(previous, model):
+    """
+    Compare model with a previous LayoutState. Returns (kept, added,
+    changed, removed) node id sets; kept nodes have the same id and draw
+    the same and can be pinned.
+    """
+    kept, added, changed = set(), set(), set()
+    for node in model.nodes:
+        signature = previous.signatures.get(node.id)
+        if signature is None:
+            added.add(node.id)
+        elif signature != node.signature() or node.id not in previous.layout.boxes:
+            changed.add(node.id)
+        else:
+            kept.add(node.id)
+    current = {node.id for node in model.nodes}
+    removed = {node_id for node_id in previous.signatures if node_id not in current}
+    return kept, added, changed, removed
+
+
+def mark_changes(model, previous, added, changed, removed):
+    """
+    Mark added and changed nodes and added edges in model, and append
+    ghosts of the removed nodes and edges.
+    """
+    for node in model.nodes:
+        if node.id in added:
+            node.mark = ADDED
+        elif node.id in changed:
+            node.mark = CHANGED
+
+    current = set()
+    for edge in model.edges:
+        current.add(edge.identity())
+        if edge.identity() not in previous.edges:
+            edge.mark = ADDED
+
+    for node_id in sorted(removed):
+        box = previous.layout.boxes.get(node_id)
+        if box is not None:
+            old = box.node
+            model.nodes.append(ModelNode(
+                old.id, old.header, old.body, old.inputs, old.outputs, old.dotted, REMOVED,
+            ))
+    drawn = {node.id for node in model.nodes}
+    for identity, old in previous.edges.items():
+        if identity not in current and old.source in drawn and old.target in drawn:
+            model.edges.append(ModelEdge(
+                old.source, old.source_port, old.target, old.target_port,
+                old.color, old.style, old.label, REMOVED,
+            ))
+
+
+def render_stable(key, make_model, layout_id, name, output, attrs, engine, highlight=False):
+    """
+    Render like render_model, but lay the graph out against the last
+    layout drawn for layout_id. key is the render key of the graph and
+    options alone; make_model builds the RenderModel when the image is not
+    cached. Returns the image bytes.
+    """
+    base_key = render_key("stable", key, highlight=highlight)
+    previous = layout_history.current(layout_id)
+    if previous is not None and previous.base_key == base_key:
+        # Rerun without an edit: show the same picture again
+        cached = render_cache.get(previous.key, ext=output)
+        if cached is not None:
+            return cached
+    stable_key = key
+    if previous is not None:
+        stable_key = render_key("stable", key, base=previous.key, highlight=highlight)
+    if layout_history.restore(layout_id, stable_key):
+        cached = render_cache.get(stable_key, ext=output)
+        if cached is not None:
+            return cached
+
+    model = make_model()
+    if not uses_layered(model, output, engine):
+        layout_history.clear(layout_id)
+        return render_model(model, key, name, output, attrs, engine)
+
+    signatures = {node.id: node.signature() for node in model.nodes}
+    edges = {edge.identity(): edge for edge in model.edges}
+    keep = set()
+    if previous is not None:
+        kept, added, changed, removed = diff_model(previous, model)
+        if len(kept) >= STABLE_MIN_KEPT * len(model.nodes):
+            keep = kept | removed
+        if highlight:
+            mark_changes(model, previous, added, changed, removed)
+
+    try:
+        with span("layered") as layered:
+            layout = compute_layout(model, previous.layout if previous else None, keep)
+            data = to_svg(model, layout).encode("utf-8")
+            layered.size = len(data)
+    except Exception as err:
+        print(f"Stable layout failed, falling back to a full render: {err}")
+        layout_history.clear(layout_id)
+        return render_model(make_model(), key, name, output, attrs, engine)
+
+    render_cache.put(stable_key, data, ext=output)
+    layout_history.put(layout_id, LayoutState(stable_key, base_key, layout, signatures, edges))
+    return data
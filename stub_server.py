@@ -0,0 +1,160 @@
+"""
+Local stand-in for the Formant login and workflows APIs, for testing.
+
+  python stub_server.py --port 8765 --data fixtures.json
+
+then run the app or the CLIs with
+
+  FORMANT_API_URL=http://127.0.0.1:8765/v1/ WORKFLOWS_API_URL=http://127.0.0.1:8765/
+
+The data file holds {"workspaces": [...], "workflows": [...]} in the shapes
+the real endpoints return. It is re-read when it changes, so edits show up
+as updates. Without --data a small demo workspace is served. The workflow
+list carries an ETag and answers If-None-Match with 304.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEMO_GRAPH = {
+    "nodes": [
+        {"id": "source-1", "data": {"name": "Source", "handlers": [
+            {"id": "out-1", "type": "demo.Number", "handlerType": "output"},
+        ]}},
+        {"id": "sink-1", "data": {"name": "Sink", "handlers": [
+            {"id": "in-1", "type": "demo.Number", "handlerType": "input"},
+        ]}},
+    ],
+    "edges": [
+        {"source": "source-1", "sourceHandle": "out-1", "target": "sink-1", "targetHandle": "in-1"},
+    ],
+}
+
+DEMO_DATA = {
+    "workspaces": [{
+        "id": "demo",
+        "updatedAt": "2024-01-01T00:00:00Z",
+        "layout": {"dockLayout": {"dockbox": {"children": [
+            {"tabs": [
+                {"id": "wf-1", "title": "Demo workflow", "type": "Workflow"},
+                {"id": "wf-2", "title": "Demo copy", "type": "Workflow"},
+            ]},
+        ]}}},
+    }],
+    "workflows": [
+        {"id": "wf-1", "name": "Demo workflow", "updatedAt": "2024-01-01T00:00:00Z", "workflow": DEMO_GRAPH},
+        {"id": "wf-2", "name": "Demo copy", "updatedAt": "2024-01-01T00:00:00Z", "workflow": DEMO_GRAPH},
+    ],
+}
+
+
+class StubData:
+    """
+    The served data, reloaded from path whenever its mtime changes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._mtime = None
+        self.workspaces = DEMO_DATA["workspaces"]
+        self.workflows_body = b""
+        self.workflows_etag = ""
+        self._set_workflows(DEMO_DATA["workflows"])
+
+    def _set_workflows(self, workflows):
+        self.workflows_body = json.dumps({"items": workflows}).encode("utf-8")
+        self.workflows_etag = '"' + hashlib.sha256(self.workflows_body).hexdigest()[:16] + '"'
+
+    def reload(self):
+        if not self.path:
+            return
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.workspaces = data.get("workspaces", [])
+        self._set_workflows(data.get("workflows", []))
+        self._mtime = mtime
+
+
+def make_handler(data, latency=0.0):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            print(f"stub: {self.command} {self.path} - {format % args}")
+
+        def _send(self, status, body=b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def _json(self, status, payload):
+            self._send(status, json.dumps(payload).encode("utf-8"), {"Content-Type": "application/json"})
+
+        def do_POST(self):
+            time.sleep(latency)
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path.rstrip("/").endswith("/admin/auth/login"):
+                self._json(200, {"authentication": {"accessToken": "stub-token"}})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_GET(self):
+            time.sleep(latency)
+            data.reload()
+            path = self.path.split("?")[0].rstrip("/")
+            if path == "/api/workflows":
+                if self.headers.get("If-None-Match") == data.workflows_etag:
+                    self._send(304, headers={"ETag": data.workflows_etag})
+                    return
+                self._send(200, data.workflows_body, {
+                    "Content-Type": "application/json", "ETag": data.workflows_etag,
+                })
+            elif path == "/api/workspaces":
+                self._json(200, {"items": data.workspaces})
+            elif path.startswith("/api/workspaces/"):
+                workspace_id = path.rsplit("/", 1)[-1]
+                for wspace in data.workspaces:
+                    if wspace["id"] == workspace_id:
+                        self._json(200, wspace)
+                        return
+                self._json(404, {"error": "not found"})
+            else:
+                self._json(404, {"error": "not found"})
+
+    return StubHandler
+
+
+def serve(host="127.0.0.1", port=8765, data_path=None, latency=0.0):
+    """
+    Create the stub server; call serve_forever() on it, or run it in a
+    thread from a test.
+    """
+    return ThreadingHTTPServer((host, port), make_handler(StubData(data_path), latency))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve stub Formant and workflows API endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data", help='JSON file with {"workspaces": [...], "workflows": [...]}')
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each reply")
+    args = parser.parse_args(argv)
+
+    server = serve(args.host, args.port, args.data, args.latency)
+    print(f"Serving on http://{args.host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Tests for the chunked JSON scanner in graph_stream.py. Every document is
+fed at every chunk size from 1 character up, so each token and value
+gets split at every possible boundary.
+"""
+import json
+
+import pytest
+
+from graph_ir import load_graph
+from graph_stream import (
+    iter_json_arrays, iter_json_values, iter_text_chunks, iter_workflow_items, load_graph_stream,
+)
+
+REACT_FLOW_DOC = {
+    "meta": [{}, {"a": 1}, [], "x]}\"", -1.5e3, None, True],
+    "nodes": [
+        {"id": "n1", "data": {"name": "Fetch é \\ \"q\"", "handlers": [
+            {"id": "h1", "type": "a.Number", "handlerType": "output"},
+        ]}},
+        {"id": "n2", "position": {"x": 1, "y": [2, {"z": {}}]}, "data": {"name": "Sink", "handlers": [
+            {"id": "h2", "type": "a.Number", "handlerType": "input"},
+        ]}},
+    ],
+    "edges": [{"source": "n1", "sourceHandle": "h1", "target": "n2", "targetHandle": "h2"}],
+}
+
+TRANSITIONS_DOC = {
+    "graph": {
+        "nodes": [{"id": "a", "type": "start"}, {"id": "b", "attributes": [{"name": "v", "value": 3}]}],
+        "edges": [{"from": {"node": "a", "output": "o"}, "to": {"node": "b", "input": "i"}}],
+    },
+    "transitions": [{"from": "a", "to": "b", "method": {"type": "immediately_after"}}],
+}
+
+
+def chunked(text):
+    for size in range(1, len(text) + 1):
+        yield size, list(iter_text_chunks(text, size))
+
+
+@pytest.mark.parametrize("doc", [REACT_FLOW_DOC, TRANSITIONS_DOC])
+def test_load_graph_stream_matches_load_graph(doc):
+    text = json.dumps(doc, ensure_ascii=False)
+    expected = load_graph(doc).fingerprint()
+    for size, chunks in chunked(text):
+        assert load_graph_stream(chunks).fingerprint() == expected, size
+
+
+def test_arrays_after_containers_in_other_members():
+    text = json.dumps(REACT_FLOW_DOC)
+    for size, chunks in chunked(text):
+        values = list(iter_json_arrays(chunks, {("meta",), ("edges",)}))
+        assert values == [(("meta",), v) for v in REACT_FLOW_DOC["meta"]] + [
+            (("edges",), REACT_FLOW_DOC["edges"][0]),
+        ], size
+
+
+def test_scalars_in_array_after_empty_object():
+    for size, chunks in chunked('[{}, 5, {"k": [1, {}]}, "s"]'):
+        assert list(iter_json_values(chunks, {("*", "k", "*"), ("*",)})) == [
+            ((0,), {}), ((1,), 5), ((2,), {"k": [1, {}]}), ((3,), "s"),
+        ], size
+        assert list(iter_json_values(chunks, {("*", "k", "*")})) == [((2, "k", 0), 1), ((2, "k", 1), {})]
+
+
+def test_long_value_spanning_many_chunks():
+    doc = {"nodes": [{"id": "n", "data": {"name": "x" * 5000 + "\\\"" * 100}}]}
+    text = json.dumps(doc)
+    for size in (1, 7, 64, 4096):
+        assert list(iter_json_arrays(iter_text_chunks(text, size), {("nodes",)})) == [(("nodes",), doc["nodes"][0])]
+
+
+def test_truncated_input_raises():
+    text = json.dumps(REACT_FLOW_DOC)
+    for cut in range(1, len(text)):
+        with pytest.raises(ValueError):
+            list(iter_json_arrays(iter_text_chunks(text[:cut], 5), {("nodes",)}))
+
+
+def test_workflow_items():
+    doc = {"items": [
+        {"id": "w1", "name": "One", "updatedAt": "t1", "workflow": REACT_FLOW_DOC},
+        {"id": "w2", "workflow": None},
+        {"workflow": TRANSITIONS_DOC, "id": "w3", "updatedAt": "t3"},
+    ]}
+    text = json.dumps(doc)
+    for size, chunks in chunked(text):
+        items = list(iter_workflow_items(chunks))
+        assert [(i["id"], i["name"], i["updatedAt"]) for i in items] == [
+            ("w1", "One", "t1"), ("w2", None, None), ("w3", None, "t3"),
+        ], size
+        assert items[0]["workflow"].fingerprint() == load_graph(REACT_FLOW_DOC).fingerprint()
+        assert items[1]["workflow"] is None
+        assert items[2]["workflow"].fingerprint() == load_graph(TRANSITIONS_DOC).fingerprint()
+
+    known = {"w1": {"id": "w1", "updatedAt": "t1", "workflow": "cached"}}
+    items = list(iter_workflow_items(iter_text_chunks(text, 10), known))
+    assert items[0] is known["w1"]
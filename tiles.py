@@ -0,0 +1,192 @@
+import io
+import json
+import math
+import os
+import threading
+
+from PIL import Image
+
+from graph_ir import REACT_FLOW
+from level_of_detail import AUTO, FULL, OVERVIEW
+from make_node_graph import create_node_graph, node_graph_detail, node_graph_key
+from render_cache import CACHE_DIR, RenderCache
+from render_options import DEFAULT_ENGINE
+from render_scheduler import get_scheduler
+
+TILE_SIZE = 256
+# Pixel budget for the single high-resolution render the pyramid is cut from
+TILE_PIXEL_BUDGET = int(os.getenv("TILE_PIXEL_BUDGET", 64_000_000))
+# Graphs with more nodes than this default to the tiled view
+LARGE_GRAPH_NODES = int(os.getenv("LARGE_GRAPH_NODES", 150))
+
+# Tiles get their own cache, so a few large pyramids neither evict the
+# normal renders nor each other's tiles within the render cache budget
+TILE_CACHE_MAX_MEMORY_BYTES = int(os.getenv("TILE_CACHE_MAX_MEMORY_BYTES", 256 * 1024 * 1024))
+TILE_CACHE_MAX_DISK_BYTES = int(os.getenv("TILE_CACHE_MAX_DISK_BYTES", 1024 * 1024 * 1024))
+
+VIEWPORT_WIDTH = 1024
+VIEWPORT_HEIGHT = 768
+
+_build_lock = threading.Lock()
+
+tile_cache = RenderCache(
+    os.path.join(CACHE_DIR, "tiles") if CACHE_DIR else None,
+    TILE_CACHE_MAX_MEMORY_BYTES,
+    TILE_CACHE_MAX_DISK_BYTES,
+)
+
+
+def _encode_png(image):
+    buf = io.BytesIO()
+    image.save(buf, format="PNG", optimize=False)
+    return buf.getvalue()
+
+
+class TilePyramid:
+    """
+    Deep-zoom tile pyramid over one rendered image.
+
+    Level max_level is the full-resolution image and every level below it
+    is half the size of the one above, down to a single pixel at level 0.
+    Each level is cut into TILE_SIZE square tiles that live in tile_cache
+    next to a small JSON descriptor.
+    """
+
+    def __init__(self, key, width, height, tile_size=TILE_SIZE):
+        self.key = key
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.max_level = math.ceil(math.log2(max(width, height, 1)))
+
+    @staticmethod
+    def meta_key(key):
+        return f"{key}-dzi"
+
+    def tile_key(self, level, col, row):
+        return f"{self.key}-tile-{level}-{col}-{row}"
+
+    def level_size(self, level):
+        scale = 2 ** (self.max_level - level)
+        return max(1, math.ceil(self.width / scale)), max(1, math.ceil(self.height / scale))
+
+    def grid(self, level):
+        w, h = self.level_size(level)
+        return math.ceil(w / self.tile_size), math.ceil(h / self.tile_size)
+
+    def fit_level(self, view_width, view_height):
+        """
+        Highest level that still fits entirely inside the viewport.
+        """
+        for level in range(self.max_level, -1, -1):
+            w, h = self.level_size(level)
+            if w <= view_width and h <= view_height:
+                return level
+        return 0
+
+    @classmethod
+    def build(cls, key, png_bytes, tile_size=TILE_SIZE):
+        """
+        Slice png_bytes into every level of the pyramid and store the tiles
+        in tile_cache.
+        """
+        image = Image.open(io.BytesIO(png_bytes)).convert("RGB")
+        pyramid = cls(key, image.width, image.height, tile_size)
+
+        level_image = image
+        for level in range(pyramid.max_level, -1, -1):
+            w, h = pyramid.level_size(level)
+            if level_image.size != (w, h):
+                level_image = level_image.resize((w, h), Image.LANCZOS)
+            cols, rows = pyramid.grid(level)
+            for col in range(cols):
+                for row in range(rows):
+                    box = (
+                        col * tile_size,
+                        row * tile_size,
+                        min(w, (col + 1) * tile_size),
+                        min(h, (row + 1) * tile_size),
+                    )
+                    tile_cache.put(
+                        pyramid.tile_key(level, col, row),
+                        _encode_png(level_image.crop(box)),
+                    )
+
+        meta = {"width": pyramid.width, "height": pyramid.height, "tile_size": tile_size}
+        tile_cache.put(cls.meta_key(key), json.dumps(meta).encode("utf-8"), ext="json")
+        return pyramid
+
+    @classmethod
+    def load(cls, key):
+        """
+        Return the pyramid for key if its descriptor is cached, else None.
+        """
+        meta = tile_cache.get(cls.meta_key(key), ext="json")
+        if meta is None:
+            return None
+        meta = json.loads(meta)
+        return cls(key, meta["width"], meta["height"], meta["tile_size"])
+
+    def tile(self, level, col, row):
+        return tile_cache.get(self.tile_key(level, col, row))
+
+    def viewport(self, level, center_x, center_y, view_width=VIEWPORT_WIDTH,
+                 view_height=VIEWPORT_HEIGHT):
+        """
+        Compose the tiles visible in a view_width x view_height window
+        centred at (center_x, center_y), given as fractions of the image.
+        Only those tiles are read. Returns PNG bytes, or None if a tile
+        has been evicted from the cache.
+        """
+        w, h = self.level_size(level)
+        view_width = min(view_width, w)
+        view_height = min(view_height, h)
+        left = min(max(0, int(center_x * w - view_width / 2)), w - view_width)
+        top = min(max(0, int(center_y * h - view_height / 2)), h - view_height)
+
+        view = Image.new("RGB", (view_width, view_height), "white")
+        size = self.tile_size
+        for col in range(left // size, (left + view_width - 1) // size + 1):
+            for row in range(top // size, (top + view_height - 1) // size + 1):
+                data = self.tile(level, col, row)
+                if data is None:
+                    return None
+                view.paste(Image.open(io.BytesIO(data)), (col * size - left, row * size - top))
+        return _encode_png(view)
+
+
+def opens_tiled(graph, output, expand_depth=0, detail=AUTO):
+    """
+    Whether the app shows graph in the tiled viewer by default: React
+    Flow PNGs of more than LARGE_GRAPH_NODES nodes, unless the overview
+    already folds them.
+    """
+    if output != "png" or graph.format != REACT_FLOW:
+        return False
+    node_count, _ = graph.hierarchy().size(expand_depth)
+    return node_count > LARGE_GRAPH_NODES and node_graph_detail(graph, detail, expand_depth) != OVERVIEW
+
+
+def tile_pyramid_for(graph_data, rebuild=False, expand_depth=0):
+    """
+    Return the TilePyramid for a filtered graph, rendering it once at
+    TILE_PIXEL_BUDGET and slicing it on first use. rebuild re-slices it,
+    e.g. after viewport() found an evicted tile.
+    """
+    # Tiles exist to zoom into full detail, so never the overview
+    key = node_graph_key(graph_data, "png", TILE_PIXEL_BUDGET, expand_depth=expand_depth, detail=FULL)
+    pyramid = TilePyramid.load(key)
+    if not rebuild and pyramid is not None and pyramid.tile(0, 0, 0) is not None:
+        return pyramid
+
+    # The source image goes to tile_cache too: at up to TILE_PIXEL_BUDGET
+    # pixels it would flush the normal renders out of render_cache
+    png = get_scheduler().render(
+        key, create_node_graph, graph_data, "png", TILE_PIXEL_BUDGET, DEFAULT_ENGINE, expand_depth, FULL,
+        cache=tile_cache,
+    )
+    with _build_lock:
+        pyramid = TilePyramid.load(key)
+        if rebuild or pyramid is None or pyramid.tile(0, 0, 0) is None:
+            pyramid = TilePyramid.build(key, png)
+    return pyramid
@@ -1,8 +1,17 @@
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, RequestException
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import os
 import json
+import threading
+import time
+
+from graph_ir import GraphIR
+from graph_stream import CHUNK_SIZE, iter_decoded, iter_workflow_items
+from metrics import span
+from snapshot_store import content_version, get_store
 
 # Load environment variables from .env file
 load_dotenv()
@@ -11,28 +20,112 @@ load_dotenv()
 email = os.getenv("EMAIL")
 password = os.getenv("PASSWORD")
 
-# Base URLs
-url = "https://api-dev.formant.io/v1/"
-wflow_url = "https://workflows-one.vercel.app/"
+# Base URLs, overridable e.g. to point at stub_server.py
+url = os.getenv("FORMANT_API_URL", "https://api-dev.formant.io/v1/")
+wflow_url = os.getenv("WORKFLOWS_API_URL", "https://workflows-one.vercel.app/")
+
+TOKEN_EXPIRATION_SECONDS = 604800
+# Refresh the token this long before it actually expires
+TOKEN_REFRESH_MARGIN_SECONDS = 3600
+REQUEST_TIMEOUT_SECONDS = 30
+# How long fetched data is served without asking the server again
+WORKFLOW_INDEX_TTL_SECONDS = int(os.getenv("WORKFLOW_INDEX_TTL_SECONDS", 60))
+# Answers to api/workspaces/<id> meaning the server has no such endpoint
+UNSUPPORTED_STATUS_CODES = (404, 405)
+
+
+class ApiClient:
+    """
+    Shared client for the Formant and workflows APIs.
+
+    Keeps one pooled requests.Session (keep-alive, bounded retries with
+    backoff) and caches the access token until shortly before it expires.
+    A 401 response triggers a single re-login and retry.
+    """
+
+    def __init__(self, email, password, retries=3, backoff_factor=0.5, pool_size=10):
+        self.email = email
+        self.password = password
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "accept": "application/json",
+            "content-type": "application/json",
+        })
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def token(self, force_refresh=False):
+        """
+        Return a valid access token, logging in only when the cached one is
+        missing, about to expire, or force_refresh is set.
+        """
+        with self._lock:
+            if (
+                not force_refresh
+                and self._token
+                and time.time() < self._expires_at - TOKEN_REFRESH_MARGIN_SECONDS
+            ):
+                return self._token
+            self._token = self._login()
+            self._expires_at = time.time() + TOKEN_EXPIRATION_SECONDS if self._token else 0.0
+            return self._token
+
+    def _login(self):
+        auth_url = url + "admin/auth/login"
+        payload = {
+            "email": self.email,
+            "password": self.password,
+            "tokenExpirationSeconds": TOKEN_EXPIRATION_SECONDS
+        }
+        response = self.session.post(auth_url, json=payload, timeout=REQUEST_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        return response.json().get('authentication').get('accessToken')
+
+    def get(self, get_url, token=None, headers=None, stream=False):
+        """
+        GET get_url with a bearer token. If the server answers 401 the token
+        is refreshed once and the request repeated. With stream=True the
+        body is left unread for iter_content().
+        """
+        token = token or self.token()
+        response = self.session.get(
+            get_url,
+            headers={**(headers or {}), "Authorization": f"Bearer {token}"},
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            stream=stream,
+        )
+        if response.status_code == 401:
+            response.close()
+            token = self.token(force_refresh=True)
+            response = self.session.get(
+                get_url,
+                headers={**(headers or {}), "Authorization": f"Bearer {token}"},
+                timeout=REQUEST_TIMEOUT_SECONDS,
+                stream=stream,
+            )
+        response.raise_for_status()
+        return response
+
+
+client = ApiClient(email, password)
 
 def auth():
     """
     Authenticate and retrieve the access token.
+    The token is cached by the shared client, so repeat calls are free.
     """
-    auth_url = url + "admin/auth/login"
-    payload = {
-        "email": email,
-        "password": password,
-        "tokenExpirationSeconds": 604800
-    }
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json"
-    }
     try:
-        response = requests.post(auth_url, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json().get('authentication').get('accessToken')
+        with span("auth"):
+            return client.token()
     except HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
     except RequestException as req_err:
@@ -44,14 +137,8 @@ def get_workflows(token):
     Retrieve workflows using the provided token.
     """
     get_url = wflow_url + "api/workflows"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
     try:
-        response = requests.get(get_url, headers=headers)
-        response.raise_for_status()
+        response = client.get(get_url, token)
         return response.json().get('items')
     except HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
@@ -64,14 +151,8 @@ def get_workspaces(token):
     Retrieve workspaces using the provided token.
     """
     get_url = wflow_url + "api/workspaces"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
     try:
-        response = requests.get(get_url, headers=headers)
-        response.raise_for_status()
+        response = client.get(get_url, token)
         return response.json()['items']
     except HTTPError as http_err:
         print(f"HTTP error occurred: {http_err}")
@@ -79,48 +160,386 @@ def get_workspaces(token):
         print(f"Request error occurred: {req_err}")
     return None
 
+_END = object()
+
 def find_workflows(wspace):
     """
     Extract workflows from the workspace layout.
+    The dock layout is walked with an explicit stack, so arbitrarily deep
+    layouts are fine and results keep their on-screen order. Null
+    children are skipped.
     """
-    children = wspace['layout']['dockLayout']['dockbox']
+    dockbox = wspace['layout']['dockLayout']['dockbox']
 
-    def flat_map_children(arr):
-        workflows = []
-        children = arr.get('children', [])
-        for child in children:
-            if 'children' in child:
-                wfs = flat_map_children(child)
-            else:
-                wfs = [(wf['id'], wf['title']) for wf in child.get('tabs', []) if wf.get('type') == 'Workflow']
-            workflows.extend(wfs)
+    workflows = []
+    stack = [iter(dockbox.get('children') or [])]
+    while stack:
+        child = next(stack[-1], _END)
+        if child is _END:
+            stack.pop()
+        elif child is None:
+            continue
+        elif 'children' in child:
+            stack.append(iter(child['children'] or []))
+        else:
+            workflows.extend(
+                (wf['id'], wf['title'])
+                for wf in child.get('tabs', [])
+                if wf.get('type') == 'Workflow'
+            )
+    return workflows
+
+def get_workspace(token, workspace_id):
+    """
+    Retrieve a single workspace by id. Returns None if it does not exist or
+    the request failed.
+    """
+    return _get_workspace(token, workspace_id)[0]
+
+def _get_workspace(token, workspace_id):
+    """
+    get_workspace, also returning the HTTP status code of a failed request
+    (None if there was no response).
+    """
+    get_url = wflow_url + f"api/workspaces/{workspace_id}"
+    try:
+        response = client.get(get_url, token)
+        data = response.json()
+        # Accept both a bare workspace and an {"item": ...} envelope
+        return (data.get('item', data) if isinstance(data, dict) else None), None
+    except HTTPError as http_err:
+        print(f"HTTP error occurred: {http_err}")
+        if http_err.response is not None:
+            return None, http_err.response.status_code
+    except RequestException as req_err:
+        print(f"Request error occurred: {req_err}")
+    return None, None
+
+class WorkspaceIndex:
+    """
+    Cached map from workspace id to the (workflow_id, title) pairs in its
+    layout.
+
+    Known ids are fetched on their own through api/workspaces/<id>. If that
+    fetch fails, the whole list is fetched once and every workspace in it
+    is indexed; if it answered 404 or 405 for a workspace the list does
+    contain, the endpoint is taken to be missing and not tried again. Entries expire after ttl seconds, and so
+    does the record of an id that the full list did not contain.
+
+    With a snapshot store, an expired or not yet fetched workspace is
+    answered from the store and refetched in the background.
+    """
+
+    def __init__(self, ttl=WORKFLOW_INDEX_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries = {}  # workspace id -> (fetched_at, workflows)
+        self._misses = {}  # workspace id -> time the full list lacked it
+        self._single_fetch = True
+        self._syncing = set()
+        self._lock = threading.Lock()
+
+    def _fresh(self, workspace_id):
+        entry = self._entries.get(workspace_id)
+        if entry and time.time() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def add(self, wspace):
+        workflows = find_workflows(wspace)
+        self._entries[wspace['id']] = (time.time(), workflows)
+        store = get_store()
+        if store is not None:
+            version = wspace.get('updatedAt') or content_version(wspace['layout'])
+            store.put_workspace(wspace['id'], str(version), workflows)
         return workflows
 
-    return flat_map_children(children)
+    def refresh_all(self, token):
+        """
+        Fetch every workspace and index all of them.
+        """
+        workspaces = get_workspaces(token)
+        if workspaces is None:
+            return None
+        with self._lock:
+            return {ws['id']: self.add(ws) for ws in workspaces}
+
+    def get(self, token, workspace_id):
+        """
+        Return the workflows of one workspace, or [] if it is unknown.
+        """
+        cached = self._fresh(workspace_id)
+        if cached is not None:
+            return cached
+        missed_at = self._misses.get(workspace_id)
+        if missed_at is not None and time.time() - missed_at < self.ttl:
+            return []
+
+        store = get_store()
+        if store is not None:
+            stored = store.get_workspace(workspace_id)
+            if stored is not None:
+                self._fetch_in_background(token, workspace_id)
+                return stored
+        return self._fetch(token, workspace_id)
+
+    def _fetch_in_background(self, token, workspace_id):
+        with self._lock:
+            if workspace_id in self._syncing:
+                return
+            self._syncing.add(workspace_id)
+
+        def run():
+            try:
+                self._fetch(token, workspace_id)
+            finally:
+                with self._lock:
+                    self._syncing.discard(workspace_id)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _fetch(self, token, workspace_id):
+        status = None
+        if self._single_fetch:
+            wspace, status = _get_workspace(token, workspace_id)
+            if wspace and 'layout' in wspace:
+                with self._lock:
+                    return self.add(wspace)
+
+        everything = self.refresh_all(token)
+        if everything is None:
+            return []
+        if workspace_id not in everything:
+            self._misses[workspace_id] = time.time()
+            return []
+        self._misses.pop(workspace_id, None)
+        if status in UNSUPPORTED_STATUS_CODES:
+            # The workspace exists but the single fetch did not find it,
+            # so the endpoint is not supported. Stop trying it. Timeouts
+            # and server errors are transient and leave it on.
+            self._single_fetch = False
+        return everything[workspace_id]
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._misses.clear()
+
+
+workspace_index = WorkspaceIndex()
 
 def get_workflows_by_workspace(token):
     """
     Map workspace IDs to their respective workflows.
     """
-    workspaces = get_workspaces(token)
-    if workspaces:
-        return {ws['id']: find_workflows(ws) for ws in workspaces}
-    return {}
+    return workspace_index.refresh_all(token) or {}
 
 def get_workflows_from_url(url, token):
     """
     Retrieve workflows based on the provided workspace URL.
     """
     wspace_id = url.strip('/').split('/')[-1]
-    ws_to_wf = get_workflows_by_workspace(token)
-    return ws_to_wf.get(wspace_id, [])
+    with span("workspace_fetch"):
+        return workspace_index.get(token, wspace_id)
+
+
+def _counted(chunks, download):
+    """
+    Pass chunks through, keeping their total size in download.size.
+    """
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        download.size = total
+        yield chunk
+
+
+class WorkflowIndex:
+    """
+    In-process index from workflow id to workflow item, built once per fetch
+    of api/workflows.
+
+    Within ttl seconds lookups never touch the network. After that the list
+    is revalidated with If-None-Match / If-Modified-Since, and a 304 keeps
+    the current index. When the server sends no validators, items whose
+    updatedAt did not change keep their previous objects.
+
+    The response is parsed as a stream: each item is reduced to its id,
+    name, updatedAt and a GraphIR of its workflow before the next one is
+    read, so the raw list is never held in memory.
+
+    With a snapshot store, the index starts from the stored workflows and
+    validators, known workflows are served from it while a background
+    revalidation runs, and every fetched list is synced back as a delta.
+    """
+
+    def __init__(self, ttl=WORKFLOW_INDEX_TTL_SECONDS):
+        self.ttl = ttl
+        self._items = {}
+        self._etag = None
+        self._last_modified = None
+        self._fetched_at = 0.0
+        self._misses = {}  # workflow id -> time a forced refresh did not find it
+        # Set when stored items had to be dropped: the next refresh skips
+        # the validators, since a 304 would not bring them back
+        self._refetch = False
+        self._snapshot_loaded = False
+        self._syncing = False
+        self._lock = threading.Lock()
+
+    def _load_snapshot(self, store):
+        with self._lock:
+            if self._snapshot_loaded:
+                return
+            self._snapshot_loaded = True
+            if not self._items:
+                self._items = store.load_workflows()
+                self._etag = store.get_meta("workflows_etag")
+                self._last_modified = store.get_meta("workflows_last_modified")
+        self._drop_invalidated(store)
+
+    def _drop_invalidated(self, store):
+        """
+        Forget the items whose stored graph was stale or unreadable and
+        make the next refresh fetch the full list. Returns their ids.
+        """
+        ids = store.take_invalidated()
+        if ids:
+            with self._lock:
+                for wf_id in ids:
+                    self._items.pop(wf_id, None)
+                self._refetch = True
+                self._fetched_at = 0.0
+        return ids
+
+    def refresh_in_background(self, token):
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+
+        def run():
+            try:
+                self.refresh(token)
+            finally:
+                self._syncing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def is_fresh(self):
+        return bool(self._items) and time.time() - self._fetched_at < self.ttl
+
+    def refresh(self, token, force=False):
+        """
+        Revalidate the index against the server unless it is still fresh.
+        On a failed request the previous index is kept.
+        """
+        with self._lock:
+            if not force and self.is_fresh():
+                return
+            headers = {}
+            if self._items and not self._refetch:
+                if self._etag:
+                    headers["If-None-Match"] = self._etag
+                if self._last_modified:
+                    headers["If-Modified-Since"] = self._last_modified
+            try:
+                with span("workflow_list") as download:
+                    response = client.get(wflow_url + "api/workflows", token, headers=headers, stream=True)
+                    with response:
+                        if response.status_code == 304:
+                            self._fetched_at = time.time()
+                            return
+                        raw = response.iter_content(chunk_size=CHUNK_SIZE)
+                        chunks = iter_decoded(_counted(raw, download))
+                        index = {item['id']: item for item in iter_workflow_items(chunks, self._items)}
+            except HTTPError as http_err:
+                print(f"HTTP error occurred: {http_err}")
+                return
+            except RequestException as req_err:
+                print(f"Request error occurred: {req_err}")
+                return
+            except ValueError as err:
+                print(f"Invalid workflow list: {err}")
+                return
+
+            self._fetched_at = time.time()
+            self._refetch = False
+            self._etag = response.headers.get("ETag")
+            self._last_modified = response.headers.get("Last-Modified")
+            self._items = index
 
+            store = get_store()
+            if store is not None:
+                store.sync_workflows(index)
+                store.set_meta("workflows_etag", self._etag)
+                store.set_meta("workflows_last_modified", self._last_modified)
+
+    def get(self, token, workflow_id):
+        """
+        Return the workflow item for workflow_id, or None if it does not
+        exist. An unknown id forces one revalidation in case the workflow
+        was created after the last fetch; if it is still unknown, that miss
+        is cached for ttl seconds like a hit.
+        """
+        store = get_store()
+        if store is not None:
+            self._load_snapshot(store)
+            item = self._items.get(workflow_id)
+            if item is not None:
+                # Reading the graph loads it from the store, which may find
+                # it unreadable
+                item.get('workflow')
+                if workflow_id not in self._drop_invalidated(store):
+                    if not self.is_fresh():
+                        self.refresh_in_background(token)
+                    return item
+
+        self.refresh(token)
+        item = self._items.get(workflow_id)
+        if item is None and self._items:
+            missed_at = self._misses.get(workflow_id)
+            if missed_at is not None and time.time() - missed_at < self.ttl:
+                return None
+            self.refresh(token, force=True)
+            item = self._items.get(workflow_id)
+            if item is None:
+                self._misses[workflow_id] = time.time()
+            else:
+                self._misses.pop(workflow_id, None)
+        return item
+
+    def all_items(self, token):
+        """
+        Every known workflow item (id -> item), refreshed like get().
+        """
+        store = get_store()
+        if store is not None:
+            self._load_snapshot(store)
+            self._drop_invalidated(store)
+            if self._items:
+                if not self.is_fresh():
+                    self.refresh_in_background(token)
+                return dict(self._items)
+        self.refresh(token)
+        return dict(self._items)
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = 0.0
+            self._misses.clear()
+
+
+workflow_index = WorkflowIndex()
 
 def get_workflow_graph(token, workflow_id):
-    workflows = get_workflows(token)
-    workflow = [f for f in workflows if f['id'] == workflow_id]
+    """
+    Return the graph of one workflow as a GraphIR, served from the shared
+    workflow index.
+    """
+    with span("workflow_fetch"):
+        workflow = workflow_index.get(token, workflow_id)
     if workflow:
-        return workflow[0]['workflow']
+        return workflow['workflow']
     else:
         return None
 
@@ -145,6 +564,13 @@ def get_group_subgraphs(graph_data):
     return subgraphs
 
 def filter_graph_data(graph_data):
+    with span("filter"):
+        return _filter_graph_data(graph_data)
+
+def _filter_graph_data(graph_data):
+    if isinstance(graph_data, GraphIR):
+        return graph_data.to_dict()
+
     # Extract and map nodes to the required fields
     filtered_nodes = [
         {
@@ -187,8 +613,8 @@ def filter_graph_data(graph_data):
 if __name__ == "__main__":
     token = auth()
     if token:
-        url = input("Enter workspace URL: ").strip()
-        workflows = get_workflows_from_url(url, token)
+        workspace_url = input("Enter workspace URL: ").strip()
+        workflows = get_workflows_from_url(workspace_url, token)
         if workflows:
             print("Workflows:")
             for i, wf in enumerate(workflows):